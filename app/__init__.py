@@ -2,10 +2,17 @@ from flask import Flask, render_template, request, jsonify
 from src.services.category import CategoryManager
 from src.services.query import QueryBuilder
 from src.services.pagination import PaginationProcessor
-from src.utils.similarity import SimilarityMatcher
+from src.services.cache import get_response_cache
+from src.services.store import get_corpus_store
+from src.utils.similarity import SimilarityMatcher, SIMILARITY_METHODS
+from src.services.translation_cache import get_translation_cache
 from app.main import translate_summary
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+import math
 import os
+import re
 
 # 加载环境变量
 load_dotenv()
@@ -19,6 +26,164 @@ app.template_folder = '../templates'
 # 初始化组件
 category_manager = CategoryManager()
 
+# 打分阶段的进程数，大于1时启用多进程并行打分
+SCORING_WORKERS = int(os.getenv('SCORING_WORKERS', '1'))
+
+# 摘要翻译的并发线程数（所有请求共用）和每个请求等待翻译的总时限（秒）
+TRANSLATION_WORKERS = int(os.getenv('TRANSLATION_WORKERS', '8'))
+TRANSLATION_DEADLINE = float(os.getenv('TRANSLATION_DEADLINE', '15'))
+# 请求中translation_deadline参数允许的最大值（秒），超过时按该值处理，避免请求长时间占用连接
+MAX_TRANSLATION_DEADLINE = float(os.getenv('MAX_TRANSLATION_DEADLINE', '60'))
+TRANSLATION_TIMEOUT_PLACEHOLDER = "翻译超时，请稍后重试"
+translation_pool = ThreadPoolExecutor(max_workers=TRANSLATION_WORKERS, thread_name_prefix='translate')
+
+# 候选论文来源：arxiv（在线查询）或 local（本地语料库，需先同步），请求中的source参数优先
+CORPUS_SOURCE = os.getenv('CORPUS_SOURCE', 'arxiv')
+CORPUS_SOURCES = ('arxiv', 'local')
+
+# 示例文本
+SAMPLE_TEXT = "Multi-Modal Change Detection, Application to the Detection of Flooded Areas: Outcome of the 2009–2010 Data Fusion Contest。 The 2009-2010 Data Fusion Contest organized by the Data Fusion Technical Committee of the IEEE Geoscience and Remote Sensing Society was focused on the detection of flooded areas using multi-temporal and multi-modal images. Both high spatial resolution optical and synthetic aperture radar data were provided. The goal was not only to identify the best algorithms (in terms of accuracy), but also to investigate the further improvement derived from decision fusion. This paper presents the four awarded algorithms and the conclusions of the contest, investigating both supervised and unsupervised methods and the use of multi-modal data for flood detection. Interestingly, a simple unsupervised change detection method provided similar accuracy as supervised approaches, and a digital elevation model-based predictive method yielded a comparable projected change detection map without using post-event data."
+
+# 默认分类
+DEFAULT_CATEGORIES = ['cs.CV', 'cs.AI', 'physics.ao-ph', 'eess.IV']
+
+
+def build_query(data):
+    """
+    根据请求参数创建查询构建器（时间范围和分类）
+    日期格式错误时抛出ValueError
+    """
+    builder = QueryBuilder()
+    
+    # 设置时间范围
+    start_date_str = data.get('start_date')
+    end_date_str = data.get('end_date')
+    if start_date_str and end_date_str:
+        start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
+        end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
+        builder.set_time_range(start_date, end_date)
+    else:
+        builder.set_time_range()  # 默认昨天
+    
+    # 获取请求中的分类参数
+    categories = data.get('categories', [])
+    if categories and len(categories) > 0:
+        builder.add_category_filter(categories)
+    else:
+        builder.add_category_filter(DEFAULT_CATEGORIES)  # 默认分类
+    
+    return builder
+
+
+def check_weights(weights):
+    """
+    校验加权融合权重：必须是 {算法: 非负数值} 字典，算法需在SIMILARITY_METHODS中，且权重之和大于0
+    返回: 错误信息，合法时返回None
+    """
+    if not isinstance(weights, dict):
+        return 'weights必须是 {算法: 权重} 字典'
+    for method, weight in weights.items():
+        if method not in SIMILARITY_METHODS:
+            return f'不支持的相似度算法: {method}'
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)) or not math.isfinite(weight) or weight < 0:
+            return f'{method}的权重必须是非负数值'
+    if not sum(weights.values()) > 0:
+        return '权重之和必须大于0'
+    return None
+
+
+def parse_translation_deadline(value):
+    """
+    解析请求中的翻译总时限（秒）：未提供时返回None（使用TRANSLATION_DEADLINE），
+    超过MAX_TRANSLATION_DEADLINE时截断为该值；不是非负数值时抛出ValueError
+    """
+    if value is None:
+        return None
+    error = 'translation_deadline必须是非负数值（秒）'
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(error)
+    try:
+        deadline = float(value)
+    except ValueError:
+        raise ValueError(error) from None
+    if not math.isfinite(deadline) or deadline < 0:
+        raise ValueError(error)
+    return min(deadline, MAX_TRANSLATION_DEADLINE)
+
+
+def fetch_candidates(builder, max_query_count, source):
+    """
+    获取候选论文：从arXiv在线查询，或从本地语料库按相同条件查询
+    """
+    if source == 'local':
+        return get_corpus_store().select(builder, limit=max_query_count)
+    processor = PaginationProcessor(batch_size=max_query_count, cache=get_response_cache())
+    return processor.fetch_single_batch(builder)['entries']
+
+
+def translate_summaries(summaries, deadline=None):
+    """
+    在共享线程池中并发翻译多篇摘要，相同的摘要只翻译一次
+    deadline: 等待所有翻译的总时限（秒，由parse_translation_deadline校验），None表示使用TRANSLATION_DEADLINE；
+              超时未完成的摘要返回占位文本，尚未开始的翻译被取消；
+              已开始的翻译在后台继续完成并写入翻译缓存（单篇最多TRANSLATION_CALL_TIMEOUT秒，不会长期占满线程池）
+    返回: {摘要: 翻译结果}
+    """
+    futures = {}
+    for summary in summaries:
+        if summary not in futures:
+            futures[summary] = translation_pool.submit(translate_summary, summary)
+    if not futures:
+        return {}
+    
+    wait(futures.values(), timeout=TRANSLATION_DEADLINE if deadline is None else deadline)
+    
+    translations = {}
+    for summary, future in futures.items():
+        if not future.done():
+            # 尚未开始的翻译不再执行
+            future.cancel()
+            translations[summary] = TRANSLATION_TIMEOUT_PLACEHOLDER
+        elif future.exception() is not None:
+            translations[summary] = f"翻译失败: {str(future.exception())}"
+        else:
+            translations[summary] = future.result()
+    return translations
+
+
+def extract_arxiv_id(article):
+    """
+    提取文章的arxiv_id，缺失时从id字段解析
+    """
+    arxiv_id = article.get('arxiv_id', '')
+    if not arxiv_id and article.get('id'):
+        match = re.search(r'/abs/([0-9\.]+)', article['id'])
+        if match:
+            arxiv_id = match.group(1)
+    return arxiv_id
+
+
+def format_result(item, chinese_summary=None):
+    """
+    将排序结果项转换为接口返回的字典
+    """
+    article = item['article']
+    result_item = {
+        'similarity_score': round(item['similarity_score'], 4),
+        'title': article['title'],
+        'authors': ', '.join(article['authors']),
+        'published': article['published'],
+        'categories': ', '.join(article['categories']),
+        'summary': article['summary'],
+        'chinese_summary': chinese_summary,
+        'arxiv_id': extract_arxiv_id(article),
+        'id': article.get('id', '')
+    }
+    if 'scores' in item:
+        result_item['scores'] = {name: round(score, 4) for name, score in item['scores'].items()}
+    return result_item
+
+
 @app.route('/')
 def index():
     """
@@ -35,86 +200,63 @@ def match_similarity():
         data = request.json
         text = data.get('text', '')
         use_sample = data.get('use_sample', False)
-        start_date_str = data.get('start_date')
-        end_date_str = data.get('end_date')
         
         # 使用示例文本
         if use_sample:
-            text = "Multi-Modal Change Detection, Application to the Detection of Flooded Areas: Outcome of the 2009–2010 Data Fusion Contest。 The 2009-2010 Data Fusion Contest organized by the Data Fusion Technical Committee of the IEEE Geoscience and Remote Sensing Society was focused on the detection of flooded areas using multi-temporal and multi-modal images. Both high spatial resolution optical and synthetic aperture radar data were provided. The goal was not only to identify the best algorithms (in terms of accuracy), but also to investigate the further improvement derived from decision fusion. This paper presents the four awarded algorithms and the conclusions of the contest, investigating both supervised and unsupervised methods and the use of multi-modal data for flood detection. Interestingly, a simple unsupervised change detection method provided similar accuracy as supervised approaches, and a digital elevation model-based predictive method yielded a comparable projected change detection map without using post-event data."
+            text = SAMPLE_TEXT
         
         if not text:
             return jsonify({'error': '文本不能为空'}), 400
         
-        # 创建查询构建器 - 使用默认参数
-        builder = QueryBuilder()
-        
-        # 设置时间范围
-        if start_date_str and end_date_str:
-            try:
-                from datetime import datetime
-                start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-                end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
-                builder.set_time_range(start_date, end_date)
-            except ValueError as e:
-                return jsonify({'error': f'日期格式错误: {e}'}), 400
-        else:
-            builder.set_time_range()  # 默认昨天
-            
-        # 获取请求中的分类参数
-        categories = data.get('categories', [])
-        if categories and len(categories) > 0:
-            builder.add_category_filter(categories)
-        else:
-            builder.add_category_filter(['cs.CV', 'cs.AI', 'physics.ao-ph', 'eess.IV'])  # 默认分类
+        # 创建查询构建器
+        try:
+            builder = build_query(data)
+        except ValueError as e:
+            return jsonify({'error': f'日期格式错误: {e}'}), 400
         
         # 获取前端传递的查询参数
         max_query_count = data.get('max_query_count', 20)  # 默认查询20篇
         max_results_count = data.get('max_results_count', 10)  # 默认返回10篇
         
-        builder.set_max_results(max_query_count)  # 使用用户设定的查询数量
+        # 相似度算法：cosine/jaccard/word_frequency/bm25/tfidf，或all同时计算所有算法
+        method = data.get('method', 'cosine')
+        weights = data.get('weights')  # 可选的多算法加权融合权重
+        if method != 'all' and method not in SIMILARITY_METHODS:
+            return jsonify({'error': f'不支持的相似度算法: {method}'}), 400
+        if weights is not None:
+            error = check_weights(weights)
+            if error:
+                return jsonify({'error': error}), 400
+        source = data.get('source', CORPUS_SOURCE)
+        if source not in CORPUS_SOURCES:
+            return jsonify({'error': f'不支持的论文来源: {source}'}), 400
+        try:
+            translation_deadline = parse_translation_deadline(data.get('translation_deadline'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # 创建分页处理器
-        processor = PaginationProcessor(batch_size=max_query_count)
+        builder.set_max_results(max_query_count)  # 使用用户设定的查询数量
         
         # 获取论文数据
-        result = processor.fetch_single_batch(builder)
+        entries = fetch_candidates(builder, max_query_count, source)
         
         # 创建相似度匹配器
         matcher = SimilarityMatcher()
         
         # 计算相似度并排序，使用用户设定的返回数量
-        ranked_articles = matcher.rank_articles(text, result['entries'], method='cosine', top_n=max_results_count)
-        
-        # 处理结果，添加中文摘要
-        results = []
-        for item in ranked_articles:
-            article = item['article']
-            # 尝试翻译摘要
-            try:
-                chinese_summary = translate_summary(article['summary'])
-            except Exception as e:
-                chinese_summary = f"翻译失败: {str(e)}"
-            
-            # 提取arxiv_id
-            arxiv_id = article.get('arxiv_id', '')
-            if not arxiv_id and article.get('id'):
-                # 从id字段提取
-                import re
-                match = re.search(r'/abs/([0-9\.]+)', article['id'])
-                if match:
-                    arxiv_id = match.group(1)
-            
-            results.append({
-                'similarity_score': round(item['similarity_score'], 4),
-                'title': article['title'],
-                'authors': ', '.join(article['authors']),
-                'published': article['published'],
-                'categories': ', '.join(article['categories']),
-                'summary': article['summary'],
-                'chinese_summary': chinese_summary,
-                'arxiv_id': arxiv_id,
-                'id': article.get('id', '')
-            })
+        if method == 'all' or weights:
+            # 单次遍历计算所有算法的分数，可按权重融合排序
+            ranked_articles = matcher.score_all(text, entries, weights=weights,
+                                                top_n=max_results_count,
+                                                sort_by=method if method != 'all' else 'cosine')
+        else:
+            ranked_articles = matcher.rank_articles(text, entries, method=method, top_n=max_results_count,
+                                                    workers=SCORING_WORKERS)
+        
+        # 处理结果，并发翻译摘要（超过总时限的返回占位文本）
+        translations = translate_summaries((item['article']['summary'] for item in ranked_articles),
+                                           translation_deadline)
+        results = [format_result(item, translations[item['article']['summary']]) for item in ranked_articles]
         
         return jsonify({
             'success': True,
@@ -124,5 +266,74 @@ def match_similarity():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/translation/stats')
+def translation_stats():
+    """
+    摘要翻译缓存的统计（条目数、命中次数、命中率等）
+    """
+    cache = get_translation_cache()
+    if cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **cache.stats()})
+
+@app.route('/api/match/batch', methods=['POST'])
+def match_similarity_batch():
+    """
+    批量相似度匹配：多篇文本共享一次arXiv查询，一次矩阵乘法完成所有打分
+    """
+    try:
+        data = request.json
+        texts = data.get('texts', [])
+        
+        if not isinstance(texts, list) or not texts or not all(isinstance(text, str) and text for text in texts):
+            return jsonify({'error': 'texts必须是非空文本列表'}), 400
+        
+        # 创建查询构建器
+        try:
+            builder = build_query(data)
+        except ValueError as e:
+            return jsonify({'error': f'日期格式错误: {e}'}), 400
+        
+        max_query_count = data.get('max_query_count', 20)  # 默认查询20篇
+        max_results_count = data.get('max_results_count', 10)  # 每篇文本默认返回10篇
+        method = data.get('method', 'cosine')
+        if method not in SIMILARITY_METHODS:
+            return jsonify({'error': f'不支持的相似度算法: {method}'}), 400
+        source = data.get('source', CORPUS_SOURCE)
+        if source not in CORPUS_SOURCES:
+            return jsonify({'error': f'不支持的论文来源: {source}'}), 400
+        translate = data.get('translate', False)  # 批量请求默认不翻译
+        try:
+            translation_deadline = parse_translation_deadline(data.get('translation_deadline'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        builder.set_max_results(max_query_count)
+        
+        # 所有文本共享同一批候选论文，只请求一次
+        entries = fetch_candidates(builder, max_query_count, source)
+        
+        matcher = SimilarityMatcher()
+        rankings = matcher.rank_many(texts, entries, method=method, top_n=max_results_count)
+        
+        # 同一篇论文出现在多个查询结果中时只翻译一次，所有摘要并发翻译
+        translations = {}
+        if translate:
+            translations = translate_summaries((item['article']['summary'] for ranked_articles in rankings
+                                                for item in ranked_articles), translation_deadline)
+        batch_results = [
+            [format_result(item, translations.get(item['article']['summary'])) for item in ranked_articles]
+            for ranked_articles in rankings
+        ]
+        
+        return jsonify({
+            'success': True,
+            'total_candidates': len(entries),
+            'results': batch_results
+        })
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -1,10 +1,23 @@
 from src.services.category import CategoryManager
 from src.services.query import QueryBuilder
 from src.services.pagination import PaginationProcessor
+from src.services.harvest import HarvestPlanner
 from src.utils.similarity import SimilarityMatcher
+from src.services.duplicates import DuplicateDetector
+from src.services.http import get_session
+from src.services.cache import get_response_cache
+from src.services.store import get_corpus_store
+from src.services.translation_cache import get_translation_cache
 from datetime import datetime, timedelta
+import os
 import time
 
+# 摘要翻译使用的模型和提示词（二者与摘要原文共同构成翻译缓存的键）
+TRANSLATION_MODEL = "Qwen/Qwen2.5-7B-Instruct"
+TRANSLATION_PROMPT = "请将以下英文摘要翻译成一句中文总结：\n{summary}"
+# 单次翻译（包括重试和重试前的等待）的总时限（秒）：超时被放弃的翻译最多占用翻译线程这么久
+TRANSLATION_CALL_TIMEOUT = float(os.getenv('TRANSLATION_CALL_TIMEOUT', '20'))
+
 def display_menu():
     """
     显示主菜单
@@ -16,7 +29,9 @@ def display_menu():
     print("2. 按学科查看分类")
     print("3. 搜索文献")
     print("4. 相似度匹配")
-    print("5. 退出程序")
+    print("5. 重复论文检测")
+    print("6. 同步本地语料库")
+    print("7. 退出程序")
     print("="*50)
 
 
@@ -55,7 +70,8 @@ def search_papers():
     # 初始化组件
     category_manager = CategoryManager()
     query_builder = QueryBuilder()
-    processor = PaginationProcessor(batch_size=50)
+    processor = PaginationProcessor(batch_size=50, workers=4, cache=get_response_cache(),
+                                    adaptive=True)  # 多页结果并发获取，批次大小自适应
     
     # 1. 选择时间范围
     print("\n1. 时间范围设置:")
@@ -126,6 +142,8 @@ def search_papers():
         elapsed_time = time.time() - start_time
         print(f"\n搜索完成! 耗时 {elapsed_time:.2f} 秒")
         print(f"共找到 {len(papers)} 篇论文")
+        if processor.stats["batch_sizes"]:
+            print(f"请求数: {processor.stats['requests']}，批次大小: {processor.stats['batch_sizes']}")
         
         # 显示搜索结果
         if papers:
@@ -148,22 +166,31 @@ def search_papers():
         print(f"搜索失败: {e}")
 
 
-def translate_summary(summary):
+def translate_summary(summary, call_timeout=None):
     """
     使用大模型翻译英文摘要为中文总结
+    启用翻译缓存时，同一摘要（相同模型和提示词）只请求一次大模型
+    call_timeout: 整个调用的总时限（秒），None表示使用TRANSLATION_CALL_TIMEOUT；
+                  每次请求的超时和重试前的等待都不超过剩余时间，用完后不再重试
     """
     import requests
     import time
     
+    cache = get_translation_cache()
+    if cache is not None:
+        cached = cache.get(summary, TRANSLATION_MODEL, TRANSLATION_PROMPT)
+        if cached is not None:
+            return cached
+    
     url = "https://api.siliconflow.cn/v1/chat/completions"
     
     # 构建请求参数 - 简化参数，使用更常见的参数组合
     payload = {
-        "model": "Qwen/Qwen2.5-7B-Instruct",
+        "model": TRANSLATION_MODEL,
         "messages": [
             {
                 "role": "user",
-                "content": f"请将以下英文摘要翻译成一句中文总结：\n{summary}"
+                "content": TRANSLATION_PROMPT.format(summary=summary)
             }
         ],
         "stream": False,
@@ -185,11 +212,20 @@ def translate_summary(summary):
     
     max_retries = 2  # 最多重试2次
     timeout = 10  # 缩短超时时间
+    deadline = time.monotonic() + (TRANSLATION_CALL_TIMEOUT if call_timeout is None else call_timeout)
+    
+    def pause(seconds):
+        # 重试前等待，不超过剩余时间
+        time.sleep(max(0.0, min(seconds, deadline - time.monotonic())))
     
     for attempt in range(max_retries):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
         try:
             print(f"正在翻译摘要 (尝试 {attempt + 1}/{max_retries})...")
-            response = requests.post(url, json=payload, headers=headers, timeout=timeout)
+            # 复用共享会话的keep-alive连接
+            response = get_session().post(url, json=payload, headers=headers, timeout=min(timeout, remaining))
             
             # 只在调试模式下打印响应内容
             # print(f"API响应状态: {response.status_code}")
@@ -200,25 +236,29 @@ def translate_summary(summary):
             # 解析响应
             result = response.json()
             if "choices" in result and len(result["choices"]) > 0:
-                return result["choices"][0]["message"]["content"].strip()
+                translation = result["choices"][0]["message"]["content"].strip()
+                # 只缓存成功的翻译
+                if cache is not None:
+                    cache.set(summary, TRANSLATION_MODEL, TRANSLATION_PROMPT, translation)
+                return translation
             else:
                 return f"翻译失败：无法解析响应"
         except requests.exceptions.HTTPError as e:
             print(f"HTTP错误: {e}")
             if attempt < max_retries - 1:
-                time.sleep(1)  # 等待1秒后重试
+                pause(1)  # 等待1秒后重试
         except requests.exceptions.ConnectionError:
             print(f"连接错误：无法连接到API服务器")
             if attempt < max_retries - 1:
-                time.sleep(2)  # 等待2秒后重试
+                pause(2)  # 等待2秒后重试
         except requests.exceptions.Timeout:
             print(f"超时错误：API请求超时")
             if attempt < max_retries - 1:
-                time.sleep(2)  # 等待2秒后重试
+                pause(2)  # 等待2秒后重试
         except Exception as e:
             print(f"翻译处理失败: {e}")
             if attempt < max_retries - 1:
-                time.sleep(1)  # 等待1秒后重试
+                pause(1)  # 等待1秒后重试
     
     # 所有重试都失败
     return "翻译失败：多次尝试后仍无法获取翻译结果"
@@ -250,7 +290,7 @@ def similarity_match():
     
     # 初始化组件
     query_builder = QueryBuilder()
-    processor = PaginationProcessor(batch_size=100)
+    processor = PaginationProcessor(batch_size=100, cache=get_response_cache())
     matcher = SimilarityMatcher()
     
     # 配置查询
@@ -299,18 +339,30 @@ def similarity_match():
     max_results = int(max_results_input) if max_results_input.isdigit() else 100
     query_builder.set_max_results(max_results)
     
+    # 数据来源
+    print("\n数据来源:")
+    print("   1) arXiv在线查询 (默认)")
+    print("   2) 本地语料库 (需先通过菜单6同步)")
+    use_local = (input("请选择 (1-2，默认1): ").strip() or "1") == "2"
+    
     # 4. 选择相似度算法
     print("\n4. 相似度算法选择:")
     print("   1) 余弦相似度 (默认)")
     print("   2) Jaccard相似度")
     print("   3) 词频相似度")
+    print("   4) BM25 (按文档频率降低常见词的权重)")
+    print("   5) TF-IDF余弦相似度")
+    print("   6) 全部算法 (一次计算并对比各算法分数)")
     
-    algo_choice = input("请选择算法 (1-3，默认1): ").strip() or "1"
+    algo_choice = input("请选择算法 (1-6，默认1): ").strip() or "1"
     
     algo_map = {
         "1": "cosine",
         "2": "jaccard",
-        "3": "word_frequency"
+        "3": "word_frequency",
+        "4": "bm25",
+        "5": "tfidf",
+        "6": "all"
     }
     
     similarity_method = algo_map.get(algo_choice, "cosine")
@@ -325,12 +377,22 @@ def similarity_match():
     
     try:
         # 获取论文数据
-        result = processor.fetch_single_batch(query_builder)
+        if use_local:
+            result = {'entries': get_corpus_store().select(query_builder, limit=max_results)}
+        else:
+            result = processor.fetch_single_batch(query_builder)
         print(f"获取到 {len(result['entries'])} 篇论文")
         
         # 计算相似度并排序
         print("\n正在计算相似度...")
-        ranked_articles = matcher.rank_articles(test_text, result['entries'], method=similarity_method, top_n=top_n)
+        if similarity_method == "all":
+            # 单次遍历计算所有算法的分数，按余弦相似度排序
+            ranked_articles = matcher.score_all(test_text, result['entries'], top_n=top_n)
+        else:
+            # SCORING_WORKERS大于1时多进程并行打分
+            workers = int(os.getenv('SCORING_WORKERS', '1'))
+            ranked_articles = matcher.rank_articles(test_text, result['entries'], method=similarity_method,
+                                                    top_n=top_n, workers=workers)
         
         elapsed_time = time.time() - start_time
         print(f"\n相似度匹配完成! 耗时 {elapsed_time:.2f} 秒")
@@ -345,6 +407,10 @@ def similarity_match():
                 article = item['article']
                 score = item['similarity_score']
                 print(f"\n{i}. 相似度: {score:.4f}")
+                if 'scores' in item:
+                    scores = item['scores']
+                    print(f"   各算法分数: 余弦 {scores['cosine']:.4f} | Jaccard {scores['jaccard']:.4f} | 词频 {scores['word_frequency']:.4f}"
+                          f" | BM25 {scores['bm25']:.4f} | TF-IDF {scores['tfidf']:.4f}")
                 print(f"   标题: {article['title']}")
                 print(f"   作者: {', '.join(article['authors'])}")
                 print(f"   发布时间: {article['published']}")
@@ -365,6 +431,136 @@ def similarity_match():
         print(f"相似度匹配失败: {e}")
 
 
+def duplicate_detection():
+    """
+    重复论文检测功能：在获取的论文中查找所有相似度超过阈值的论文对
+    """
+    print("\n" + "="*50)
+    print("重复论文检测")
+    print("="*50)
+    
+    query_builder = QueryBuilder()
+    processor = PaginationProcessor(batch_size=100, workers=4, cache=get_response_cache(),
+                                    adaptive=True)  # 多页结果并发获取，批次大小自适应
+    
+    # 1. 选择时间范围
+    print("\n1. 时间范围设置:")
+    print("   1) 昨天 (默认)")
+    print("   2) 过去7天")
+    print("   3) 过去30天")
+    
+    time_choice = input("请选择时间范围 (1-3，默认1): ").strip() or "1"
+    
+    if time_choice == "2":
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=7)
+        query_builder.set_time_range(start_date, end_date)
+    elif time_choice == "3":
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=30)
+        query_builder.set_time_range(start_date, end_date)
+    else:
+        query_builder.set_time_range()
+    
+    # 2. 分类
+    cat_input = input("\n2. 输入分类ID，多个用逗号分隔 (默认不限制): ").strip()
+    if cat_input:
+        query_builder.add_category_filter([cat.strip() for cat in cat_input.split(",")])
+    
+    # 3. 最大论文数
+    max_results_input = input("\n3. 最大论文数 (默认1000，0表示所有): ").strip() or "1000"
+    max_results = int(max_results_input) if max_results_input.isdigit() else 1000
+    
+    # 4. 相似度算法
+    print("\n4. 相似度算法选择:")
+    print("   1) Jaccard相似度 (默认)")
+    print("   2) 余弦相似度")
+    print("   3) 词频相似度")
+    print("   4) 全部算法 (任一算法达到阈值即视为重复)")
+    
+    algo_choice = input("请选择算法 (1-4，默认1): ").strip() or "1"
+    methods_map = {
+        "1": ("jaccard",),
+        "2": ("cosine",),
+        "3": ("word_frequency",),
+        "4": ("cosine", "jaccard", "word_frequency")
+    }
+    methods = methods_map.get(algo_choice, ("jaccard",))
+    
+    # 5. 阈值
+    threshold_input = input("\n5. 相似度阈值 (默认0.8): ").strip() or "0.8"
+    try:
+        threshold = float(threshold_input)
+    except ValueError:
+        threshold = 0.8
+    
+    # 6. 分块策略
+    print("\n6. 分块策略:")
+    print("   1) LSH分桶 (默认)")
+    print("   2) 共享低频词")
+    blocking = "rare_terms" if (input("请选择 (1-2，默认1): ").strip() or "1") == "2" else "lsh"
+    
+    output_path = input(f"\n7. 输出文件 (默认 duplicates_{datetime.now().strftime('%Y%m%d')}.jsonl): ").strip()
+    output_path = output_path or f"duplicates_{datetime.now().strftime('%Y%m%d')}.jsonl"
+    
+    print("\n正在获取论文并检测重复...")
+    start_time = time.time()
+    
+    try:
+        if max_results > 0:
+            papers = processor.fetch_all(query_builder, max_total=max_results)
+        else:
+            # 获取全部论文时按天分片并行抓取，避开单个查询的分页上限
+            papers = HarvestPlanner(processor, workers=4).harvest(query_builder)
+        detector = DuplicateDetector(methods=methods, threshold=threshold, blocking=blocking)
+        count = detector.run(papers, output_path)
+        
+        elapsed_time = time.time() - start_time
+        print(f"\n检测完成! 耗时 {elapsed_time:.2f} 秒")
+        print(f"论文数: {detector.stats['documents']}，候选对: {detector.stats['candidate_pairs']}，重复对: {count}")
+        print(f"结果已写入: {output_path}")
+    
+    except Exception as e:
+        print(f"重复检测失败: {e}")
+
+
+def sync_corpus():
+    """
+    同步本地语料库：首次同步获取指定时间范围内的论文，之后只获取新增和更新的论文
+    """
+    print("\n" + "="*50)
+    print("同步本地语料库")
+    print("="*50)
+    
+    store = get_corpus_store()
+    query_builder = QueryBuilder()
+    
+    cat_input = input("\n1. 输入分类ID，多个用逗号分隔 (默认: cs.CV, cs.AI, physics.ao-ph, eess.IV): ").strip()
+    if cat_input:
+        query_builder.add_category_filter([cat.strip() for cat in cat_input.split(",")])
+    else:
+        query_builder.add_category_filter(['cs.CV', 'cs.AI', 'physics.ao-ph', 'eess.IV'])
+    
+    state = store.sync_state(query_builder)
+    if state:
+        print(f"\n上次同步到: {state['last_updated']}，本次只获取之后新增和更新的论文")
+    else:
+        days_input = input("\n2. 首次同步的时间范围（过去N天，默认30）: ").strip() or "30"
+        days = int(days_input) if days_input.isdigit() else 30
+        end_date = datetime.now()
+        query_builder.set_time_range(end_date - timedelta(days=days), end_date)
+    
+    print("\n正在同步...")
+    start_time = time.time()
+    try:
+        stats = store.sync(query_builder, PaginationProcessor(batch_size=200, adaptive=True))
+        elapsed_time = time.time() - start_time
+        print(f"\n同步完成! 耗时 {elapsed_time:.2f} 秒")
+        print(f"获取 {stats['fetched']} 篇，写入 {stats['stored']} 篇，本地共 {store.count()} 篇论文")
+    except Exception as e:
+        print(f"同步失败: {e}")
+
+
 def main():
     """
     主程序
@@ -372,13 +568,13 @@ def main():
     print("欢迎使用arXiv数据获取服务!")
     print("正在初始化...")
     
-    # 预加载分类列表（缓存）
+    # 预加载分类列表：读取磁盘快照，快照不存在或过期时在后台抓取，不阻塞启动
     category_manager = CategoryManager()
-    category_manager.get_categories()
+    category_manager.preload()
     
     while True:
         display_menu()
-        choice = input("请选择功能 (1-5): ").strip()
+        choice = input("请选择功能 (1-7): ").strip()
         
         if choice == "1":
             # 查看所有分类
@@ -402,9 +598,7 @@ def main():
         elif choice == "2":
             # 按学科查看分类
             # 先获取所有学科
-            categories = category_manager.get_categories()
-            disciplines = list(set(cat["discipline"] for cat in categories))
-            disciplines.sort()
+            disciplines = category_manager.list_disciplines()
             
             print("\n可用学科:")
             for i, discipline in enumerate(disciplines, 1):
@@ -429,6 +623,14 @@ def main():
             similarity_match()
         
         elif choice == "5":
+            # 重复论文检测
+            duplicate_detection()
+        
+        elif choice == "6":
+            # 同步本地语料库
+            sync_corpus()
+        
+        elif choice == "7":
             # 退出程序
             print("\n感谢使用arXiv数据获取服务，再见!")
             break
@@ -0,0 +1,3 @@
+# test_query.py 和 test_similarity.py 是访问arXiv接口的演示脚本（模块级代码直接发起请求），
+# 不作为pytest用例收集；离线测试见其余 test_*.py
+collect_ignore = ["test_query.py", "test_similarity.py"]
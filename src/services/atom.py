@@ -0,0 +1,269 @@
+import io
+import time
+import xml.etree.ElementTree as ET
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # lxml不可用时只能使用标准库解析
+    lxml_etree = None
+
+# arXiv API返回的Atom数据使用的命名空间
+ATOM_NS = {
+    "atom": "http://www.w3.org/2005/Atom",
+    "arxiv": "http://arxiv.org/schemas/atom",
+    "opensearch": "http://a9.com/-/spec/opensearch/1.1/"
+}
+
+# 可选的解析后端：etree（标准库）或 lxml
+PARSER_BACKENDS = ("etree", "lxml")
+DEFAULT_BACKEND = "lxml" if lxml_etree is not None else "etree"
+
+
+class _EntryTags:
+    """
+    按命名空间展开的元素标签，解析时直接比较标签字符串
+    """
+
+    def __init__(self, ns):
+        atom, arxiv = "{%s}" % ns["atom"], "{%s}" % ns["arxiv"]
+        self.entry = atom + "entry"
+        self.total_results = "{%s}totalResults" % ns["opensearch"]
+        self.name = atom + "name"
+        # 标量字段：标签 -> (字典键, 是否去除首尾空白)
+        self.scalars = {
+            atom + "id": ("id", False),
+            atom + "title": ("title", True),
+            atom + "summary": ("summary", True),
+            atom + "published": ("published", False),
+            atom + "updated": ("updated", False),
+            arxiv + "id": ("arxiv_id", False),
+            arxiv + "doi": ("doi", False),
+        }
+        self.category = atom + "category"
+        self.author = atom + "author"
+        self.link = atom + "link"
+
+
+_DEFAULT_TAGS = _EntryTags(ATOM_NS)
+
+
+def parse_entry(entry, ns=ATOM_NS):
+    """
+    将一个<entry>元素转换为论文字典（标准库和lxml的元素均可）
+    只遍历一次子元素，每个字段不再单独查找
+    """
+    tags = _DEFAULT_TAGS if ns is ATOM_NS else _EntryTags(ns)
+    paper = {
+        "id": "",
+        "title": "",
+        "summary": "",
+        "published": "",
+        "updated": "",
+        "categories": [],
+        "authors": [],
+        "links": []
+    }
+    seen = set()
+
+    for child in entry:
+        tag = child.tag
+        scalar = tags.scalars.get(tag)
+        if scalar is not None:
+            # 与find一致：同名元素只取第一个
+            key, strip = scalar
+            if key not in seen:
+                seen.add(key)
+                text = child.text
+                paper[key] = (text or "").strip() if strip else text
+        elif tag == tags.category:
+            # 解析分类
+            term = child.get("term")
+            if term:
+                paper["categories"].append(term)
+        elif tag == tags.author:
+            # 解析作者
+            for name in child:
+                if name.tag == tags.name:
+                    paper["authors"].append((name.text or "").strip())
+                    break
+        elif tag == tags.link:
+            # 解析链接
+            paper["links"].append({
+                "href": child.get("href"),
+                "rel": child.get("rel"),
+                "type": child.get("type")
+            })
+
+    return paper
+
+
+class AtomStreamParser:
+    """
+    基于iterparse的流式Atom解析器
+    边读取边解析，每解析完一个<entry>就生成论文字典并清除已处理的元素，
+    内存中只保留当前条目，不需要完整的响应文本和元素树
+    backend为lxml时使用lxml的C实现iterparse，只为entry和totalResults元素产生事件
+    """
+
+    def __init__(self, ns=ATOM_NS, backend=None):
+        backend = backend or DEFAULT_BACKEND
+        if backend not in PARSER_BACKENDS:
+            raise ValueError(f"不支持的解析后端: {backend}")
+        if backend == "lxml" and lxml_etree is None:
+            raise ValueError("解析后端lxml需要安装lxml")
+        self.ns = ns
+        self.backend = backend
+        self.tags = _DEFAULT_TAGS if ns is ATOM_NS else _EntryTags(ns)
+        self.total_results = None  # 读到<opensearch:totalResults>后设置
+        self.count = 0  # 已解析的条目数
+
+    def iter_entries(self, source):
+        """
+        source: 二进制文件对象（如响应的原始数据流），或XML字符串/字节串
+        返回: 论文字典的生成器
+        """
+        if isinstance(source, str):
+            source = io.BytesIO(source.encode("utf-8"))
+        elif isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+
+        if self.backend == "lxml":
+            return self._iter_lxml(source)
+        return self._iter_etree(source)
+
+    def _iter_etree(self, source):
+        tags = self.tags
+        root = None
+        for event, element in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = element
+                continue
+
+            if element.tag == tags.entry:
+                paper = parse_entry(element, self.ns)
+                self.count += 1
+                # 清除已处理的元素，避免元素树随条目数增长
+                root.clear()
+                yield paper
+            elif element.tag == tags.total_results:
+                self.total_results = int(element.text)
+
+    def _iter_lxml(self, source):
+        tags = self.tags
+        events = lxml_etree.iterparse(source, events=("end",), tag=(tags.entry, tags.total_results))
+        for _, element in events:
+            if element.tag == tags.entry:
+                paper = parse_entry(element, self.ns)
+                self.count += 1
+                # 清除已处理的条目及其之前的兄弟元素
+                element.clear()
+                parent = element.getparent()
+                while element.getprevious() is not None:
+                    del parent[0]
+                yield paper
+            else:
+                self.total_results = int(element.text)
+
+    def parse(self, source):
+        """
+        解析完整的响应，返回与PaginationProcessor.parse_response相同格式的结果
+        """
+        entries = list(self.iter_entries(source))
+        return {
+            "total_results": self.total_results or 0,
+            "entries": entries
+        }
+
+
+def _parse_with_find(xml_text, ns=ATOM_NS):
+    """
+    原有的解析方式：ET.fromstring构建完整元素树，每个字段调用两次find，仅用于基准对比
+    """
+    root = ET.fromstring(xml_text)
+    entries = []
+    total_results = root.find("./opensearch:totalResults", ns)
+    total = int(total_results.text) if total_results is not None else 0
+    for entry in root.findall("./atom:entry", ns):
+        paper = {
+            "id": entry.find("./atom:id", ns).text if entry.find("./atom:id", ns) is not None else "",
+            "title": entry.find("./atom:title", ns).text.strip() if entry.find("./atom:title", ns) is not None else "",
+            "summary": entry.find("./atom:summary", ns).text.strip() if entry.find("./atom:summary", ns) is not None else "",
+            "published": entry.find("./atom:published", ns).text if entry.find("./atom:published", ns) is not None else "",
+            "updated": entry.find("./atom:updated", ns).text if entry.find("./atom:updated", ns) is not None else "",
+            "categories": [category.get("term") for category in entry.findall("./atom:category", ns) if category.get("term")],
+            "authors": [],
+            "links": [{"href": link.get("href"), "rel": link.get("rel"), "type": link.get("type")}
+                      for link in entry.findall("./atom:link", ns)]
+        }
+        for author in entry.findall("./atom:author", ns):
+            name = author.find("./atom:name", ns)
+            if name is not None:
+                paper["authors"].append(name.text.strip())
+        arxiv_id = entry.find("./arxiv:id", ns)
+        if arxiv_id is not None:
+            paper["arxiv_id"] = arxiv_id.text
+        arxiv_doi = entry.find("./arxiv:doi", ns)
+        if arxiv_doi is not None:
+            paper["doi"] = arxiv_doi.text
+        entries.append(paper)
+    return {"total_results": total, "entries": entries}
+
+
+def benchmark(xml_text, repeat=5):
+    """
+    在同一份Atom响应上对比各解析方式的耗时（取repeat次中的最短时间）
+    xml_text: 录制的arXiv API响应（字符串或字节串）
+    返回: {解析方式: 秒}，以及解析出的条目数
+    """
+    if isinstance(xml_text, str):
+        xml_text = xml_text.encode("utf-8")
+
+    parsers = {"find": lambda: _parse_with_find(xml_text)}
+    for backend in PARSER_BACKENDS:
+        if backend == "lxml" and lxml_etree is None:
+            continue
+        parsers[backend] = lambda backend=backend: AtomStreamParser(backend=backend).parse(xml_text)
+
+    timings = {}
+    entries = 0
+    for name, parse in parsers.items():
+        best = None
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            result = parse()
+            elapsed = time.perf_counter() - start_time
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+        entries = len(result["entries"])
+    return timings, entries
+
+
+# 测试代码
+if __name__ == "__main__":
+    import os
+    import sys
+    from datetime import datetime, timedelta
+    from src.services.query import QueryBuilder
+    from src.services.pagination import PaginationProcessor
+
+    # 录制的响应文件：python -m src.services.atom [文件路径]，文件不存在时从arXiv获取并保存
+    fixture_path = sys.argv[1] if len(sys.argv) > 1 else "arxiv_fixture.xml"
+    if not os.path.exists(fixture_path):
+        builder = QueryBuilder()
+        builder.set_time_range(start_date=datetime.now() - timedelta(days=30))
+        builder.add_category_filter(['cs.CV', 'cs.AI'])
+        builder.set_max_results(5000)
+        url, params = builder.build()
+        processor = PaginationProcessor(batch_size=5000)
+        with open(fixture_path, "w", encoding="utf-8") as fixture:
+            fixture.write(processor.fetch_batch(url, params))
+        print(f"已录制响应: {fixture_path}")
+
+    with open(fixture_path, "rb") as fixture:
+        recorded = fixture.read()
+
+    timings, entries = benchmark(recorded)
+    print(f"条目数: {entries}，响应大小: {len(recorded) / 1e6:.1f} MB")
+    for name, seconds in timings.items():
+        print(f"{name:6s} {seconds * 1000:8.1f} ms  ({timings['find'] / seconds:.1f}x)")
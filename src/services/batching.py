@@ -0,0 +1,75 @@
+import threading
+
+# 自适应批次大小的默认边界和目标
+DEFAULT_MIN_BATCH_SIZE = 10
+DEFAULT_MAX_BATCH_SIZE = 2000  # arXiv建议单次请求不超过2000条
+DEFAULT_TARGET_LATENCY = 8.0  # 单次请求的目标耗时（秒）
+DEFAULT_MAX_RESPONSE_BYTES = 16 * 1024 * 1024  # 单次响应的目标大小上限（字节）
+
+
+class AdaptiveBatchSizer:
+    """
+    自适应批次大小（AIMD，线程安全）
+    起始阶段每次成功请求后批次大小翻倍，直到首次出现请求过慢、响应过大或请求失败；
+    此后成功时加性增长（每次增加step），出现上述情况时按decrease比例乘性减小，
+    批次大小始终限制在[min_size, max_size]之间
+    """
+
+    def __init__(self, initial_size=100, min_size=DEFAULT_MIN_BATCH_SIZE, max_size=DEFAULT_MAX_BATCH_SIZE,
+                 target_latency=DEFAULT_TARGET_LATENCY, max_bytes=DEFAULT_MAX_RESPONSE_BYTES,
+                 step=None, decrease=0.5):
+        """
+        initial_size: 初始批次大小
+        min_size, max_size: 批次大小的边界
+        target_latency: 单次请求耗时超过该值（秒）视为过慢
+        max_bytes: 单次响应超过该大小（字节）视为过大
+        step: 加性增长的步长，None表示使用初始批次大小的一半
+        decrease: 乘性减小的比例
+        """
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_latency = target_latency
+        self.max_bytes = max_bytes
+        self.step = step or max(min_size, initial_size // 2)
+        self.decrease = decrease
+        self.size = self._clamp(initial_size)
+        self.slow_start = True  # 是否仍处于翻倍增长阶段
+        self._lock = threading.Lock()
+
+    def _clamp(self, size):
+        return int(min(self.max_size, max(self.min_size, size)))
+
+    def next_size(self):
+        """
+        下一次请求使用的批次大小
+        """
+        with self._lock:
+            return self.size
+
+    def record_success(self, size, latency, nbytes):
+        """
+        记录一次成功的请求并调整批次大小
+        size: 该请求的批次大小，latency: 耗时（秒），nbytes: 响应大小（字节）
+        返回: 调整后的批次大小
+        """
+        with self._lock:
+            if latency > self.target_latency or nbytes > self.max_bytes:
+                self._shrink(size)
+            elif size >= self.size:
+                # 只有不小于当前大小的请求才能说明可以继续增大（并发时较早派发的小批次不参与增长）
+                self.size = self._clamp(self.size * 2 if self.slow_start else self.size + self.step)
+            return self.size
+
+    def record_failure(self, size):
+        """
+        记录一次失败的请求（超时、连接错误或错误状态码）并减小批次大小
+        返回: 调整后的批次大小
+        """
+        with self._lock:
+            self._shrink(size)
+            return self.size
+
+    def _shrink(self, size):
+        self.slow_start = False
+        # 并发时多个请求可能同时变慢，以该请求自身的大小为准，避免连续多次减小
+        self.size = self._clamp(min(self.size, size * self.decrease))
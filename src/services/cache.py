@@ -0,0 +1,250 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+# 默认缓存目录、有效期（秒）和容量上限（字节）
+DEFAULT_CACHE_DIR = os.path.join(".cache", "arxiv")
+DEFAULT_TTL = 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+class OfflineCacheMiss(LookupError):
+    """
+    离线回放模式下请求的数据不在缓存中
+    """
+
+
+class ResponseCache:
+    """
+    内容寻址的arXiv响应磁盘缓存
+    以规范化的 (url, params) 的SHA-256为键，响应体gzip压缩后存为 <键>.xml.gz，
+    元数据（请求参数、写入时间、过期时间、大小、页面键）存为同名 .json；
+    写入后ttl秒内有效，总大小超过上限时按最近访问时间淘汰（同时删除指向被淘汰条目的页面索引）；
+    offline模式只从缓存读取（忽略过期时间），不访问网络；
+    带max_results的请求另外按不含max_results的参数记录索引 <页面键>.page（内容为缓存键），
+    离线回放时可按起始位置找到任意批次大小的页面（见get_page）
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, offline=False):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._size = None  # 缓存总大小，首次写入时扫描目录得到
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """
+        根据环境变量创建缓存：
+        ARXIV_CACHE_DIR（设为空表示不使用缓存，此时返回None）、ARXIV_CACHE_TTL（秒）、
+        ARXIV_CACHE_MAX_MB、ARXIV_OFFLINE（1表示离线回放）
+        """
+        directory = os.getenv("ARXIV_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if not directory:
+            return None
+        return cls(
+            directory=directory,
+            ttl=float(os.getenv("ARXIV_CACHE_TTL", DEFAULT_TTL)),
+            max_bytes=int(float(os.getenv("ARXIV_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 1024 / 1024)) * 1024 * 1024),
+            offline=os.getenv("ARXIV_OFFLINE", "0").lower() in ("1", "true", "yes")
+        )
+
+    @staticmethod
+    def key(url, params):
+        """
+        请求的规范化键：参数按名称排序、统一转换为字符串后计算SHA-256
+        """
+        canonical = json.dumps([url, sorted((str(name), str(value)) for name, value in params.items())],
+                               ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def page_key(cls, url, params):
+        """
+        页面键：不含max_results的请求键，同一查询、同一起始位置的页面不论批次大小都对应同一个页面键
+        """
+        return cls.key(url, {name: value for name, value in params.items() if name != "max_results"})
+
+    def _paths(self, key):
+        return (os.path.join(self.directory, key + ".xml.gz"),
+                os.path.join(self.directory, key + ".json"))
+
+    def _page_path(self, page_key):
+        return os.path.join(self.directory, page_key + ".page")
+
+    def get(self, url, params):
+        """
+        读取缓存的响应文本，不存在或已过期时返回None（离线模式下过期的缓存仍然返回）
+        """
+        return self._get(self.key(url, params))
+
+    def get_page(self, url, params):
+        """
+        按起始位置读取页面：返回同一查询、同一起始位置最近写入的页面（批次大小可能与params不同），
+        用于离线回放自适应批次大小获取的结果；不存在时返回None
+        """
+        try:
+            with open(self._page_path(self.page_key(url, params)), "r", encoding="utf-8") as page_file:
+                key = page_file.read().strip()
+        except OSError:
+            return None
+        return self._get(key)
+
+    def _get(self, key):
+        body_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as meta_file:
+                meta = json.load(meta_file)
+            if not self.offline and meta["expires"] < time.time():
+                self._count("misses")
+                return None
+            with gzip.open(body_path, "rb") as body_file:
+                text = body_file.read().decode("utf-8")
+        except (OSError, ValueError, KeyError):
+            self._count("misses")
+            return None
+
+        # 更新访问时间，供按最近访问淘汰
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+        self._count("hits")
+        return text
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def set(self, url, params, text):
+        """
+        写入响应文本
+        """
+        key = self.key(url, params)
+        body_path, meta_path = self._paths(key)
+        body = gzip.compress(text.encode("utf-8"))
+        now = time.time()
+        meta = {
+            "url": url,
+            "params": {str(name): str(value) for name, value in params.items()},
+            "created": now,
+            "expires": now + self.ttl,
+            "size": len(body)
+        }
+        if "max_results" in params:
+            meta["page"] = self.page_key(url, params)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(entry["size"] for entry in self._entries())
+            previous = self._read_meta(meta_path)
+            # 先写临时文件再替换，避免并发读取到不完整的内容
+            self._write_atomic(body_path, body)
+            self._write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+            if "page" in meta:
+                self._write_atomic(self._page_path(meta["page"]), key.encode("utf-8"))
+            self._size += len(body) - (previous["size"] if previous else 0)
+            self.stats["stores"] += 1
+            if self._size > self.max_bytes:
+                self._evict(keep=key)
+
+    def _write_atomic(self, path, data):
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, path)
+
+    def _read_meta(self, meta_path):
+        try:
+            with open(meta_path, "r", encoding="utf-8") as meta_file:
+                return json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+
+    def _entries(self):
+        """
+        遍历所有缓存条目的元数据，附带键和最近访问时间
+        """
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(self.directory, name)
+            meta = self._read_meta(meta_path)
+            if meta is None:
+                continue
+            try:
+                meta["accessed"] = os.path.getmtime(meta_path)
+            except OSError:
+                continue
+            meta["key"] = name[:-len(".json")]
+            yield meta
+
+    def _remove(self, key, page_key=None):
+        """
+        删除缓存条目；page_key不为None时，如果页面索引仍指向该条目也一并删除
+        （同一页面之后以其他批次大小写入时，索引已指向新的条目，需要保留）
+        """
+        paths = list(self._paths(key))
+        if page_key is not None:
+            page_path = self._page_path(page_key)
+            try:
+                with open(page_path, "r", encoding="utf-8") as page_file:
+                    if page_file.read().strip() == key:
+                        paths.append(page_path)
+            except OSError:
+                pass
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self, keep=None):
+        """
+        删除最近最少访问的条目（优先删除已过期的），直到总大小不超过上限
+        """
+        now = time.time()
+        entries = sorted(self._entries(), key=lambda entry: (entry["expires"] >= now, entry["accessed"]))
+        for entry in entries:
+            if self._size <= self.max_bytes:
+                break
+            if entry["key"] == keep:
+                continue
+            self._remove(entry["key"], entry.get("page"))
+            self._size -= entry["size"]
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        """
+        清空缓存
+        """
+        with self._lock:
+            for entry in list(self._entries()):
+                self._remove(entry["key"])
+            for name in os.listdir(self.directory):
+                if name.endswith(".page"):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+            self._size = 0
+
+
+def get_response_cache():
+    """
+    获取按环境变量配置的进程内共享缓存（首次调用时创建），未启用缓存时返回None
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache.from_env() or False
+    return _default_cache or None
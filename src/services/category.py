@@ -1,26 +1,45 @@
-import requests
 from bs4 import BeautifulSoup
-from cachetools import TTLCache
+import json
+import os
+import threading
 import time
+from src.services.http import get_session
+
+# 分类快照文件的默认路径和有效期（秒），可通过环境变量 CATEGORY_CACHE / CATEGORY_TTL 调整
+DEFAULT_CATEGORY_CACHE = os.path.join(".cache", "categories.json")
+DEFAULT_CATEGORY_TTL = 86400
+# 后台刷新失败后，至少间隔多少秒再重试
+REFRESH_RETRY_DELAY = 300
 
 class CategoryManager:
-    def __init__(self):
+    """
+    arXiv分类管理
+    分类列表保存在磁盘快照中，进程启动时直接读取快照，不需要重新抓取；
+    快照过期后继续返回旧数据，同时在后台线程中重新抓取（stale-while-revalidate），
+    只有既没有内存数据也没有快照时才会同步抓取；
+    按分类ID和学科建立字典索引，查询不需要遍历列表
+    """
+    def __init__(self, snapshot_path=None, ttl=None):
         self.base_url = "https://arxiv.org"
         self.categories_url = f"{self.base_url}/archive"
-        # 创建缓存，有效期1天
-        self.cache = TTLCache(maxsize=100, ttl=86400)
+        self.snapshot_path = snapshot_path or os.getenv("CATEGORY_CACHE", DEFAULT_CATEGORY_CACHE)
+        self.ttl = float(os.getenv("CATEGORY_TTL", DEFAULT_CATEGORY_TTL)) if ttl is None else ttl
         self._categories = None
-        
-    def get_categories(self):
+        self._by_id = {}
+        self._by_discipline = {}  # 小写学科名 -> 分类列表
+        self._fetched_at = 0.0  # 当前分类列表的抓取时间
+        # 可重入：没有数据时在锁内读取快照或抓取，其间会再次获取锁替换分类列表
+        self._lock = threading.RLock()
+        self._refresh_thread = None
+        self._retry_at = 0.0  # 后台刷新失败后，此时间之前不再重试
+    
+    def fetch_categories(self):
         """
-        抓取并缓存arXiv分类列表
-        返回格式: [{'id': 'cs.CV', 'name': 'Computer Vision and Pattern Recognition'}, ...]
+        从arXiv网站抓取分类列表
+        返回格式: [{'id': 'cs.CV', 'name': 'Computer Vision and Pattern Recognition', 'discipline': ...}, ...]
         """
-        # 检查缓存
-        if self._categories is not None:
-            return self._categories
         print("正在抓取arXiv分类列表...")
-        response = requests.get(self.categories_url)
+        response = get_session().get(self.categories_url, timeout=30)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.text, "lxml")
@@ -50,19 +69,141 @@ class CategoryManager:
                                 })
         
         print(f"成功获取 {len(categories)} 个arXiv分类")
-        # 保存到缓存
-        self._categories = categories
         return categories
     
+    def _set_categories(self, categories, fetched_at):
+        """
+        替换分类列表并重建索引
+        """
+        by_id = {}
+        by_discipline = {}
+        for category in categories:
+            by_id.setdefault(category["id"], category)
+            by_discipline.setdefault(category["discipline"].lower(), []).append(category)
+        with self._lock:
+            self._categories = categories
+            self._by_id = by_id
+            self._by_discipline = by_discipline
+            self._fetched_at = fetched_at
+    
+    def _load_snapshot(self):
+        """
+        读取磁盘快照，成功时返回True
+        """
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            categories = snapshot["categories"]
+            fetched_at = float(snapshot["fetched_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        if not categories:
+            return False
+        self._set_categories(categories, fetched_at)
+        return True
+    
+    def _save_snapshot(self, categories, fetched_at):
+        """
+        写入磁盘快照（先写临时文件再替换，其他进程不会读到不完整的内容）
+        """
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.snapshot_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as snapshot_file:
+                json.dump({"fetched_at": fetched_at, "categories": categories}, snapshot_file, ensure_ascii=False)
+            os.replace(temp_path, self.snapshot_path)
+        except BaseException:
+            # 写入失败时删除临时文件，原快照不受影响
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+    
+    def refresh(self):
+        """
+        同步抓取分类列表，更新内存数据和磁盘快照
+        """
+        categories = self.fetch_categories()
+        fetched_at = time.time()
+        self._set_categories(categories, fetched_at)
+        try:
+            self._save_snapshot(categories, fetched_at)
+        except OSError as e:
+            print(f"保存分类快照失败: {e}")
+        return categories
+    
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            # 刷新失败时继续使用旧数据，间隔一段时间后再重试
+            self._retry_at = time.time() + REFRESH_RETRY_DELAY
+            print(f"后台刷新分类列表失败: {e}")
+    
+    def refresh_async(self):
+        """
+        在后台线程中刷新分类列表（已有刷新在进行时不重复启动）
+        返回: 刷新线程
+        """
+        with self._lock:
+            if self._refresh_thread is None or not self._refresh_thread.is_alive():
+                self._refresh_thread = threading.Thread(target=self._background_refresh, daemon=True)
+                self._refresh_thread.start()
+            return self._refresh_thread
+    
+    def is_stale(self):
+        """
+        当前分类列表是否已超过有效期
+        """
+        return time.time() - self._fetched_at > self.ttl
+    
+    def preload(self):
+        """
+        启动时预加载，不等待网络：读取磁盘快照，快照不存在或已过期时在后台抓取
+        """
+        if self._categories is None:
+            self._load_snapshot()
+        if self._categories is None or self.is_stale():
+            self.refresh_async()
+    
+    def get_categories(self):
+        """
+        获取arXiv分类列表（内存 -> 磁盘快照 -> 网络抓取）
+        数据过期时立即返回旧数据并在后台刷新；没有任何数据时等待抓取完成
+        返回格式: [{'id': 'cs.CV', 'name': 'Computer Vision and Pattern Recognition', 'discipline': ...}, ...]
+        """
+        if self._categories is None:
+            self._load_snapshot()
+        
+        if self._categories is None:
+            # 没有可用数据：等待正在进行的后台刷新（不能持有锁，刷新线程替换数据时需要获取锁），或直接抓取
+            thread = self._refresh_thread
+            if thread is not None and thread.is_alive():
+                thread.join()
+            with self._lock:
+                # 并发调用只有第一个抓取，其余在锁上等待后直接使用抓取的结果
+                if self._categories is None:
+                    return self.refresh()
+        elif self.is_stale() and time.time() >= self._retry_at:
+            self.refresh_async()
+        
+        return self._categories
+    
     def get_category_by_id(self, category_id):
         """
         根据分类ID获取分类信息
         """
-        categories = self.get_categories()
-        for category in categories:
-            if category["id"] == category_id:
-                return category
-        return None
+        self.get_categories()
+        return self._by_id.get(category_id)
+    
+    def list_disciplines(self):
+        """
+        列出所有学科名称（按名称排序）
+        """
+        return sorted({cat["discipline"] for cat in self.get_categories()})
     
     def list_categories(self, discipline=None):
         """
@@ -70,22 +211,22 @@ class CategoryManager:
         """
         categories = self.get_categories()
         if discipline:
-            return [cat for cat in categories if cat["discipline"].lower() == discipline.lower()]
+            return list(self._by_discipline.get(discipline.lower(), []))
         return categories
 
 # 测试代码
 if __name__ == "__main__":
     manager = CategoryManager()
     
-    # 第一次调用会抓取数据
+    # 第一次调用读取磁盘快照（没有快照时抓取）
     start_time = time.time()
     categories = manager.get_categories()
     print(f"第一次获取耗时: {time.time() - start_time:.2f}秒")
     
-    # 第二次调用会使用缓存
+    # 新的管理器直接读取磁盘快照
     start_time = time.time()
-    categories = manager.get_categories()
-    print(f"第二次获取耗时: {time.time() - start_time:.2f}秒")
+    categories = CategoryManager().get_categories()
+    print(f"从快照获取耗时: {time.time() - start_time:.4f}秒")
     
     # 打印部分分类示例
     print("\n部分分类示例:")
@@ -94,4 +235,4 @@ if __name__ == "__main__":
     
     # 测试按ID查找
     cv_category = manager.get_category_by_id("cs.CV")
-    print(f"\n按ID查找cs.CV: {cv_category}")
\ No newline at end of file
+    print(f"\n按ID查找cs.CV: {cv_category}")
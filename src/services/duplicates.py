@@ -0,0 +1,384 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from multiprocessing import get_context
+import json
+import os
+import numpy as np
+from src.utils.similarity import SimilarityMatcher
+from src.utils.minhash import MAX_HASH, MinHasher, choose_bands, vocabulary_hashes
+from src.utils.parallel import START_METHOD
+
+# 每个任务校验的候选对数量（大的分块会拆成多个任务）
+PAIR_CHUNK_SIZE = 5000
+
+# 每个进程最多排队的任务数：候选对边生成边提交，限制已生成但尚未校验的候选对占用的内存
+PENDING_TASKS_PER_WORKER = 2
+
+# LSH签名长度，未指定bands和rows时由choose_bands按阈值切分
+NUM_PERM = 128
+
+# 批量计算MinHash签名时每批处理的非零元素数，限制 (非零元素数, NUM_PERM) 中间矩阵的内存
+SIGNATURE_CHUNK_SIZE = 1 << 14
+
+# 支持两两比较的相似度算法（bm25和tfidf依赖查询方向和语料统计，不用于重复检测）
+PAIRWISE_METHODS = ('cosine', 'jaccard', 'word_frequency')
+
+# 工作进程中的语料（由_init_worker设置，避免每个任务重复传输）
+_worker_corpus = None
+
+
+def _init_worker(indptr, indices, data, norms, lengths, ownership):
+    """
+    工作进程初始化：从CSR数组重建每篇文档的 {词ID: 词频} 字典
+    """
+    global _worker_corpus
+    _worker_corpus = _DocumentVectors(indptr, indices, data, norms, lengths, ownership)
+
+
+def _verify_chunk(tasks, methods, threshold):
+    """
+    工作进程任务：展开一批分块中的候选对并精确计算相似度
+    """
+    return _worker_corpus.verify_blocks(tasks, methods, threshold)
+
+
+def _block_pairs(docs, begin, end):
+    """
+    分块内以第begin到end-1个文档为前者的所有文档对（docs升序，因此前者 < 后者）
+    返回: (前者数组, 后者数组)
+    """
+    rows = np.arange(begin, end)
+    counts = len(docs) - 1 - rows
+    firsts = np.repeat(rows, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return docs[firsts], docs[firsts + 1 + offsets]
+
+
+class _BandOwnership:
+    """
+    LSH分块的候选对归属：一对文档可能在多个段中同桶，只由第一个同桶的段负责校验
+    """
+
+    def __init__(self, band_keys):
+        """
+        band_keys: (文档数, 段数) 数组，每段签名的桶编号
+        """
+        self.band_keys = band_keys
+
+    def owned(self, band, firsts, seconds):
+        if band == 0:
+            return np.ones(len(firsts), dtype=bool)
+        earlier = self.band_keys[firsts, :band] == self.band_keys[seconds, :band]
+        return ~earlier.any(axis=1)
+
+
+class _TermOwnership:
+    """
+    rare_terms分块的候选对归属：一对文档可能共享多个低频词，只由编号最小的共享低频词负责校验
+    """
+
+    def __init__(self, indptr, indices):
+        """
+        indptr, indices: 只含低频词的CSR数组
+        """
+        self.indptr = indptr
+        self.indices = indices
+        self.term_sets = None
+
+    def owned(self, term, firsts, seconds):
+        if self.term_sets is None:
+            # 在工作进程中首次使用时再建立集合，避免随初始化参数传输
+            indptr, indices = self.indptr.tolist(), self.indices.tolist()
+            self.term_sets = [frozenset(indices[indptr[doc]:indptr[doc + 1]]) for doc in range(len(indptr) - 1)]
+        term_sets = self.term_sets
+        return np.fromiter((min(term_sets[first] & term_sets[second]) == term
+                            for first, second in zip(firsts.tolist(), seconds.tolist())),
+                           dtype=bool, count=len(firsts))
+
+
+class _DocumentVectors:
+    """
+    文档向量集合，用于逐对精确计算相似度
+    计算方式与TermDocumentMatrix一致：整数点积 / 归一化因子
+    """
+
+    def __init__(self, indptr, indices, data, norms, lengths, ownership=None):
+        indptr, indices, data = indptr.tolist(), indices.tolist(), data.tolist()
+        self.vectors = [
+            dict(zip(indices[indptr[doc]:indptr[doc + 1]], data[indptr[doc]:indptr[doc + 1]]))
+            for doc in range(len(indptr) - 1)
+        ]
+        self.norms = norms.tolist()
+        self.lengths = lengths.tolist()
+        self.ownership = ownership
+
+    def verify_blocks(self, tasks, methods, threshold):
+        """
+        tasks: [(分块编号, 分块内升序文档号数组, 起始行, 结束行), ...]
+        每个分块只校验归属于它的文档对，保证同一对文档在所有分块中只校验一次
+        返回: (通过阈值的结果列表, 校验的候选对数量)
+        """
+        matched = []
+        candidates = 0
+        for block, docs, begin, end in tasks:
+            firsts, seconds = _block_pairs(docs, begin, end)
+            owned = self.ownership.owned(block, firsts, seconds)
+            firsts, seconds = firsts[owned].tolist(), seconds[owned].tolist()
+            candidates += len(firsts)
+            matched.extend(self.verify(zip(firsts, seconds), methods, threshold))
+        return matched, candidates
+
+    def verify(self, pairs, methods, threshold):
+        """
+        返回: [(文档号1, 文档号2, {算法: 分数}), ...]，任一算法达到阈值即保留
+        """
+        matched = []
+        for first, second in pairs:
+            vector1, vector2 = self.vectors[first], self.vectors[second]
+            if len(vector1) > len(vector2):
+                vector1, vector2 = vector2, vector1
+            dot_product = 0.0
+            intersection = 0
+            for token_id, count in vector1.items():
+                other = vector2.get(token_id)
+                if other is not None:
+                    dot_product += count * other
+                    intersection += 1
+
+            scores = {}
+            for method in methods:
+                if method == 'jaccard':
+                    union = len(vector1) + len(vector2) - intersection
+                    scores[method] = intersection / union if union else 0.0
+                elif method == 'word_frequency':
+                    denominator = self.lengths[first] * self.lengths[second]
+                    scores[method] = dot_product / denominator if denominator else 0.0
+                else:
+                    denominator = self.norms[first] * self.norms[second]
+                    scores[method] = dot_product / denominator if denominator else 0.0
+            if any(score >= threshold for score in scores.values()):
+                matched.append((first, second, scores))
+        return matched
+
+
+class DuplicateDetector:
+    """
+    语料全量两两重复检测
+    通过分块（blocking）只比较可能相似的文档对，避免O(N²)比较：
+    - lsh: MinHash分段桶，同一桶中的文档成为候选对（适合Jaccard）
+    - rare_terms: 共享至少一个低频词（文档频率不超过max_df）的文档成为候选对
+    候选对按分块逐个展开、边生成边提交给进程池精确打分（不在内存中汇总全部候选对），
+    同一对文档出现在多个分块中时只由第一个分块校验，结果以JSONL流式输出
+    """
+
+    def __init__(self, methods=('jaccard',), threshold=0.8, blocking='lsh',
+                 bands=None, rows=None, max_df=50, workers=None):
+        """
+        methods: 参与判断的相似度算法，任一算法达到阈值即视为重复
+        threshold: 相似度阈值
+        blocking: 分块策略，lsh 或 rare_terms
+        bands, rows: LSH分块参数，都为None时由choose_bands按阈值选择（签名长度NUM_PERM），
+                     只指定其中一个时另一个取 NUM_PERM // 已指定的值
+        max_df: rare_terms分块时低频词的最大文档频率
+        workers: 进程数，None表示使用CPU核数，1表示在当前进程内计算
+        """
+        if isinstance(methods, str):
+            methods = (methods,)
+        for method in methods:
+            if method not in PAIRWISE_METHODS:
+                raise ValueError(f"不支持的相似度算法: {method}")
+        if blocking not in ('lsh', 'rare_terms'):
+            raise ValueError(f"不支持的分块策略: {blocking}")
+        if bands is None and rows is None:
+            bands, rows = choose_bands(threshold, NUM_PERM)
+        elif bands is None:
+            bands = max(NUM_PERM // rows, 1)
+        elif rows is None:
+            rows = max(NUM_PERM // bands, 1)
+
+        self.methods = tuple(methods)
+        self.threshold = threshold
+        self.blocking = blocking
+        self.bands = bands
+        self.rows = rows
+        self.max_df = max_df
+        self.workers = workers or os.cpu_count() or 1
+        self.matcher = SimilarityMatcher()
+        self.stats = {}
+
+    def candidate_blocks(self, matrix):
+        """
+        根据分块策略生成候选分块
+        返回: (分块生成器, 归属规则)，分块为 (分块编号, 升序文档号数组)，只包含两篇以上文档的分块
+        """
+        if self.blocking == 'rare_terms':
+            return self._rare_term_blocks(matrix)
+        return self._lsh_blocks(matrix)
+
+    def _signatures(self, matrix):
+        """
+        批量计算所有文档的MinHash签名（词按字符串哈希，签名与词表中的词ID无关）
+        每个词的哈希值只计算一次，文档签名为其所含词的哈希值按列取最小
+        返回: (文档数, bands * rows) 的uint32数组，空文档的签名全部为MAX_HASH
+        """
+        hasher = MinHasher(self.bands * self.rows)
+        permuted = np.zeros((matrix.n_columns, hasher.num_perm), dtype=np.uint32)
+        token_hashes = vocabulary_hashes(matrix.vocabulary)
+        for begin in range(0, matrix.n_columns, SIGNATURE_CHUNK_SIZE):
+            permuted[begin:begin + SIGNATURE_CHUNK_SIZE] = hasher.permute(token_hashes[begin:begin + SIGNATURE_CHUNK_SIZE])
+
+        signatures = np.full((matrix.n_docs, hasher.num_perm), MAX_HASH, dtype=np.uint32)
+        doc = 0
+        while doc < matrix.n_docs:
+            # 每批包含若干篇完整文档，非零元素数约为SIGNATURE_CHUNK_SIZE
+            last = int(np.searchsorted(matrix.indptr, matrix.indptr[doc] + SIGNATURE_CHUNK_SIZE, side='right')) - 1
+            last = min(max(last, doc + 1), matrix.n_docs)
+            begin, end = matrix.indptr[doc], matrix.indptr[last]
+            starts = matrix.indptr[doc:last] - begin
+            non_empty = starts < matrix.indptr[doc + 1:last + 1] - begin
+            if end > begin:
+                values = permuted[matrix.indices[begin:end]]
+                signatures[doc:last][non_empty] = np.minimum.reduceat(values, starts[non_empty], axis=0)
+            doc = last
+        return signatures
+
+    def _lsh_blocks(self, matrix):
+        """
+        MinHash分段桶：每段签名完全相同的文档为一个分块，分块编号为段号
+        """
+        signatures = self._signatures(matrix)
+        docs = np.flatnonzero(np.diff(matrix.indptr) > 0)
+        band_keys = np.zeros((matrix.n_docs, self.bands), dtype=np.int64)
+        for band in range(self.bands):
+            rows = np.ascontiguousarray(signatures[docs, band * self.rows:(band + 1) * self.rows])
+            _, band_keys[docs, band] = np.unique(rows.view(np.dtype((np.void, rows.shape[1] * 4))).ravel(),
+                                                 return_inverse=True)
+        # 空文档与任何文档的Jaccard相似度都为0，使用互不相同的负数桶编号，不与其他文档同桶
+        empty = np.flatnonzero(np.diff(matrix.indptr) == 0)
+        band_keys[empty] = -1 - empty[:, None]
+
+        def blocks():
+            for band in range(self.bands):
+                keys = band_keys[docs, band]
+                order = np.argsort(keys, kind='stable')
+                starts = np.flatnonzero(np.diff(keys[order], prepend=-1))
+                ends = np.append(starts[1:], len(order))
+                shared = ends - starts > 1
+                for begin, end in zip(starts[shared].tolist(), ends[shared].tolist()):
+                    yield band, docs[order[begin:end]]
+
+        return blocks(), _BandOwnership(band_keys)
+
+    def _rare_term_blocks(self, matrix):
+        """
+        低频词倒排表：文档频率在 [2, max_df] 之间的词，分块编号为词ID
+        """
+        document_frequency = np.bincount(matrix.indices, minlength=matrix.n_columns)
+        rare = (document_frequency >= 2) & (document_frequency <= self.max_df)
+        selected = rare[matrix.indices]
+        terms = matrix.indices[selected]
+        docs = matrix.rows[selected]
+        rare_indptr = np.concatenate(([0], np.cumsum(np.bincount(docs, minlength=matrix.n_docs))))
+        ownership = _TermOwnership(rare_indptr, terms)
+
+        def blocks():
+            order = np.argsort(terms, kind='stable')
+            sorted_terms, sorted_docs = terms[order], docs[order]
+            boundaries = np.flatnonzero(np.diff(sorted_terms)) + 1
+            for begin, end in zip(np.concatenate(([0], boundaries)), np.append(boundaries, len(sorted_terms))):
+                yield int(sorted_terms[begin]), sorted_docs[begin:end]
+
+        return blocks(), ownership
+
+    def _tasks(self, blocks):
+        """
+        将分块切分为任务，每个任务约包含PAIR_CHUNK_SIZE个文档对（超大分块按行拆分到多个任务）
+        返回: 任务生成器，任务为 [(分块编号, 文档号数组, 起始行, 结束行), ...]
+        """
+        task, size = [], 0
+        for block, docs in blocks:
+            begin = 0
+            while begin < len(docs) - 1:
+                end, count = begin, 0
+                while end < len(docs) - 1 and size + count < PAIR_CHUNK_SIZE:
+                    count += len(docs) - 1 - end
+                    end += 1
+                task.append((block, docs, begin, end))
+                size += count
+                begin = end
+                if size >= PAIR_CHUNK_SIZE:
+                    yield task
+                    task, size = [], 0
+        if task:
+            yield task
+
+    def find_pairs(self, articles):
+        """
+        查找所有相似度达到阈值的文章对（生成器，按批次流式返回）
+        返回: {'first': 文章, 'second': 文章, 'scores': {算法: 分数}}
+        """
+        articles = list(articles)
+        matrix = self.matcher.build_matrix(articles)
+        blocks, ownership = self.candidate_blocks(matrix)
+        self.stats = {'documents': len(articles), 'candidate_pairs': 0, 'matched_pairs': 0}
+
+        corpus = (matrix.indptr, matrix.indices, matrix.data, matrix.norms, matrix.lengths, ownership)
+        tasks = self._tasks(blocks)
+        first_tasks = [task for _, task in zip(range(2), tasks)]
+        tasks = chain(first_tasks, tasks)
+        if self.workers <= 1 or len(first_tasks) <= 1:
+            vectors = _DocumentVectors(*corpus)
+            results = (vectors.verify_blocks(task, self.methods, self.threshold) for task in tasks)
+            yield from self._emit(articles, results)
+            return
+
+        # 与打分进程池相同的启动方式（见parallel.START_METHOD），在多线程的进程中调用时不会fork出死锁的子进程
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context(START_METHOD),
+                                 initializer=_init_worker, initargs=corpus) as executor:
+            yield from self._emit(articles, self._submit(executor, tasks))
+
+    def _submit(self, executor, tasks):
+        """
+        边生成任务边提交，按提交顺序返回结果；排队的任务数不超过 workers * PENDING_TASKS_PER_WORKER
+        """
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(_verify_chunk, task, self.methods, self.threshold))
+            if len(pending) >= self.workers * PENDING_TASKS_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def _emit(self, articles, results):
+        for matched, candidates in results:
+            self.stats['candidate_pairs'] += candidates
+            for first, second, scores in matched:
+                self.stats['matched_pairs'] += 1
+                yield {'first': articles[first], 'second': articles[second], 'scores': scores}
+
+    def run(self, articles, output_path):
+        """
+        执行检测并将结果逐行写入JSONL文件
+        返回: 写入的重复对数量
+        """
+        count = 0
+        with open(output_path, 'w', encoding='utf-8') as output:
+            for pair in self.find_pairs(articles):
+                record = {
+                    'first_id': article_key(pair['first']),
+                    'second_id': article_key(pair['second']),
+                    'first_title': pair['first'].get('title', ''),
+                    'second_title': pair['second'].get('title', ''),
+                    'scores': {method: round(score, 6) for method, score in pair['scores'].items()},
+                }
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+                count += 1
+        return count
+
+
+def article_key(article):
+    """
+    文章的唯一标识：优先使用arxiv_id，否则使用id字段中的编号
+    """
+    return article.get('arxiv_id') or article.get('id', '').split('/abs/')[-1]
@@ -0,0 +1,106 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from src.services.pagination import PaginationProcessor
+
+# arXiv API单个查询可翻页的结果上限
+ARXIV_RESULT_WINDOW = 10000
+
+_VERSION_PATTERN = re.compile(r"v(\d+)$")
+
+
+def split_version(article):
+    """
+    拆分文章编号和版本号：优先使用arxiv_id，否则使用id字段（如 http://arxiv.org/abs/2401.00001v2）
+    返回: (不带版本的编号, 版本号)，没有版本号时为0
+    """
+    identifier = article.get("arxiv_id") or (article.get("id") or "").split("/abs/")[-1]
+    match = _VERSION_PATTERN.search(identifier)
+    if match is None:
+        return identifier, 0
+    return identifier[:match.start()], int(match.group(1))
+
+
+def merge_versions(batches):
+    """
+    合并多批结果并按编号去重，同一篇论文保留最新版本（版本号相同时保留updated较晚的）
+    batches: 论文列表的可迭代对象
+    返回: (去重后的论文列表（保持首次出现的位置）, 被去除的重复条目数)
+    """
+    merged = {}
+    duplicates = 0
+    for batch in batches:
+        for article in batch:
+            key, version = split_version(article)
+            current = merged.get(key)
+            if current is None:
+                merged[key] = article
+                continue
+            duplicates += 1
+            current_version = split_version(current)[1]
+            if (version, article.get("updated") or "") > (current_version, current.get("updated") or ""):
+                merged[key] = article
+    return list(merged.values()), duplicates
+
+
+class HarvestPlanner:
+    """
+    按时间分片的并行抓取计划
+    将查询的时间范围拆分为按天（或按小时）的分片，各分片在线程池中并行分页获取，
+    所有请求共用处理器的限流器（默认全局的arxiv_rate_limiter），不会超过arXiv的请求频率；
+    单个分片的结果数远小于整个时间范围，可以避开10000条的深度分页上限
+    """
+
+    def __init__(self, processor=None, workers=4, unit="day"):
+        self.processor = processor or PaginationProcessor()
+        self.workers = workers  # 同时抓取的分片数
+        self.unit = unit  # 分片粒度：day 或 hour
+        self.stats = {"shards": 0, "fetched": 0, "duplicates": 0}
+
+    def plan(self, query_builder):
+        """
+        生成分片查询列表（不修改传入的查询构建器）
+        """
+        return query_builder.split_time_range(self.unit)
+
+    def _harvest_shard(self, shard):
+        entries = self.processor.fetch_all(shard)
+        if len(entries) >= ARXIV_RESULT_WINDOW:
+            print(f"警告: 分片 {shard.params['search_query']} 的结果达到 {ARXIV_RESULT_WINDOW} 条上限，"
+                  f"可能不完整，请使用更细的分片粒度")
+        return entries
+
+    def harvest(self, query_builder, max_total=None):
+        """
+        并行抓取所有分片，按分片顺序（与sortOrder一致）合并，并按编号去重保留最新版本
+        max_total: 合并去重后的最大结果数，None表示获取所有
+        """
+        shards = self.plan(query_builder)
+        self.stats["shards"] = len(shards)
+        print(f"时间范围拆分为 {len(shards)} 个分片")
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(shards)))) as executor:
+            batches = list(executor.map(self._harvest_shard, shards))
+
+        self.stats["fetched"] = sum(len(batch) for batch in batches)
+        articles, self.stats["duplicates"] = merge_versions(batches)
+        if max_total:
+            articles = articles[:max_total]
+
+        print(f"分片抓取完成，共 {self.stats['fetched']} 条，去重后 {len(articles)} 篇论文")
+        return articles
+
+
+# 测试代码
+if __name__ == "__main__":
+    from datetime import datetime, timedelta
+    from src.services.query import QueryBuilder
+
+    builder = QueryBuilder()
+    builder.set_time_range(datetime.now() - timedelta(days=3))
+    builder.add_category_filter("cs.CV")
+
+    planner = HarvestPlanner(PaginationProcessor(batch_size=500), workers=4)
+    papers = planner.harvest(builder)
+    print(f"统计: {planner.stats}")
+    if papers:
+        print(f"第一篇: {papers[0]['title']}")
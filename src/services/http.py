@@ -0,0 +1,57 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# 连接池默认大小，可通过环境变量 HTTP_POOL_CONNECTIONS / HTTP_POOL_MAXSIZE 调整
+DEFAULT_POOL_CONNECTIONS = 10  # 缓存连接池的主机数
+DEFAULT_POOL_MAXSIZE = 20  # 每个主机保持的最大连接数（应不小于并发请求的线程数）
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_session(pool_connections=None, pool_maxsize=None):
+    """
+    创建带连接池的HTTP会话：同一主机的请求复用keep-alive连接，避免每次请求重新进行TCP/TLS握手
+    pool_connections, pool_maxsize: 连接池大小，None表示使用环境变量或默认值
+    """
+    if pool_connections is None:
+        pool_connections = int(os.getenv('HTTP_POOL_CONNECTIONS', DEFAULT_POOL_CONNECTIONS))
+    if pool_maxsize is None:
+        pool_maxsize = int(os.getenv('HTTP_POOL_MAXSIZE', DEFAULT_POOL_MAXSIZE))
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    # 请求压缩传输，响应由requests自动解压
+    session.headers.update({
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive'
+    })
+    return session
+
+
+def get_session():
+    """
+    获取进程内共享的HTTP会话（首次调用时创建）
+    arXiv查询、分类抓取和摘要翻译共用同一个连接池
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def close_session():
+    """
+    关闭共享会话及其连接池
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
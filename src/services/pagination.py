@@ -1,27 +1,156 @@
 import requests
-import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import threading
 import time
 from src.services.query import QueryBuilder
+from src.services.ratelimit import arxiv_rate_limiter
+from src.services.http import get_session
+from src.services.atom import AtomStreamParser, ATOM_NS, DEFAULT_BACKEND
+from src.services.cache import OfflineCacheMiss
+from src.services.batching import AdaptiveBatchSizer, DEFAULT_MIN_BATCH_SIZE, DEFAULT_MAX_BATCH_SIZE
+
+
+class _RecordingReader:
+    """
+    读取数据流的同时统计字节数，keep为True时保留已读取的内容，流式解析完成后可将完整响应写入缓存
+    """
+    def __init__(self, stream, keep=True):
+        self.stream = stream
+        self.keep = keep
+        self.chunks = []
+        self.nbytes = 0
+    
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        if data:
+            self.nbytes += len(data)
+            if self.keep:
+                self.chunks.append(data)
+        return data
+    
+    def getvalue(self):
+        return b"".join(self.chunks).decode("utf-8")
+
 
 class PaginationProcessor:
-    def __init__(self, batch_size=100, max_retries=3, retry_delay=5):
-        self.batch_size = batch_size  # 每次请求的结果数
+    def __init__(self, batch_size=100, max_retries=3, retry_delay=5, workers=1, rate_limiter=None,
+                 parser_backend=None, cache=None, adaptive=False, min_batch_size=DEFAULT_MIN_BATCH_SIZE,
+                 max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+        self.batch_size = batch_size  # 每次请求的结果数（自适应模式下为初始值）
         self.max_retries = max_retries  # 最大重试次数
         self.retry_delay = retry_delay  # 重试延迟（秒）
+        self.workers = workers  # fetch_all并发请求的线程数，1表示逐页顺序获取
+        self.rate_limiter = rate_limiter or arxiv_rate_limiter  # 请求限流器，默认所有处理器共用
         self.query_builder = QueryBuilder()
-        self.ns = {"atom": "http://www.w3.org/2005/Atom", "arxiv": "http://arxiv.org/schemas/atom"}
+        self.ns = ATOM_NS
+        self.parser_backend = parser_backend or DEFAULT_BACKEND  # Atom解析后端：etree 或 lxml
+        self.cache = cache  # 可选的磁盘响应缓存（ResponseCache）
+        # 自适应模式：根据请求耗时、响应大小和失败情况逐页调整批次大小
+        # （离线回放时没有网络请求可供调整，使用固定批次大小）
+        if adaptive and not (cache is not None and cache.offline):
+            self.batch_sizer = AdaptiveBatchSizer(batch_size, min_batch_size, max_batch_size)
+        else:
+            self.batch_sizer = None
+        # 网络请求统计：每次请求使用的批次大小、耗时（秒）和响应大小（字节）
+        self.stats = {"requests": 0, "failures": 0, "batch_sizes": [], "latencies": [], "bytes": []}
+        self._stats_lock = threading.Lock()
         
-    def fetch_batch(self, url, params):
+    def page_size(self):
         """
-        获取单个批次的数据
+        下一页请求的批次大小
         """
+        if self.batch_sizer is not None:
+            return self.batch_sizer.next_size()
+        return self.batch_size
+    
+    def record_request(self, size, latency=None, nbytes=None, failed=False):
+        """
+        记录一次网络请求的结果，自适应模式下据此调整后续的批次大小
+        """
+        with self._stats_lock:
+            if failed:
+                self.stats["failures"] += 1
+            else:
+                self.stats["requests"] += 1
+                self.stats["batch_sizes"].append(size)
+                self.stats["latencies"].append(latency)
+                self.stats["bytes"].append(nbytes)
+        if self.batch_sizer is not None:
+            if failed:
+                self.batch_sizer.record_failure(size)
+            else:
+                self.batch_sizer.record_success(size, latency, nbytes)
+        
+    def cached_response(self, url, params):
+        """
+        从磁盘缓存读取响应文本，未启用缓存或未命中时返回None
+        离线回放模式下没有完全相同的请求时，按起始位置读取（自适应模式缓存的页面批次大小各不相同，
+        返回的条数可能与max_results不同），仍未命中时抛出OfflineCacheMiss
+        """
+        if self.cache is None:
+            return None
+        text = self.cache.get(url, params)
+        if text is None and self.cache.offline:
+            text = self.cache.get_page(url, params)
+            if text is None:
+                raise OfflineCacheMiss(f"离线模式下缓存中没有该请求 - 起始位置: {params.get('start', 0)}")
+        return text
+    
+    def fetch_batch(self, url, params, resizable=False):
+        """
+        获取单个批次的数据（启用缓存时优先读取缓存，成功的响应写入缓存）
+        resizable: 自适应模式下失败重试时是否按减小后的批次大小重新请求（修改params中的max_results），
+        仅适用于按实际返回条数推进起始位置的调用方
+        """
+        cached = self.cached_response(url, params)
+        if cached is not None:
+            return cached
+        
         for attempt in range(self.max_retries):
             try:
+                if resizable and attempt > 0 and self.batch_sizer is not None:
+                    params["max_results"] = min(int(params["max_results"]), self.batch_sizer.next_size())
+                # 按arXiv要求的速率发送请求
+                self.rate_limiter.acquire()
                 print(f"正在请求数据 - 起始位置: {params.get('start', 0)}, 数量: {params.get('max_results', 100)}")
-                response = requests.get(url, params=params, timeout=30)
+                request_time = time.perf_counter()
+                response = get_session().get(url, params=params, timeout=30)
                 response.raise_for_status()
-                return response.text
+                text = response.text
+                self.record_request(int(params.get("max_results", self.batch_size)),
+                                    time.perf_counter() - request_time, len(response.content))
+                if self.cache is not None:
+                    self.cache.set(url, params, text)
+                return text
             except requests.exceptions.RequestException as e:
+                self.record_request(int(params.get("max_results", self.batch_size)), failed=True)
+                print(f"请求失败 (尝试 {attempt + 1}/{self.max_retries}): {e}")
+                if attempt < self.max_retries - 1:
+                    print(f"{self.retry_delay}秒后重试...")
+                    time.sleep(self.retry_delay)
+                else:
+                    print("达到最大重试次数，请求失败")
+                    raise
+    
+    def open_stream(self, url, params, resizable=False):
+        """
+        发起流式请求，返回尚未读取响应体的响应对象（连接失败或状态码错误时按fetch_batch的规则重试）
+        """
+        for attempt in range(self.max_retries):
+            try:
+                if resizable and attempt > 0 and self.batch_sizer is not None:
+                    params["max_results"] = min(int(params["max_results"]), self.batch_sizer.next_size())
+                # 按arXiv要求的速率发送请求
+                self.rate_limiter.acquire()
+                print(f"正在请求数据 - 起始位置: {params.get('start', 0)}, 数量: {params.get('max_results', 100)}")
+                response = get_session().get(url, params=params, timeout=30, stream=True)
+                response.raise_for_status()
+                # 由urllib3自动解压gzip等压缩编码
+                response.raw.decode_content = True
+                return response
+            except requests.exceptions.RequestException as e:
+                self.record_request(int(params.get("max_results", self.batch_size)), failed=True)
                 print(f"请求失败 (尝试 {attempt + 1}/{self.max_retries}): {e}")
                 if attempt < self.max_retries - 1:
                     print(f"{self.retry_delay}秒后重试...")
@@ -32,87 +161,59 @@ class PaginationProcessor:
     
     def parse_response(self, xml_text):
         """
-        解析arXiv API返回的XML数据
+        解析arXiv API返回的XML数据（流式解析，不构建完整的元素树）
         """
-        root = ET.fromstring(xml_text)
-        entries = []
-        
-        # 获取总结果数
-        total_results = root.find("./atom:totalResults", self.ns)
-        total = int(total_results.text) if total_results is not None else 0
-        
-        # 解析每条论文数据
-        for entry in root.findall("./atom:entry", self.ns):
-            paper = {
-                "id": entry.find("./atom:id", self.ns).text if entry.find("./atom:id", self.ns) is not None else "",
-                "title": entry.find("./atom:title", self.ns).text.strip() if entry.find("./atom:title", self.ns) is not None else "",
-                "summary": entry.find("./atom:summary", self.ns).text.strip() if entry.find("./atom:summary", self.ns) is not None else "",
-                "published": entry.find("./atom:published", self.ns).text if entry.find("./atom:published", self.ns) is not None else "",
-                "updated": entry.find("./atom:updated", self.ns).text if entry.find("./atom:updated", self.ns) is not None else "",
-                "categories": [],
-                "authors": [],
-                "links": []
-            }
-            
-            # 解析分类
-            for category in entry.findall("./atom:category", self.ns):
-                if category.get("term"):
-                    paper["categories"].append(category.get("term"))
-            
-            # 解析作者
-            for author in entry.findall("./atom:author", self.ns):
-                name = author.find("./atom:name", self.ns)
-                if name is not None:
-                    paper["authors"].append(name.text.strip())
-            
-            # 解析链接
-            for link in entry.findall("./atom:link", self.ns):
-                link_dict = {
-                    "href": link.get("href"),
-                    "rel": link.get("rel"),
-                    "type": link.get("type")
-                }
-                paper["links"].append(link_dict)
-            
-            # 解析arXiv特定字段
-            arxiv_id = entry.find("./arxiv:id", self.ns)
-            if arxiv_id is not None:
-                paper["arxiv_id"] = arxiv_id.text
-            
-            arxiv_doi = entry.find("./arxiv:doi", self.ns)
-            if arxiv_doi is not None:
-                paper["doi"] = arxiv_doi.text
-            
-            entries.append(paper)
-        
-        return {
-            "total_results": total,
-            "entries": entries
-        }
+        return AtomStreamParser(self.ns, self.parser_backend).parse(xml_text)
+    
+    def fetch_page(self, url, base_params, start, size=None, resizable=False):
+        """
+        获取并解析从start开始的一页结果
+        size: 该页的批次大小，None表示使用base_params中的max_results
+        resizable: 见fetch_batch
+        """
+        params = base_params.copy()
+        params["start"] = start
+        if size is not None:
+            params["max_results"] = size
+        return self.parse_response(self.fetch_batch(url, params, resizable))
     
     def fetch_all(self, query_builder, max_total=None):
         """
         分页获取所有结果
         query_builder: QueryBuilder对象，已配置好查询参数
         max_total: 最大获取结果数，None表示获取所有
+        workers大于1时，第一页确定总结果数后其余页面并发请求（仍受限流器约束），结果按起始位置排序
+        自适应模式下每页的批次大小由batch_sizer决定，可通过stats["batch_sizes"]查看
+        离线回放时逐页顺序读取缓存，按实际返回的条数推进起始位置，与缓存时的页面边界一致
         """
-        all_entries = []
-        start = 0
-        
         # 设置批次大小
         query_builder.set_max_results(self.batch_size)
         
         # 获取初始URL和参数
         url, base_params = query_builder.build()
         
+        if self.workers > 1 and not (self.cache is not None and self.cache.offline):
+            all_entries = self._fetch_concurrently(url, base_params, max_total)
+        else:
+            all_entries = self._fetch_sequentially(url, base_params, max_total)
+        
+        # 如果设置了最大结果数，截断结果
+        if max_total:
+            all_entries = all_entries[:max_total]
+        
+        print(f"完成数据获取，共获取 {len(all_entries)} 篇论文")
+        return all_entries
+    
+    def _fetch_sequentially(self, url, base_params, max_total):
+        """
+        逐页顺序获取（请求间隔由限流器控制）
+        """
+        all_entries = []
+        start = 0
+        
         while True:
-            # 更新起始位置
-            params = base_params.copy()
-            params["start"] = start
-            
             # 获取当前批次数据
-            xml_text = self.fetch_batch(url, params)
-            result = self.parse_response(xml_text)
+            result = self.fetch_page(url, base_params, start, self.page_size(), resizable=True)
             
             # 添加到结果列表
             all_entries.extend(result["entries"])
@@ -125,17 +226,132 @@ class PaginationProcessor:
             
             if (max_total and len(all_entries) >= max_total) or start >= result["total_results"] or len(result["entries"]) == 0:
                 break
+        
+        return all_entries
+    
+    def _fetch_concurrently(self, url, base_params, max_total):
+        """
+        并发获取：第一页返回总结果数后，在线程池中按起始位置依次派发其余页面，
+        已知到达结果末尾（总结果数、max_total或出现空页）后不再派发新的请求
+        页面返回的条数少于请求的批次大小（且未到结果末尾）时，优先补充请求该页缺失的部分，
+        保证按起始位置拼接的结果没有空缺；多于批次大小的部分与下一页重叠，予以丢弃
+        """
+        first_size = self.page_size()
+        first = self.fetch_page(url, base_params, 0, first_size)
+        total = first["total_results"]
+        limit = min(total, max_total) if max_total else total
+        pages = {}
+        # 待补充的页面缺口 [(起始位置, 条数), ...]
+        gaps = deque()
+        
+        def record(start, size, entries):
+            entries = entries[:size]
+            pages[start] = entries
+            end = start + len(entries)
+            if entries and len(entries) < size and end < limit:
+                print(f"警告: 起始位置 {start} 的页面只返回 {len(entries)} / {size} 篇论文，补充请求剩余部分")
+                gaps.append((end, size - len(entries)))
+            return len(entries)
+        
+        fetched = record(0, first_size, first["entries"])
+        print(f"已获取 {fetched} / {total} 篇论文")
+        if not first["entries"]:
+            return []
+        
+        # 下一个待派发页面的起始位置（自适应模式下各页大小可能不同）
+        position = [first_size]
+        running = {}
+        exhausted = False
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            def dispatch():
+                if gaps:
+                    start, size = gaps.popleft()
+                elif position[0] < limit:
+                    start, size = position[0], self.page_size()
+                    position[0] += size
+                else:
+                    return
+                running[executor.submit(self.fetch_page, url, base_params, start, size)] = (start, size)
+            
+            for _ in range(self.workers):
+                dispatch()
             
-            # 防止请求过快，添加延迟
-            print("等待1秒后继续请求...")
-            time.sleep(1)
+            try:
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        start, size = running.pop(future)
+                        entries = future.result()["entries"]
+                        fetched += record(start, size, entries)
+                        print(f"已获取 {fetched} / {total} 篇论文")
+                        # 出现空页说明已到结果末尾
+                        if not entries:
+                            exhausted = True
+                        if not exhausted:
+                            # 补充缺口后仍保持workers个请求在进行
+                            while gaps and len(running) < self.workers:
+                                dispatch()
+                            dispatch()
+            except Exception:
+                for future in running:
+                    future.cancel()
+                raise
         
-        # 如果设置了最大结果数，截断结果
-        if max_total:
-            all_entries = all_entries[:max_total]
+        # 按起始位置还原页面顺序
+        return [entry for start in sorted(pages) for entry in pages[start]]
+    
+    def iter_all(self, query_builder, max_total=None):
+        """
+        分页获取所有结果的生成器：边接收响应边解析，每解析出一篇论文立即返回，
+        下游（如SimilarityMatcher.rank_stream）无需等待整页或全部结果下载完成
+        query_builder: QueryBuilder对象，已配置好查询参数
+        max_total: 最大获取结果数，None表示获取所有
+        """
+        query_builder.set_max_results(self.batch_size)
+        url, base_params = query_builder.build()
         
-        print(f"完成数据获取，共获取 {len(all_entries)} 篇论文")
-        return all_entries
+        count = 0
+        start = 0
+        while True:
+            params = base_params.copy()
+            params["start"] = start
+            params["max_results"] = self.page_size()
+            
+            parser = AtomStreamParser(self.ns, self.parser_backend)
+            source = self.cached_response(url, params)
+            response = None
+            if source is None:
+                request_time = time.perf_counter()
+                response = self.open_stream(url, params, resizable=True)
+                # 统计读取的字节数；启用缓存时记录读取的内容，整页解析完成后写入缓存
+                source = _RecordingReader(response.raw, keep=self.cache is not None)
+            consumer_time = 0.0  # 下游处理论文占用的时间，不计入请求耗时
+            try:
+                for paper in parser.iter_entries(source):
+                    paused = time.perf_counter()
+                    yield paper
+                    consumer_time += time.perf_counter() - paused
+                    count += 1
+                    if max_total and count >= max_total:
+                        return
+            finally:
+                if response is not None:
+                    response.close()
+            
+            if response is not None:
+                self.record_request(params["max_results"], time.perf_counter() - request_time - consumer_time,
+                                    source.nbytes)
+                if self.cache is not None:
+                    self.cache.set(url, params, source.getvalue())
+            
+            total = parser.total_results or 0
+            print(f"已获取 {count} / {total} 篇论文")
+            
+            # 检查是否已获取所有结果
+            start += parser.count
+            if start >= total or parser.count == 0:
+                break
     
     def fetch_single_batch(self, query_builder):
         """
@@ -145,6 +361,8 @@ class PaginationProcessor:
         url, params = query_builder.build()
         xml_text = self.fetch_batch(url, params)
         result = self.parse_response(xml_text)
+        # 离线回放按起始位置读到的页面可能大于批次大小
+        result["entries"] = result["entries"][:self.batch_size]
         return result
 
 # 测试代码
@@ -167,6 +385,11 @@ if __name__ == "__main__":
     all_papers = processor.fetch_all(builder, max_total=100)
     print(f"最终获取: {len(all_papers)} 篇论文")
     
+    # 测试流式获取
+    print("\n测试3 - 流式获取前100篇论文:")
+    streamed = sum(1 for _ in processor.iter_all(builder, max_total=100))
+    print(f"流式获取: {streamed} 篇论文")
+    
     # 打印第一篇论文的基本信息
     if all_papers:
         print("\n第一篇论文信息:")
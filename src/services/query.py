@@ -1,6 +1,17 @@
+import copy
 from datetime import datetime, timedelta
 
+# 时间分片的粒度：按天或按小时
+SHARD_UNITS = {"day": timedelta(days=1), "hour": timedelta(hours=1)}
+
 class QueryBuilder:
+    """
+    arXiv查询构建器
+    查询条件以结构化形式保存：时间范围（set_time_range精确到天，分片可精确到分钟）、分类组和关键词组，
+    每次调用add_*_filter添加一个OR组，各条件之间为AND关系；
+    build时按规范顺序（组内、组间均排序）生成search_query，
+    因此条件相同但添加顺序不同的查询得到相同的请求参数和canonical_key
+    """
     def __init__(self):
         self.base_url = "http://export.arxiv.org/api/query"
         self.params = {
@@ -10,6 +21,9 @@ class QueryBuilder:
             "sortBy": "submittedDate",
             "sortOrder": "descending"
         }
+        self.time_ranges = set()  # {(起始时间YYYYMMDDHHMM, 结束时间YYYYMMDDHHMM)}，两端均包含
+        self.category_groups = set()  # {frozenset(分类ID)}
+        self.keyword_groups = set()  # {frozenset(关键词)}
         
     def set_time_range(self, start_date=None, end_date=None):
         """
@@ -21,21 +35,24 @@ class QueryBuilder:
         if not start_date:
             start_date = end_date - timedelta(days=1)
         
-        # 格式化为YYYYMMDD格式
+        # 格式化为YYYYMMDD格式（时间范围按天取整）
         start_str = start_date.strftime("%Y%m%d")
         end_str = end_date.strftime("%Y%m%d")
         
         # 更新查询条件
-        time_filter = f"submittedDate:[{start_str}0000 TO {end_str}2359]"
-        
-        # 如果已有查询条件，添加AND，否则直接设置
-        if self.params["search_query"]:
-            self.params["search_query"] += f" AND {time_filter}"
-        else:
-            self.params["search_query"] = time_filter
+        self.time_ranges.add((start_str + "0000", end_str + "2359"))
+        self._update_search_query()
         
         return self
     
+    def clear_time_range(self):
+        """
+        清除已设置的时间范围
+        """
+        self.time_ranges = set()
+        self._update_search_query()
+        return self
+    
     def add_category_filter(self, categories):
         """
         添加分类过滤
@@ -48,18 +65,11 @@ class QueryBuilder:
         if isinstance(categories, str):
             categories = [categories]
         
-        # 构建分类查询条件
-        category_conditions = []
-        for category in categories:
-            category_conditions.append(f"cat:{category}")
-        
-        category_filter = f"({' OR '.join(category_conditions)})"
-        
-        # 如果已有查询条件，添加AND，否则直接设置
-        if self.params["search_query"]:
-            self.params["search_query"] += f" AND {category_filter}"
-        else:
-            self.params["search_query"] = category_filter
+        # 分类组（去除空白和重复）
+        group = frozenset(category.strip() for category in categories if category and category.strip())
+        if group:
+            self.category_groups.add(group)
+            self._update_search_query()
         
         return self
     
@@ -75,20 +85,80 @@ class QueryBuilder:
         if isinstance(keywords, str):
             keywords = [keywords]
         
-        # 构建关键词查询条件
-        keyword_conditions = []
-        for keyword in keywords:
-            keyword_conditions.append(f"all:{keyword}")
+        # 关键词组（arXiv检索不区分大小写，统一为小写并合并多余空白）
+        group = frozenset(" ".join(keyword.lower().split()) for keyword in keywords if keyword and keyword.strip())
+        if group:
+            self.keyword_groups.add(group)
+            self._update_search_query()
+        
+        return self
+    
+    def _update_search_query(self):
+        """
+        按规范顺序由结构化条件生成search_query：时间范围、分类组、关键词组，组内和组间均排序
+        """
+        filters = [f"submittedDate:[{start} TO {end}]" for start, end in sorted(self.time_ranges)]
+        for prefix, groups in (("cat", self.category_groups), ("all", self.keyword_groups)):
+            for group in sorted(sorted(group) for group in groups):
+                filters.append(f"({' OR '.join(f'{prefix}:{value}' for value in group)})")
+        self.params["search_query"] = " AND ".join(filters)
+    
+    def canonical_key(self):
+        """
+        规范化的可哈希查询键：条件相同的查询（与添加顺序、重复条件、时间范围中的时分秒无关）得到相同的键，
+        可用于响应缓存和合并重复的进行中请求
+        """
+        return (
+            self.base_url,
+            tuple(sorted(self.time_ranges)),
+            tuple(sorted(tuple(sorted(group)) for group in self.category_groups)),
+            tuple(sorted(tuple(sorted(group)) for group in self.keyword_groups)),
+            self.params["sortBy"],
+            self.params["sortOrder"],
+            int(self.params["start"]),
+            int(self.params["max_results"])
+        )
+    
+    def copy(self):
+        """
+        复制查询构建器（结构化条件和请求参数互不影响）
+        """
+        return copy.deepcopy(self)
+    
+    def split_time_range(self, unit="day"):
+        """
+        将时间范围拆分为按天或按小时的分片，每个分片是一个只包含该时间段的查询构建器，
+        其余条件与当前查询相同；用于并行抓取，并避免单个查询超出arXiv的10000条分页上限
+        unit: day 或 hour
+        多个时间范围取交集；未设置时间范围时使用默认时间范围（昨天到今天）
+        返回: 查询构建器列表，顺序与sortOrder一致（descending时由近到远）
+        """
+        if unit not in SHARD_UNITS:
+            raise ValueError(f"不支持的分片粒度: {unit}")
+        # 只设置了分类或关键词时build()不会补充默认时间范围，这里使用默认时间范围（不修改当前查询）
+        time_ranges = self.time_ranges or QueryBuilder().set_time_range().time_ranges
         
-        keyword_filter = f"({' OR '.join(keyword_conditions)})"
+        # 多个时间范围为AND关系，取交集
+        start = datetime.strptime(max(start for start, _ in time_ranges), "%Y%m%d%H%M")
+        end = datetime.strptime(min(end for _, end in time_ranges), "%Y%m%d%H%M")
+        step = SHARD_UNITS[unit]
         
-        # 如果已有查询条件，添加AND，否则直接设置
-        if self.params["search_query"]:
-            self.params["search_query"] += f" AND {keyword_filter}"
-        else:
-            self.params["search_query"] = keyword_filter
+        shards = []
+        # 分片边界按天/小时对齐，首尾分片截取到原时间范围
+        shard_start = start.replace(minute=0) if unit == "hour" else start.replace(hour=0, minute=0)
+        while shard_start <= end:
+            shard_end = shard_start + step - timedelta(minutes=1)
+            shard = self.copy()
+            shard.time_ranges = {(max(shard_start, start).strftime("%Y%m%d%H%M"),
+                                  min(shard_end, end).strftime("%Y%m%d%H%M"))}
+            shard.set_start(0)
+            shard._update_search_query()
+            shards.append(shard)
+            shard_start += step
         
-        return self
+        if self.params["sortOrder"] == "descending":
+            shards.reverse()
+        return shards
     
     def set_start(self, start):
         """
@@ -128,7 +198,7 @@ class QueryBuilder:
         返回格式: (url, params)
         """
         # 如果没有设置任何查询条件，默认使用昨天的时间范围
-        if not self.params["search_query"]:
+        if not (self.time_ranges or self.category_groups or self.keyword_groups):
             self.set_time_range()
         
         return self.base_url, self.params
@@ -144,6 +214,9 @@ class QueryBuilder:
             "sortBy": "submittedDate",
             "sortOrder": "descending"
         }
+        self.time_ranges = set()
+        self.category_groups = set()
+        self.keyword_groups = set()
         return self
 
 # 测试代码
@@ -173,4 +246,16 @@ if __name__ == "__main__":
     .build()
     print("\n测试3 - 复杂查询:")
     print(f"URL: {url}")
-    print(f"参数: {params}")
\ No newline at end of file
+    print(f"参数: {params}")
+    
+    # 测试4: 条件顺序不同的查询得到相同的规范键
+    key1 = QueryBuilder().add_category_filter(["cs.AI", "cs.CV"]).add_keyword_filter("Vision").canonical_key()
+    key2 = QueryBuilder().add_keyword_filter("vision").add_category_filter(["cs.CV", "cs.AI"]).canonical_key()
+    print("\n测试4 - 规范查询键:")
+    print(f"键相同: {key1 == key2}")
+    
+    # 测试5: 按天拆分时间范围
+    shards = QueryBuilder().set_time_range(datetime.now() - timedelta(days=3)).add_category_filter("cs.CV").split_time_range()
+    print("\n测试5 - 时间分片:")
+    for shard in shards:
+        print(shard.build()[1]["search_query"])
\ No newline at end of file
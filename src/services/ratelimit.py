@@ -0,0 +1,44 @@
+import threading
+import time
+
+# arXiv API使用条款要求的请求间隔（秒）：连续请求之间至少间隔3秒
+ARXIV_REQUEST_INTERVAL = 3.0
+
+
+class RateLimiter:
+    """
+    令牌桶限流器（线程安全）
+    令牌以rate个/秒的速度补充，最多积累capacity个；每次请求消耗一个令牌，
+    令牌不足时预约下一个令牌并等待，多个线程按到达顺序依次放行
+    """
+
+    def __init__(self, rate, capacity=1):
+        """
+        rate: 每秒补充的令牌数
+        capacity: 令牌桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        获取一个令牌，必要时阻塞等待
+        返回: 等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # 令牌数可以为负，表示已被排队的请求预约
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+# 所有arXiv请求共用的限流器，保证并发获取时整体请求速率仍符合arXiv的要求
+arxiv_rate_limiter = RateLimiter(rate=1.0 / ARXIV_REQUEST_INTERVAL)
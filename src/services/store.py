@@ -0,0 +1,294 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from src.services.pagination import PaginationProcessor
+from src.services.harvest import split_version
+
+# 本地语料库的默认路径，可通过环境变量 CORPUS_DB 调整
+DEFAULT_CORPUS_DB = os.path.join(".cache", "corpus.sqlite3")
+# 同步时每写入多少篇论文提交一次事务
+SYNC_COMMIT_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    arxiv_id TEXT PRIMARY KEY,          -- 不带版本号的arXiv编号
+    version INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    published TEXT NOT NULL,
+    updated TEXT NOT NULL,
+    authors TEXT NOT NULL,              -- JSON数组
+    categories TEXT NOT NULL,           -- JSON数组
+    links TEXT NOT NULL,                -- JSON数组
+    doi TEXT
+);
+CREATE INDEX IF NOT EXISTS papers_published ON papers (published);
+CREATE INDEX IF NOT EXISTS papers_updated ON papers (updated, arxiv_id);
+CREATE TABLE IF NOT EXISTS paper_categories (
+    category TEXT NOT NULL,
+    arxiv_id TEXT NOT NULL,
+    PRIMARY KEY (category, arxiv_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS paper_categories_paper ON paper_categories (arxiv_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    scope TEXT PRIMARY KEY,             -- 同步范围（分类和关键词条件）
+    last_updated TEXT NOT NULL,         -- 已同步论文中最新的updated时间
+    last_arxiv_id TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+"""
+
+# 同一篇论文只保留最新版本（版本号相同时保留updated较晚的）
+_UPSERT = """
+INSERT INTO papers (arxiv_id, version, id, title, summary, published, updated, authors, categories, links, doi)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (arxiv_id) DO UPDATE SET
+    version = excluded.version, id = excluded.id, title = excluded.title, summary = excluded.summary,
+    published = excluded.published, updated = excluded.updated, authors = excluded.authors,
+    categories = excluded.categories, links = excluded.links, doi = excluded.doi
+WHERE excluded.version > papers.version
+   OR (excluded.version = papers.version AND excluded.updated > papers.updated)
+"""
+
+
+def _to_iso(timestamp):
+    """
+    将查询构建器中的YYYYMMDDHHMM转换为与published字段可直接比较的ISO格式前缀
+    """
+    return datetime.strptime(timestamp, "%Y%m%d%H%M").strftime("%Y-%m-%dT%H:%M")
+
+
+class CorpusStore:
+    """
+    基于SQLite的本地论文语料库
+    论文按不带版本号的arXiv编号存储，只保留最新版本；分类单独建表并建立索引，
+    可以用同一个QueryBuilder从本地查询候选论文（select），不再依赖arXiv接口；
+    sync按updated时间增量同步：每个同步范围记录已同步的最新updated时间和编号，
+    之后按lastUpdatedDate倒序获取，遇到更早的论文即停止，只获取新增和更新的论文
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("CORPUS_DB", DEFAULT_CORPUS_DB)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()  # sqlite连接不能跨线程使用，每个线程一个连接
+        with self.connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def connection(self):
+        """
+        当前线程的数据库连接（首次使用时创建）
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            # WAL模式下同步写入时仍可并发读取
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """
+        关闭当前线程的数据库连接
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def count(self):
+        """
+        语料库中的论文数
+        """
+        return self.connection().execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    def upsert(self, articles):
+        """
+        写入论文（已存在时只在版本更新时覆盖）
+        articles: 论文字典的可迭代对象（PaginationProcessor返回的格式）
+        返回: 处理的论文数
+        """
+        conn = self.connection()
+        count = 0
+        with conn:
+            for article in articles:
+                arxiv_id, version = split_version(article)
+                if not arxiv_id:
+                    continue
+                cursor = conn.execute(_UPSERT, (
+                    arxiv_id, version, article.get("id") or "", article.get("title") or "",
+                    article.get("summary") or "", article.get("published") or "", article.get("updated") or "",
+                    json.dumps(article.get("authors", []), ensure_ascii=False),
+                    json.dumps(article.get("categories", []), ensure_ascii=False),
+                    json.dumps(article.get("links", []), ensure_ascii=False),
+                    article.get("doi")
+                ))
+                # 写入了新版本时重建分类索引（新版本的分类可能变化）
+                if cursor.rowcount:
+                    conn.execute("DELETE FROM paper_categories WHERE arxiv_id = ?", (arxiv_id,))
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO paper_categories (category, arxiv_id) VALUES (?, ?)",
+                        [(category, arxiv_id) for category in article.get("categories", [])]
+                    )
+                count += 1
+        return count
+
+    def select(self, query_builder, limit=None):
+        """
+        按QueryBuilder的条件从本地查询论文：时间范围对应published，分类组和关键词组（标题或摘要包含）为AND关系
+        排序方式与sortBy/sortOrder一致（relevance按发布时间排序）
+        limit: 最大结果数，None表示使用查询构建器的max_results
+        返回: 论文字典列表（与PaginationProcessor返回的格式相同）
+        """
+        conditions = []
+        args = []
+        for start, end in query_builder.time_ranges:
+            # 结束时间包含该分钟
+            end_exclusive = datetime.strptime(end, "%Y%m%d%H%M") + timedelta(minutes=1)
+            conditions.append("published >= ? AND published < ?")
+            args += [_to_iso(start), end_exclusive.strftime("%Y-%m-%dT%H:%M")]
+        for group in query_builder.category_groups:
+            conditions.append("EXISTS (SELECT 1 FROM paper_categories c WHERE c.arxiv_id = papers.arxiv_id "
+                              f"AND c.category IN ({', '.join('?' * len(group))}))")
+            args += sorted(group)
+        for group in query_builder.keyword_groups:
+            conditions.append("(" + " OR ".join("lower(title || ' ' || summary) LIKE ?" for _ in group) + ")")
+            args += [f"%{keyword}%" for keyword in sorted(group)]
+
+        order_column = "updated" if query_builder.params["sortBy"] == "lastUpdatedDate" else "published"
+        order = "ASC" if query_builder.params["sortOrder"] == "ascending" else "DESC"
+        sql = "SELECT * FROM papers"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {order_column} {order}, arxiv_id {order} LIMIT ?"
+        args.append(query_builder.params["max_results"] if limit is None else limit)
+
+        return [self._to_article(row) for row in self.connection().execute(sql, args)]
+
+    def _to_article(self, row):
+        """
+        数据库行转换为论文字典；arxiv_id由编号和版本号还原，与写入时split_version解析的标识一致
+        """
+        arxiv_id = row["arxiv_id"] + (f"v{row['version']}" if row["version"] else "")
+        article = {
+            "id": row["id"],
+            "arxiv_id": arxiv_id,
+            "title": row["title"],
+            "summary": row["summary"],
+            "published": row["published"],
+            "updated": row["updated"],
+            "categories": json.loads(row["categories"]),
+            "authors": json.loads(row["authors"]),
+            "links": json.loads(row["links"])
+        }
+        if row["doi"]:
+            article["doi"] = row["doi"]
+        return article
+
+    @staticmethod
+    def scope(query_builder):
+        """
+        同步范围的标识：查询构建器的分类和关键词条件（与时间范围无关）
+        """
+        key = query_builder.canonical_key()
+        return json.dumps([key[2], key[3]], ensure_ascii=False)
+
+    def sync_state(self, query_builder):
+        """
+        同步范围的同步状态，从未同步时返回None
+        """
+        row = self.connection().execute("SELECT * FROM sync_state WHERE scope = ?",
+                                        (self.scope(query_builder),)).fetchone()
+        return dict(row) if row else None
+
+    def sync(self, query_builder, processor=None):
+        """
+        增量同步：
+        首次同步获取查询构建器时间范围内的所有论文；
+        之后忽略时间范围，按lastUpdatedDate倒序获取该范围内的论文，遇到updated早于上次同步记录的论文即停止
+        processor: 分页处理器，None表示使用默认的PaginationProcessor
+        返回: 同步统计 {"fetched", "stored", "last_updated", "incremental"}
+        """
+        processor = processor or PaginationProcessor()
+        state = self.sync_state(query_builder)
+        builder = query_builder.copy()
+        builder.set_sort("lastUpdatedDate", "descending")
+        if state is not None:
+            builder.clear_time_range()
+        watermark = (state["last_updated"], state["last_arxiv_id"]) if state else None
+
+        stats = {"fetched": 0, "stored": 0, "last_updated": state["last_updated"] if state else None,
+                 "incremental": state is not None}
+        newest = watermark
+        batch = []
+        papers = processor.iter_all(builder)
+        try:
+            for article in papers:
+                updated = article.get("updated") or ""
+                # 按updated倒序返回，更早的论文在上次同步时已经获取
+                if watermark is not None and updated < watermark[0]:
+                    break
+                stats["fetched"] += 1
+                position = (updated, split_version(article)[0])
+                if watermark is not None and position <= watermark:
+                    continue
+                if newest is None or position > newest:
+                    newest = position
+                batch.append(article)
+                if len(batch) >= SYNC_COMMIT_SIZE:
+                    stats["stored"] += self.upsert(batch)
+                    batch = []
+        finally:
+            papers.close()
+        stats["stored"] += self.upsert(batch)
+
+        # 全部写入后再更新同步状态，中断的同步下次会重新获取
+        if newest is not None:
+            with self.connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (scope, last_updated, last_arxiv_id, synced_at) VALUES (?, ?, ?, ?)",
+                    (self.scope(query_builder), newest[0], newest[1], time.time())
+                )
+            stats["last_updated"] = newest[0]
+        return stats
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_corpus_store():
+    """
+    获取进程内共享的本地语料库（首次调用时按环境变量 CORPUS_DB 打开）
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = CorpusStore()
+    return _default_store
+
+
+# 测试代码
+if __name__ == "__main__":
+    from src.services.query import QueryBuilder
+
+    store = CorpusStore()
+    builder = QueryBuilder()
+    builder.set_time_range(datetime.now() - timedelta(days=3))
+    builder.add_category_filter(["cs.CV", "cs.AI"])
+
+    # 第一次为全量同步，再次运行只获取增量
+    stats = store.sync(builder, PaginationProcessor(batch_size=500))
+    print(f"同步结果: {stats}")
+    print(f"本地论文数: {store.count()}")
+
+    papers = store.select(builder.set_max_results(5))
+    for paper in papers:
+        print(f"{paper['published']}  {paper['title'][:80]}")
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# 默认数据库路径和最大条目数，可通过环境变量 TRANSLATION_CACHE_DB / TRANSLATION_CACHE_MAX_ENTRIES 调整
+DEFAULT_TRANSLATION_CACHE_DB = os.path.join(".cache", "translations.sqlite3")
+DEFAULT_MAX_ENTRIES = 20000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    key TEXT PRIMARY KEY,
+    translation TEXT NOT NULL,
+    model TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS translations_accessed ON translations (accessed);
+CREATE TABLE IF NOT EXISTS translation_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+class TranslationCache:
+    """
+    基于SQLite的摘要翻译缓存
+    以 (摘要原文, 模型, 提示词) 的SHA-256为键，多个进程（如多个Web工作进程）共用同一个数据库；
+    条目数超过上限时按最近访问时间淘汰（LRU），命中和未命中次数也保存在数据库中
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path or DEFAULT_TRANSLATION_CACHE_DB
+        self.max_entries = max_entries
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()  # sqlite连接不能跨线程使用，每个线程一个连接
+        with self.connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        """
+        根据环境变量创建缓存：TRANSLATION_CACHE_DB（设为空表示不使用缓存，此时返回None）、
+        TRANSLATION_CACHE_MAX_ENTRIES
+        """
+        path = os.getenv("TRANSLATION_CACHE_DB", DEFAULT_TRANSLATION_CACHE_DB)
+        if not path:
+            return None
+        return cls(path, int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)))
+
+    def connection(self):
+        """
+        当前线程的数据库连接（首次使用时创建）
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(summary, model, prompt):
+        """
+        缓存键：摘要原文、模型和提示词模板的SHA-256
+        """
+        canonical = json.dumps([summary, model, prompt], ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _count(self, conn, name):
+        conn.execute("INSERT INTO translation_stats (name, value) VALUES (?, 1) "
+                     "ON CONFLICT (name) DO UPDATE SET value = value + 1", (name,))
+
+    def get(self, summary, model, prompt):
+        """
+        读取缓存的翻译，不存在时返回None
+        """
+        key = self.key(summary, model, prompt)
+        conn = self.connection()
+        with conn:
+            row = conn.execute("SELECT translation FROM translations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count(conn, "misses")
+                return None
+            # 更新访问时间，供按最近访问淘汰
+            conn.execute("UPDATE translations SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._count(conn, "hits")
+        return row[0]
+
+    def set(self, summary, model, prompt, translation):
+        """
+        写入翻译结果，条目数超过上限时淘汰最近最少访问的条目
+        """
+        now = time.time()
+        conn = self.connection()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO translations (key, translation, model, created, accessed) "
+                         "VALUES (?, ?, ?, ?, ?)", (self.key(summary, model, prompt), translation, model, now, now))
+            excess = conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute("DELETE FROM translations WHERE key IN "
+                             "(SELECT key FROM translations ORDER BY accessed LIMIT ?)", (excess,))
+                conn.execute("INSERT INTO translation_stats (name, value) VALUES ('evictions', ?) "
+                             "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value", (excess,))
+
+    def stats(self):
+        """
+        缓存统计：条目数、命中次数、未命中次数、淘汰次数和命中率（所有共用该数据库的进程累计）
+        """
+        conn = self.connection()
+        counters = dict(conn.execute("SELECT name, value FROM translation_stats").fetchall())
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "entries": conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0],
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0
+        }
+
+    def clear(self):
+        """
+        清空缓存和统计
+        """
+        with self.connection() as conn:
+            conn.execute("DELETE FROM translations")
+            conn.execute("DELETE FROM translation_stats")
+
+
+def get_translation_cache():
+    """
+    获取按环境变量配置的进程内共享翻译缓存（首次调用时创建），未启用缓存时返回None
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TranslationCache.from_env() or False
+    return _default_cache or None
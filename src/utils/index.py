@@ -0,0 +1,184 @@
+import numpy as np
+
+# 剪枝时的浮点误差容忍度，保证剪枝保守、结果精确
+PRUNE_EPSILON = 1e-12
+
+# 需要打分的候选文档超过语料的该比例时，剪枝不再划算，直接全量打分
+FULL_SCORE_RATIO = 0.25
+
+
+class InvertedIndex:
+    """
+    文章语料的倒排索引
+    每个词的倒排表按文档号升序存储，并记录该词在所有文档中的最大权重（上界），
+    用于cosine和word_frequency查询的MaxScore动态剪枝，精确返回前n篇文章
+    """
+
+    def __init__(self, articles, matrix):
+        """
+        articles: 文章列表
+        matrix: 与articles一一对应的TermDocumentMatrix
+        """
+        self.articles = articles
+        self.matrix = matrix
+
+        # CSR转置为按词组织的倒排表（稳定排序保证文档号升序）
+        order = np.argsort(matrix.indices, kind='stable')
+        term_counts = np.bincount(matrix.indices, minlength=matrix.n_columns)
+        self.term_ptr = np.concatenate(([0], np.cumsum(term_counts)))
+        self.postings = matrix.rows[order]
+        self.frequencies = matrix.data[order]
+
+        # 文档归一化因子：cosine为模长，word_frequency为总词数
+        self.doc_scales = {
+            'cosine': matrix.norms,
+            'word_frequency': matrix.lengths,
+        }
+
+        # 预先归一化的文档权重，仅用于计算上界
+        self.weights = {
+            method: self.frequencies / scales[self.postings]
+            for method, scales in self.doc_scales.items()
+        }
+
+        # 每个词的权重上界，以及取得上界的文档（用于估计剪枝阈值）
+        self.upper_bounds = {}
+        self.best_docs = {}
+        non_empty = term_counts > 0
+        posting_terms = np.repeat(np.arange(len(term_counts)), term_counts)
+        for method, weights in self.weights.items():
+            bounds = np.zeros(len(term_counts), dtype=np.float64)
+            best_docs = np.zeros(len(term_counts), dtype=np.int64)
+            if len(weights):
+                bounds[non_empty] = np.maximum.reduceat(weights, self.term_ptr[:-1][non_empty])
+                # 每个词的倒排表中第一个取得最大权重的位置
+                positions = np.flatnonzero(weights == np.repeat(bounds, term_counts))
+                terms, first = np.unique(posting_terms[positions], return_index=True)
+                best_docs[terms] = self.postings[positions[first]]
+            self.upper_bounds[method] = bounds
+            self.best_docs[method] = best_docs
+
+    def __len__(self):
+        return len(self.articles)
+
+    def search(self, query, method='cosine', top_n=None):
+        """
+        查询与索引中文章最相似的前n篇
+        query: PreparedQuery
+        method: 相似度计算方法，cosine和word_frequency使用剪枝，其他方法全量打分
+        top_n: 返回前n篇文章，None表示返回所有
+        返回: [(文档号, 相似度), ...]，按相似度降序，相同分数按文档号升序
+        """
+        if not top_n or method not in self.weights:
+            scores = self.matrix.score(query, method)
+            order = np.argsort(-scores, kind='stable')
+            if top_n:
+                order = order[:top_n]
+            return [(int(i), float(scores[i])) for i in order]
+
+        hits = self._max_score(query, method, top_n)
+
+        # 正分文档不足n篇时，按原有顺序补充零分文档，与全量排序结果保持一致
+        if len(hits) < top_n:
+            selected = {doc for doc, _ in hits}
+            for doc in range(len(self.articles)):
+                if len(hits) >= top_n:
+                    break
+                if doc not in selected:
+                    hits.append((doc, 0.0))
+
+        return hits
+
+    def _query_terms(self, query, method):
+        """
+        计算查询中每个词的查询权重，并按分数上界升序排列
+        返回: [(上界, 查询词频, 词号), ...]
+        """
+        scale = self._query_scale(query, method)
+        if scale == 0:
+            return []
+
+        bounds = self.upper_bounds[method]
+        n_terms = len(self.term_ptr) - 1
+        terms = []
+        for term, count in query.counts.items():
+            # 跳过索引中没有出现过的词
+            if term >= n_terms or self.term_ptr[term] == self.term_ptr[term + 1]:
+                continue
+            terms.append((count / scale * bounds[term], count, term))
+        terms.sort()
+        return terms
+
+    def _query_scale(self, query, method):
+        """
+        查询的归一化因子：cosine为模长，word_frequency为总词数
+        """
+        return query.norm if method == 'cosine' else query.total
+
+    def _max_score(self, query, method, top_n):
+        """
+        MaxScore剪枝（按词批量处理，基于NumPy）：
+        1. 对每个查询词上取得最大权重的文档精确打分，其中第n高的分数是前n名分数的下界（阈值）
+        2. 按上界升序划分“非必要词”和“必要词”：只含非必要词的文档，分数不超过这些词的累计上界，
+           累计上界低于阈值时不可能进入前n，只有出现在必要词倒排表中的文档需要打分
+        3. 对候选文档用矩阵打分（与全量打分逐位一致），选出前n篇
+        查询词都较少见时直接为出现过查询词的文档打分；候选文档超过语料的FULL_SCORE_RATIO时
+        （如长查询中含有常见词）剪枝不再划算，改为全量打分
+        """
+        terms = self._query_terms(query, method)
+        if not terms:
+            return []
+
+        n_docs = len(self.articles)
+        max_candidates = n_docs * FULL_SCORE_RATIO
+        sizes = np.array([self.term_ptr[term + 1] - self.term_ptr[term] for _, _, term in terms])
+        if sizes.sum() <= max_candidates:
+            # 其余文档不含任何查询词，分数为0
+            candidates = self._postings_union(terms)
+        else:
+            seeds = np.unique(self.best_docs[method][[term for _, _, term in terms]])
+            threshold = -1.0
+            if len(seeds) >= top_n:
+                seed_scores = self.matrix.score(query, method, rows=seeds)
+                threshold = float(np.partition(seed_scores, len(seeds) - top_n)[len(seeds) - top_n])
+
+            # 非必要词：累计上界低于阈值的最长前缀
+            cumulative_bounds = np.cumsum([bound for bound, _, _ in terms])
+            first_essential = int(np.searchsorted(cumulative_bounds, threshold - PRUNE_EPSILON, side='left'))
+            if sizes[first_essential:].sum() > max_candidates:
+                return self._full_score(query, method, top_n)
+            candidates = np.union1d(self._postings_union(terms[first_essential:]), seeds)
+
+        return self._top_hits(candidates, self.matrix.score(query, method, rows=candidates), top_n)
+
+    def _postings_union(self, terms):
+        """
+        若干个词的倒排表中出现过的文档号（升序去重）
+        """
+        if not terms:
+            return np.zeros(0, dtype=np.int64)
+        lists = [self.postings[self.term_ptr[term]:self.term_ptr[term + 1]] for _, _, term in terms]
+        return np.unique(np.concatenate(lists)).astype(np.int64)
+
+    def _full_score(self, query, method, top_n):
+        """
+        全量打分后选出前n篇中的正分文档
+        """
+        scores = self.matrix.score(query, method)
+        candidates = np.flatnonzero(scores > 0)
+        return self._top_hits(candidates, scores[candidates], top_n)
+
+    def _top_hits(self, candidates, scores, top_n):
+        """
+        从候选文档中选出前n篇（相似度降序，相同分数按文档号升序），只保留正分文档
+        candidates: 升序的文档号数组，scores: 对应的相似度
+        """
+        positive = scores > 0
+        candidates, scores = candidates[positive], scores[positive]
+        if top_n < len(scores):
+            # 与第n高分数相同的文档全部参与排序，保证同分时的顺序与全量稳定排序一致
+            cutoff = np.partition(scores, len(scores) - top_n)[len(scores) - top_n]
+            selected = scores >= cutoff
+            candidates, scores = candidates[selected], scores[selected]
+        order = np.lexsort((candidates, -scores))[:top_n]
+        return [(int(candidates[i]), float(scores[i])) for i in order]
@@ -0,0 +1,292 @@
+import numpy as np
+from src.utils.weighting import CorpusStatistics
+
+# 稀疏矩阵与稠密矩阵相乘时每块处理的非零元素数，限制中间矩阵的内存占用
+MATMUL_CHUNK_NNZ = 1 << 18
+
+
+class TermDocumentMatrix:
+    """
+    词项-文档稀疏矩阵（CSR格式，基于NumPy数组）
+    每一行对应一篇文档，列号即词表中的词ID，值为词频
+    """
+
+    def __init__(self, documents, vocabulary):
+        """
+        documents: 文档的词ID数组列表（Tokenizer.encode的输出）
+        vocabulary: 生成这些词ID的Vocabulary
+        """
+        self.vocabulary = vocabulary
+        documents = [np.asarray(ids, dtype=np.int64) for ids in documents]
+        n_docs = len(documents)
+
+        if n_docs and sum(len(ids) for ids in documents):
+            # 以 (文档号, 词ID) 为键统计词频，np.unique的结果按文档号、词ID排序
+            n_columns = len(vocabulary)
+            token_ids = np.concatenate(documents)
+            doc_ids = np.repeat(np.arange(n_docs, dtype=np.int64), [len(ids) for ids in documents])
+            keys, counts = np.unique(doc_ids * n_columns + token_ids, return_counts=True)
+            rows = keys // n_columns
+            self.indices = (keys % n_columns).astype(np.int32)
+            self.data = counts.astype(np.float64)
+            self.indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=n_docs)))).astype(np.int64)
+        else:
+            self.indices = np.zeros(0, dtype=np.int32)
+            self.data = np.zeros(0, dtype=np.float64)
+            self.indptr = np.zeros(n_docs + 1, dtype=np.int64)
+
+        self.n_columns = len(vocabulary)
+        self._compute_row_stats()
+        self._statistics = None
+        self._weights = {}
+
+    @classmethod
+    def from_arrays(cls, indptr, indices, data, n_columns, vocabulary=None, **row_stats):
+        """
+        直接由CSR数组创建矩阵（不复制数组，可用于共享内存或内存映射中的数组）
+        row_stats: 可选的预先计算好的 rows, norms, lengths, set_sizes，缺少时重新计算
+        """
+        matrix = cls.__new__(cls)
+        matrix.vocabulary = vocabulary
+        matrix.indptr, matrix.indices, matrix.data = indptr, indices, data
+        matrix.n_columns = n_columns
+        if {'rows', 'norms', 'lengths', 'set_sizes'} <= set(row_stats):
+            matrix.n_docs = len(indptr) - 1
+            for name, values in row_stats.items():
+                setattr(matrix, name, values)
+        else:
+            matrix._compute_row_stats()
+        matrix._statistics = None
+        matrix._weights = {}
+        return matrix
+
+    def _compute_row_stats(self):
+        """
+        预先计算每篇文档的行号、模长、总词数和不同词数量
+        """
+        self.n_docs = len(self.indptr) - 1
+        self.set_sizes = np.diff(self.indptr)
+        self.rows = np.repeat(np.arange(self.n_docs, dtype=np.int32), self.set_sizes)
+        self.norms = np.sqrt(self._row_sum(self.data * self.data))
+        self.lengths = self._row_sum(self.data)
+
+    def _row_sum(self, values):
+        """
+        按行对非零元素求和
+        """
+        return np.bincount(self.rows, weights=values, minlength=self.n_docs)
+
+    def __len__(self):
+        return self.n_docs
+
+    @property
+    def statistics(self):
+        """
+        本矩阵中文档的语料统计（首次使用BM25或TF-IDF时计算）
+        """
+        if self._statistics is None:
+            self._statistics = CorpusStatistics.from_matrix(self)
+        return self._statistics
+
+    def weighted_data(self, method, statistics=None):
+        """
+        按语料统计加权后的非零元素值，同一份统计只计算一次（统计更新后重新计算）
+        method: bm25 或 tfidf
+        statistics: CorpusStatistics，None表示使用本矩阵的统计
+        返回: (加权值数组, 每篇文档的加权模长)，bm25的模长为None
+        """
+        if statistics is None:
+            statistics = self.statistics
+        cached = self._weights.get((method, statistics))
+        if cached is not None and cached[0] == statistics.version:
+            return cached[1]
+
+        if method == 'bm25':
+            # idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * 文档长度 / 平均长度))
+            idf = statistics.bm25_idf(self.n_columns)
+            average_length = statistics.average_length or 1.0
+            normalizer = statistics.k1 * (1 - statistics.b + statistics.b * self.lengths / average_length)
+            weights = idf[self.indices] * self.data * (statistics.k1 + 1) / (self.data + normalizer[self.rows])
+            result = (weights, None)
+        else:
+            weights = self.data * statistics.tfidf_idf(self.n_columns)[self.indices]
+            result = (weights, np.sqrt(self._row_sum(weights * weights)))
+        self._weights[(method, statistics)] = (statistics.version, result)
+        return result
+
+    def _vector_size(self, queries):
+        """
+        稠密查询向量的长度：需要容纳矩阵的所有列和查询中的所有词ID
+        """
+        return max([self.n_columns] + [max(query.counts) + 1 for query in queries if query.counts])
+
+    def query_vector(self, query_counts):
+        """
+        将查询词频（{词ID: 词频}）映射为稠密向量，矩阵中没有出现的词不参与点积
+        """
+        size = max(self.n_columns, max(query_counts) + 1) if query_counts else self.n_columns
+        vector = np.zeros(size, dtype=np.float64)
+        if query_counts:
+            vector[list(query_counts.keys())] = list(query_counts.values())
+        return vector
+
+    def dot(self, vector):
+        """
+        矩阵与稠密向量相乘，返回每篇文档的点积
+        """
+        return self._row_sum(self.data * vector[self.indices])
+
+    def _select(self, rows):
+        """
+        取出部分文档的非零元素位置，以及这些元素在子集中的行号
+        """
+        sizes = self.set_sizes[rows]
+        offsets = np.cumsum(sizes) - sizes
+        positions = np.arange(sizes.sum()) + np.repeat(self.indptr[rows] - offsets, sizes)
+        sub_rows = np.repeat(np.arange(len(rows)), sizes)
+        return positions, sub_rows
+
+    def score(self, query, method='cosine', rows=None, statistics=None):
+        """
+        批量计算查询与所有文档的相似度
+        query: 预处理后的查询（PreparedQuery），提供词频、模长、总词数和词集合
+        method: 相似度计算方法，可选值：cosine, jaccard, word_frequency, bm25, tfidf
+        rows: 可选的文档号数组，只为这些文档打分
+        statistics: bm25和tfidf使用的CorpusStatistics，None表示使用本矩阵的统计
+        返回: 相似度数组，长度为文档数（或rows的长度）
+        """
+        if method not in ('jaccard', 'word_frequency', 'bm25', 'tfidf'):
+            method = 'cosine'  # 默认使用余弦相似度
+        return self.score_many(query, (method,), rows, statistics)[method]
+
+    def score_many(self, query, methods=('cosine', 'jaccard', 'word_frequency'), rows=None, statistics=None):
+        """
+        一次遍历计算多种相似度，点积和交集大小只计算一次
+        methods: 需要计算的方法列表
+        返回: {方法: 相似度数组}
+        """
+        if rows is None:
+            positions, sub_rows, n_rows = slice(None), self.rows, self.n_docs
+            rows = slice(None)
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+            positions, sub_rows = self._select(rows)
+            n_rows = len(rows)
+
+        results = {method: np.zeros(n_rows, dtype=np.float64) for method in methods}
+        if n_rows == 0:
+            return results
+
+        vector = self.query_vector(query.counts)
+        indices = self.indices[positions]
+
+        def row_sum(values):
+            return np.bincount(sub_rows, weights=values, minlength=n_rows)
+
+        if 'cosine' in results or 'word_frequency' in results:
+            dot_product = row_sum(self.data[positions] * vector[indices])
+
+        if 'jaccard' in results:
+            # 交集大小 / 并集大小，并集 = |A| + |B| - |A∩B|
+            intersection = row_sum((vector > 0)[indices].astype(np.float64))
+            union = len(query.token_set) + self.set_sizes[rows] - intersection
+            np.divide(intersection, union, out=results['jaccard'], where=union > 0)
+
+        if 'word_frequency' in results and query.total > 0:
+            # 共同词频率比例之积的和 = 点积 / (总词数1 * 总词数2)
+            denominator = query.total * self.lengths[rows]
+            np.divide(dot_product, denominator, out=results['word_frequency'], where=denominator > 0)
+
+        if 'cosine' in results and query.norm > 0:
+            denominator = query.norm * self.norms[rows]
+            np.divide(dot_product, denominator, out=results['cosine'], where=denominator > 0)
+
+        if 'bm25' in results:
+            # 查询中出现的每个词贡献一次该词在文档中的BM25权重
+            weights, _ = self.weighted_data('bm25', statistics)
+            results['bm25'] = row_sum(weights[positions] * (vector > 0)[indices])
+
+        if 'tfidf' in results:
+            # TF-IDF加权向量的余弦相似度
+            if statistics is None:
+                statistics = self.statistics
+            weights, norms = self.weighted_data('tfidf', statistics)
+            query_weights = vector * statistics.tfidf_idf(len(vector))
+            query_norm = np.sqrt(np.dot(query_weights, query_weights))
+            if query_norm > 0:
+                denominator = query_norm * norms[rows]
+                np.divide(row_sum(weights[positions] * query_weights[indices]), denominator,
+                          out=results['tfidf'], where=denominator > 0)
+
+        return results
+
+    def dot_many(self, dense, binary=False, data=None):
+        """
+        稀疏矩阵与稠密矩阵相乘
+        dense: (词表大小, k) 的稠密矩阵
+        binary: 为True时把文档词频视为1（用于计算交集大小）
+        data: 可选的替代词频的非零元素值（如weighted_data的加权值）
+        返回: (文档数, k) 的结果矩阵
+        """
+        if data is None:
+            data = self.data
+        result = np.zeros((self.n_docs, dense.shape[1]), dtype=np.float64)
+        begin = 0
+        while begin < self.n_docs:
+            # 按非零元素数切块
+            end = int(np.searchsorted(self.indptr, self.indptr[begin] + MATMUL_CHUNK_NNZ, side='right')) - 1
+            end = min(max(end, begin + 1), self.n_docs)
+            first, last = self.indptr[begin], self.indptr[end]
+            non_empty = self.set_sizes[begin:end] > 0
+            if non_empty.any():
+                contributions = dense[self.indices[first:last]]
+                if not binary:
+                    contributions = data[first:last, None] * contributions
+                starts = self.indptr[begin:end][non_empty] - first
+                result[begin:end][non_empty] = np.add.reduceat(contributions, starts, axis=0)
+            begin = end
+        return result
+
+    def score_batch(self, queries, method='cosine', statistics=None):
+        """
+        多个查询与所有文档的相似度，通过一次 查询×文档 矩阵乘法计算
+        queries: PreparedQuery列表
+        statistics: bm25和tfidf使用的CorpusStatistics，None表示使用本矩阵的统计
+        返回: (查询数, 文档数) 的相似度矩阵
+        """
+        scores = np.zeros((len(queries), self.n_docs), dtype=np.float64)
+        if not queries or self.n_docs == 0:
+            return scores
+
+        query_matrix = np.zeros((self._vector_size(queries), len(queries)), dtype=np.float64)
+        for column, query in enumerate(queries):
+            if query.counts:
+                query_matrix[list(query.counts.keys()), column] = list(query.counts.values())
+
+        if method == 'jaccard':
+            # 交集大小 / 并集大小，并集 = |A| + |B| - |A∩B|
+            intersection = self.dot_many((query_matrix > 0).astype(np.float64), binary=True).T
+            set_sizes = np.array([len(query.token_set) for query in queries], dtype=np.float64)
+            union = set_sizes[:, None] + self.set_sizes[None, :] - intersection
+            np.divide(intersection, union, out=scores, where=union > 0)
+        elif method == 'word_frequency':
+            totals = np.array([query.total for query in queries], dtype=np.float64)
+            denominator = totals[:, None] * self.lengths[None, :]
+            np.divide(self.dot_many(query_matrix).T, denominator, out=scores, where=denominator > 0)
+        elif method == 'bm25':
+            weights, _ = self.weighted_data('bm25', statistics)
+            scores[...] = self.dot_many((query_matrix > 0).astype(np.float64), data=weights).T
+        elif method == 'tfidf':
+            if statistics is None:
+                statistics = self.statistics
+            weights, doc_norms = self.weighted_data('tfidf', statistics)
+            query_matrix *= statistics.tfidf_idf(len(query_matrix))[:, None]
+            norms = np.sqrt((query_matrix * query_matrix).sum(axis=0))
+            denominator = norms[:, None] * doc_norms[None, :]
+            np.divide(self.dot_many(query_matrix, data=weights).T, denominator, out=scores, where=denominator > 0)
+        else:  # 默认使用余弦相似度
+            norms = np.array([query.norm for query in queries], dtype=np.float64)
+            denominator = norms[:, None] * self.norms[None, :]
+            np.divide(self.dot_many(query_matrix).T, denominator, out=scores, where=denominator > 0)
+
+        return scores
@@ -0,0 +1,257 @@
+from collections import defaultdict
+import time
+import zlib
+import numpy as np
+
+# 通用哈希 (a * x + b) mod p 使用的梅森素数，以及签名取值的上限
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+_PRIME = np.uint64(MERSENNE_PRIME)
+_LOW_29_BITS = np.uint64((1 << 29) - 1)
+
+
+def token_hash(token):
+    """
+    词的32位哈希：字符串使用crc32，不同进程、不同词表下结果一致（内置hash带随机盐）；
+    整数词ID同样经过crc32打散（连续的整数经线性哈希后最小值分布有偏），只能与同一个词表下的签名比较
+    """
+    if isinstance(token, int):
+        return zlib.crc32((token & 0xFFFFFFFFFFFFFFFF).to_bytes(8, 'little'))
+    return zlib.crc32(token.encode('utf-8'))
+
+
+def vocabulary_hashes(vocabulary):
+    """
+    词表中每个词的crc32哈希（按词ID排列），可用 hashes[词ID数组] 得到与字符串相同的哈希
+    """
+    return np.fromiter((zlib.crc32(token.encode('utf-8')) for token in vocabulary.tokens),
+                       dtype=np.uint64, count=len(vocabulary))
+
+
+def _mod_prime(values):
+    """
+    uint64数组对梅森素数 2^61 - 1 取模（利用 2^61 ≡ 1，不需要除法）
+    """
+    values = (values & _PRIME) + (values >> np.uint64(61))
+    return np.where(values >= _PRIME, values - _PRIME, values)
+
+
+def candidate_probability(similarity, bands, rows):
+    """
+    Jaccard相似度为similarity的两个集合成为LSH候选的概率：1 - (1 - s^r)^b
+    """
+    return 1.0 - (1.0 - similarity ** rows) ** bands
+
+
+def choose_bands(threshold, num_perm=128):
+    """
+    为给定阈值选择分段参数 (bands, rows)，要求 bands * rows == num_perm
+    选取S曲线拐点 (1/b)^(1/r) 不高于阈值且最接近阈值的组合，优先保证召回率
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        turning_point = (1.0 / bands) ** (1.0 / rows)
+        if turning_point <= threshold and (best is None or turning_point > best[0]):
+            best = (turning_point, bands, rows)
+    if best is None:
+        return num_perm, 1
+    return best[1], best[2]
+
+
+class MinHasher:
+    """
+    MinHash签名生成器
+    使用num_perm个随机通用哈希函数模拟随机排列，签名相同位置相等的概率等于Jaccard相似度
+    """
+
+    def __init__(self, num_perm=128, seed=1):
+        self.num_perm = num_perm
+        generator = np.random.RandomState(seed)
+        self.a = generator.randint(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = generator.randint(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        # a * x 会超出uint64（a < 2^61, x < 2^32），拆成高29位和低32位分别相乘
+        self.a_high = self.a >> np.uint64(32)
+        self.a_low = self.a & np.uint64(MAX_HASH)
+
+    def signature(self, tokens):
+        """
+        计算词集合的MinHash签名
+        tokens: 词或词ID的可迭代对象（重复词只计一次）；需要跨进程比较签名时应传入词（字符串）
+        返回: 长度为num_perm的uint64数组，空集合返回全部为MAX_HASH的签名
+        """
+        return self.signature_from_hashes(np.fromiter((token_hash(token) for token in set(tokens)),
+                                                      dtype=np.uint64))
+
+    def signature_from_hashes(self, hashes):
+        """
+        由不重复的32位词哈希数组计算MinHash签名
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if len(hashes) == 0:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        return self.permute(hashes).min(axis=0)
+
+    def permute(self, hashes):
+        """
+        对每个32位词哈希计算所有哈希函数的值（签名即为各列的最小值）
+        返回: (len(hashes), num_perm) 的uint64数组，取值不超过MAX_HASH
+        """
+        x = np.asarray(hashes, dtype=np.uint64)[:, None]
+        # a * x = a_high * x * 2^32 + a_low * x；a_high * x < 2^61，乘以2^32时利用 2^61 ≡ 1 折回低位
+        low = _mod_prime(x * self.a_low)
+        high = x * self.a_high
+        high = _mod_prime(((high & _LOW_29_BITS) << np.uint64(32)) + (high >> np.uint64(29)))
+        permuted = _mod_prime(low + high + self.b)
+        return permuted & np.uint64(MAX_HASH)
+
+
+class LSHIndex:
+    """
+    基于MinHash分段（banding）的局部敏感哈希索引
+    签名被切分为bands段、每段rows行，任意一段完全相同的文档成为候选，
+    候选再用精确Jaccard相似度重新打分
+    bands越多、rows越少，召回率越高但候选越多（精度/速度的调节旋钮）
+    """
+
+    def __init__(self, bands=32, rows=4, seed=1):
+        self.bands = bands
+        self.rows = rows
+        self.hasher = MinHasher(bands * rows, seed)
+        self.buckets = [defaultdict(list) for _ in range(bands)]
+        self.articles = []
+        self.token_sets = []
+
+    def __len__(self):
+        return len(self.articles)
+
+    def _band_keys(self, signature):
+        """
+        将签名切分为各段的桶键
+        """
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add(self, article, tokens):
+        """
+        添加一篇文章
+        tokens: 文章的词列表（或词ID数组，此时查询也必须使用同一个词表的词ID）
+        返回: 文档号
+        """
+        doc = len(self.articles)
+        token_set = set(tokens)
+        self.articles.append(article)
+        self.token_sets.append(token_set)
+        # 空文档与任何文本的Jaccard相似度都为0，不放入桶中
+        if token_set:
+            for band, key in enumerate(self._band_keys(self.hasher.signature(token_set))):
+                self.buckets[band][key].append(doc)
+        return doc
+
+    def candidates(self, tokens):
+        """
+        返回与给定词集合至少有一段签名相同的候选文档号集合
+        """
+        token_set = set(tokens)
+        if not token_set:
+            return set()
+        found = set()
+        for band, key in enumerate(self._band_keys(self.hasher.signature(token_set))):
+            found.update(self.buckets[band].get(key, ()))
+        return found
+
+    def search(self, tokens, threshold=0.5):
+        """
+        查询Jaccard相似度不低于阈值的文章
+        先通过LSH桶获取候选，再精确计算Jaccard相似度过滤
+        返回: [(文档号, 相似度), ...]，按相似度降序，相同分数按文档号升序
+        """
+        token_set = set(tokens)
+        hits = []
+        for doc in self.candidates(token_set):
+            other = self.token_sets[doc]
+            intersection = len(token_set & other)
+            union = len(token_set) + len(other) - intersection
+            score = intersection / union if union else 0.0
+            if score >= threshold:
+                hits.append((doc, score))
+        hits.sort(key=lambda hit: (-hit[1], hit[0]))
+        return hits
+
+
+def benchmark(matcher, articles, queries, threshold=0.5, configs=((16, 8), (32, 4), (64, 2))):
+    """
+    对比LSH与精确Jaccard两两比较的速度和召回率
+    matcher: SimilarityMatcher
+    articles: 文章列表
+    queries: 查询文本列表
+    configs: 待比较的 (bands, rows) 组合
+    返回: 每种配置的统计结果列表
+    """
+    prepared = [matcher.prepare(query) for query in queries]
+
+    # 精确方法：与所有文章计算Jaccard相似度
+    start_time = time.time()
+    matrix = matcher.build_matrix(articles)
+    exact = []
+    for query in prepared:
+        scores = matcher.score_articles(query, articles, method='jaccard', matrix=matrix)
+        exact.append({doc for doc in range(len(articles)) if scores[doc] >= threshold})
+    exact_time = time.time() - start_time
+
+    results = []
+    for bands, rows in configs:
+        start_time = time.time()
+        index = matcher.build_lsh_index(articles, bands=bands, rows=rows)
+        build_time = time.time() - start_time
+
+        start_time = time.time()
+        found = []
+        candidate_count = 0
+        for query in queries:
+            tokens = set(matcher.preprocess_text(query))
+            candidate_count += len(index.candidates(tokens))
+            found.append({doc for doc, _ in index.search(tokens, threshold)})
+        query_time = time.time() - start_time
+
+        relevant = sum(len(expected) for expected in exact)
+        retrieved = sum(len(expected & got) for expected, got in zip(exact, found))
+        results.append({
+            'bands': bands,
+            'rows': rows,
+            'build_time': build_time,
+            'query_time': query_time,
+            'exact_time': exact_time,
+            'avg_candidates': candidate_count / max(len(queries), 1),
+            'recall': retrieved / relevant if relevant else 1.0,
+        })
+    return results
+
+
+# 测试代码
+if __name__ == "__main__":
+    from src.services.query import QueryBuilder
+    from src.services.pagination import PaginationProcessor
+    from src.utils.similarity import SimilarityMatcher
+
+    builder = QueryBuilder()
+    builder.set_time_range()
+    builder.add_category_filter(['cs.CV', 'cs.AI'])
+    processor = PaginationProcessor(batch_size=200)
+    papers = processor.fetch_single_batch(builder)['entries']
+
+    matcher = SimilarityMatcher()
+    # 以文章自身（截去末尾部分）作为查询，模拟近似重复文本
+    queries = []
+    for paper in papers[:50]:
+        words = matcher.article_text(paper).split()
+        queries.append(' '.join(words[:int(len(words) * 0.8)]))
+
+    print(f"语料: {len(papers)} 篇，查询: {len(queries)} 条，阈值: 0.5")
+    for row in benchmark(matcher, papers, queries, threshold=0.5):
+        print(f"bands={row['bands']:3d} rows={row['rows']:2d} "
+              f"构建 {row['build_time']:.3f}s 查询 {row['query_time']:.3f}s "
+              f"精确方法 {row['exact_time']:.3f}s 平均候选 {row['avg_candidates']:.1f} "
+              f"召回率 {row['recall']:.3f}")
@@ -0,0 +1,317 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context, shared_memory
+import heapq
+import itertools
+import os
+import threading
+import time
+import weakref
+import numpy as np
+from src.utils.matrix import TermDocumentMatrix
+
+# 放入共享内存的矩阵数组
+SHARED_FIELDS = ('indptr', 'indices', 'data', 'rows', 'norms', 'lengths', 'set_sizes')
+
+# 每个工作进程分到的分片数，分片更细时各进程负载更均衡
+SHARDS_PER_WORKER = 2
+
+# 工作进程的启动方式：在多线程的进程（如Flask）中fork可能复制其他线程持有的锁而死锁，
+# 因此使用forkserver（不支持时使用spawn）
+START_METHOD = 'forkserver' if 'forkserver' in get_all_start_methods() else 'spawn'
+
+# 语料少于该篇数时直接在当前进程打分：多进程打分每次调用有数毫秒的固定开销（临时语料还要创建和释放共享内存），
+# 而单进程打分每篇约1.5微秒，语料较小时并行的收益抵不过开销（测量方法见benchmark）
+MIN_PARALLEL_DOCS = int(os.getenv('MIN_PARALLEL_DOCS', '20000'))
+
+# 每个工作进程保持映射的常驻共享语料数，超出时关闭最久未使用的映射
+ATTACHED_CORPORA = 4
+
+# 按进程数缓存的常驻进程池，避免每次打分都重新启动进程
+_pools = {}
+_pools_lock = threading.Lock()
+
+# 语料对象（SimHashIndex、CorpusSnapshot等）上常驻的多进程打分器 {语料对象: {进程数: ParallelScorer}}，
+# 语料对象被回收时自动释放共享内存
+_scorers = weakref.WeakKeyDictionary()
+_scorers_lock = threading.Lock()
+
+# 工作进程中已映射的常驻共享语料 {共享内存名称: (共享内存块列表, 数组字典)}
+_attached = OrderedDict()
+
+
+def get_pool(workers):
+    """
+    获取（或创建）指定进程数的常驻进程池
+    """
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers,
+                                                         mp_context=get_context(START_METHOD))
+        return pool
+
+
+def shutdown_pools():
+    """
+    关闭所有常驻进程池
+    """
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown()
+        _pools.clear()
+
+
+def get_scorer(corpus, workers=None):
+    """
+    获取语料对象上常驻的多进程打分器，矩阵只复制到共享内存一次，后续查询直接复用
+    corpus: 带有matrix属性的语料对象（SimHashIndex、CorpusSnapshot等），需保持其矩阵不变
+    """
+    workers = workers or os.cpu_count() or 1
+    with _scorers_lock:
+        scorers = _scorers.setdefault(corpus, {})
+        scorer = scorers.get(workers)
+        if scorer is None:
+            scorer = scorers[workers] = ParallelScorer(corpus.matrix, workers, persistent=True)
+            weakref.finalize(corpus, scorer.close)
+        return scorer
+
+
+class SharedCorpus:
+    """
+    放在共享内存中的TermDocumentMatrix
+    工作进程按名称映射同一块内存，任务只需传输很小的描述信息，不需要序列化文章和词频数据
+    共享内存由主进程创建和释放（进程池中的工作进程与主进程共用同一个resource_tracker）
+    """
+
+    def __init__(self, matrix, persistent=False):
+        """
+        persistent: 是否为常驻语料；常驻语料在工作进程中保持映射，多次查询不必重复打开共享内存
+        """
+        self.n_docs = matrix.n_docs
+        self.n_columns = matrix.n_columns
+        self.blocks = []
+        self.spec = {'n_columns': matrix.n_columns, 'persistent': persistent, 'arrays': {}}
+        try:
+            for name in SHARED_FIELDS:
+                values = np.ascontiguousarray(getattr(matrix, name))
+                block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+                self.blocks.append(block)
+                np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[...] = values
+                self.spec['arrays'][name] = (block.name, values.shape, values.dtype.str)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        """
+        释放共享内存
+        """
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _map_arrays(spec):
+    """
+    按名称打开共享内存块，返回: (共享内存块列表, {字段: 数组})
+    """
+    blocks = [shared_memory.SharedMemory(name=name) for name, _, _ in spec['arrays'].values()]
+    arrays = {
+        field: np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        for (field, (_, shape, dtype)), block in zip(spec['arrays'].items(), blocks)
+    }
+    return blocks, arrays
+
+
+def _close_blocks(blocks, arrays):
+    # 释放对共享内存的引用后才能关闭
+    arrays.clear()
+    for block in blocks:
+        block.close()
+
+
+def _attach(spec):
+    """
+    工作进程中获取常驻共享语料的数组（首次使用时映射，之后复用）
+    """
+    key = spec['arrays']['indptr'][0]
+    entry = _attached.get(key)
+    if entry is None:
+        entry = _attached[key] = _map_arrays(spec)
+        while len(_attached) > ATTACHED_CORPORA:
+            _close_blocks(*_attached.popitem(last=False)[1])
+    else:
+        _attached.move_to_end(key)
+    return entry[1]
+
+
+def _score_shard(spec, begin, end, query, method, top_n, statistics=None):
+    """
+    工作进程任务：为文档号 [begin, end) 打分，返回该分片的前top_n篇
+    statistics: bm25和tfidf使用的全语料统计（由主进程计算，保证各分片使用相同的IDF）
+    返回: [(-相似度, 文档号), ...]，已按相似度降序、文档号升序排列
+    """
+    if spec['persistent']:
+        blocks, arrays = None, _attach(spec)
+    else:
+        blocks, arrays = _map_arrays(spec)
+    try:
+        # 分片子矩阵：非零元素数组直接使用共享内存的切片
+        first, last = arrays['indptr'][begin], arrays['indptr'][end]
+        matrix = TermDocumentMatrix.from_arrays(
+            arrays['indptr'][begin:end + 1] - first,
+            arrays['indices'][first:last],
+            arrays['data'][first:last],
+            spec['n_columns'],
+            rows=arrays['rows'][first:last] - begin,
+            norms=arrays['norms'][begin:end],
+            lengths=arrays['lengths'][begin:end],
+            set_sizes=arrays['set_sizes'][begin:end],
+        )
+        scores = matrix.score(query, method, statistics=statistics)
+        del matrix
+    finally:
+        if blocks is not None:
+            _close_blocks(blocks, arrays)
+    return _top_hits(scores, begin, top_n)
+
+
+def _top_hits(scores, offset, top_n):
+    """
+    选出分片内的前top_n篇（与阈值分数相同的文档全部参与排序，保证与全量稳定排序结果一致）
+    """
+    candidates = np.arange(len(scores))
+    if top_n and top_n < len(scores):
+        threshold = np.partition(-scores, top_n - 1)[top_n - 1]
+        candidates = np.flatnonzero(-scores <= threshold)
+    order = candidates[np.lexsort((candidates, -scores[candidates]))]
+    if top_n:
+        order = order[:top_n]
+    return [(-float(scores[i]), int(i) + offset) for i in order]
+
+
+class ParallelScorer:
+    """
+    多进程打分：将文档按文档号切分为若干分片，由进程池并行打分，
+    每个分片返回局部的前n篇，最后归并为全局的前n篇
+    """
+
+    def __init__(self, matrix, workers=None, persistent=False):
+        """
+        matrix: TermDocumentMatrix
+        workers: 进程数，None表示使用CPU核数
+        persistent: 是否在多次查询间保持共享内存（见get_scorer）
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.matrix = matrix
+        self.shared = SharedCorpus(matrix, persistent)
+        self.pool = get_pool(self.workers)
+
+    def shards(self):
+        """
+        文档号分片 [(begin, end), ...]
+        """
+        n_docs = self.shared.n_docs
+        n_shards = max(1, min(n_docs, self.workers * SHARDS_PER_WORKER))
+        bounds = np.linspace(0, n_docs, n_shards + 1).astype(int)
+        return [(int(begin), int(end)) for begin, end in zip(bounds[:-1], bounds[1:]) if end > begin]
+
+    def rank(self, query, method='cosine', top_n=None, statistics=None):
+        """
+        query: PreparedQuery
+        statistics: bm25和tfidf使用的CorpusStatistics，None表示使用整个矩阵的统计
+        返回: [(文档号, 相似度), ...]，按相似度降序，相同分数按文档号升序
+        """
+        if method in ('bm25', 'tfidf') and statistics is None:
+            statistics = self.matrix.statistics
+        futures = [
+            self.pool.submit(_score_shard, self.shared.spec, begin, end, query, method, top_n, statistics)
+            for begin, end in self.shards()
+        ]
+        # 各分片结果已按 (-相似度, 文档号) 排好序，归并即可得到全局顺序
+        merged = heapq.merge(*[future.result() for future in futures])
+        if top_n:
+            merged = itertools.islice(merged, top_n)
+        return [(doc, -negative_score) for negative_score, doc in merged]
+
+    def close(self):
+        self.shared.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def benchmark(matcher, articles, queries, sizes=(100, 1000, 10000, 50000), workers_options=(2, 4), top_n=10):
+    """
+    对比不同语料规模下单进程与多进程打分的每次查询耗时（秒，取各查询的平均值）
+    matcher: SimilarityMatcher
+    articles: 文章列表，依次取前sizes篇作为语料
+    queries: 查询文本列表
+    返回: 每个 (语料篇数, 进程数) 的统计结果列表：
+          serial/temporary为文章列表上的单进程打分/每次临时创建共享内存的多进程打分（均包含构建矩阵），
+          indexed/persistent为索引上的单进程打分/复用常驻共享内存的多进程打分
+    """
+    prepared = [matcher.prepare(query) for query in queries]
+
+    def per_query(rank):
+        rank(prepared[0])  # 预热（启动进程池、映射共享内存）
+        start_time = time.perf_counter()
+        for query in prepared:
+            rank(query)
+        return (time.perf_counter() - start_time) / len(prepared)
+
+    results = []
+    for size in sizes:
+        corpus = articles[:size]
+        index = matcher.build_simhash_index(corpus)
+        serial = per_query(lambda query: matcher.rank_articles(query, corpus, top_n=top_n))
+        indexed = per_query(lambda query: matcher.rank_articles(query, index, top_n=top_n))
+        for workers in workers_options:
+            def temporary(query):
+                with ParallelScorer(matcher.build_matrix(corpus), workers) as scorer:
+                    return scorer.rank(query, 'cosine', top_n)
+            results.append({
+                'documents': len(corpus),
+                'workers': workers,
+                'serial': serial,
+                'temporary': per_query(temporary),
+                'indexed': indexed,
+                'persistent': per_query(lambda query: get_scorer(index, workers).rank(query, 'cosine', top_n)),
+            })
+    return results
+
+
+# 测试代码
+if __name__ == "__main__":
+    import sys
+    from src.utils.similarity import SimilarityMatcher
+
+    # 合成语料（词频服从Zipf分布）：python -m src.utils.parallel [最大篇数]
+    max_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    generator = np.random.default_rng(0)
+    words = [f"w{i}" for i in range(30000)]
+    probabilities = 1.0 / np.arange(1, len(words) + 1) ** 1.05
+    lengths = generator.integers(60, 180, max_docs)
+    token_ids = np.split(generator.choice(len(words), size=lengths.sum(), p=probabilities / probabilities.sum()),
+                         np.cumsum(lengths)[:-1])
+    papers = [{'title': str(i), 'summary': ' '.join(words[t] for t in ids)} for i, ids in enumerate(token_ids)]
+    texts = [papers[i]['summary'] for i in range(0, 50, 5)]
+
+    print(f"CPU核数: {os.cpu_count()}，进程启动方式: {START_METHOD}")
+    sizes = [size for size in (100, 1000, 10000, 50000, 200000) if size <= max_docs]
+    for row in benchmark(SimilarityMatcher(), papers, texts, sizes=sizes):
+        print(f"篇数 {row['documents']:6d} 进程数 {row['workers']} | 文章列表: 单进程 {row['serial']:.4f}s "
+              f"多进程(临时共享内存) {row['temporary']:.4f}s | 索引: 单进程 {row['indexed']:.4f}s "
+              f"多进程(常驻共享内存) {row['persistent']:.4f}s")
+    shutdown_pools()
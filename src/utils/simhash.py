@@ -0,0 +1,187 @@
+import hashlib
+import time
+import numpy as np
+
+# 每次计算文档投影时处理的文档数，限制中间矩阵的内存占用
+PROJECTION_CHUNK = 4096
+
+# 不支持np.bitwise_count时使用的逐字节popcount查找表
+_POPCOUNT_TABLE = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+def popcount(values):
+    """
+    计算uint64数组每个元素中1的个数
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return _POPCOUNT_TABLE[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1)
+
+
+class SimHashIndex:
+    """
+    SimHash（带符号随机投影）指纹索引，用于近似余弦相似度检索
+    每个词通过哈希得到一组±1随机投影方向，文档指纹的第j位为词频加权投影和的符号，
+    两个指纹的汉明距离与向量夹角成正比；查询时先按汉明距离预选候选，再精确计算余弦相似度重排
+    """
+
+    def __init__(self, articles, matrix, bits=64):
+        """
+        articles: 文章列表
+        matrix: 与articles一一对应的TermDocumentMatrix
+        bits: 指纹位数，必须是64的倍数
+        """
+        if bits % 64:
+            raise ValueError("指纹位数必须是64的倍数")
+        self.articles = articles
+        self.matrix = matrix
+        self.bits = bits
+
+        self.signs = self._token_signs(matrix.vocabulary.tokens[:matrix.n_columns])
+        self.fingerprints = self._document_fingerprints()
+
+    def __len__(self):
+        return len(self.articles)
+
+    def _token_signs(self, tokens):
+        """
+        为每个词生成bits个±1投影分量（由词的哈希值各位决定）
+        """
+        digest_size = self.bits // 8
+        digests = b''.join(hashlib.blake2b(token.encode('utf-8'), digest_size=digest_size).digest()
+                           for token in tokens)
+        bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8), bitorder='little')
+        return bits.reshape(len(tokens), self.bits).astype(np.float32) * 2 - 1
+
+    def _pack(self, projections):
+        """
+        将投影值的符号打包为uint64指纹
+        """
+        packed = np.packbits(projections > 0, axis=1, bitorder='little')
+        return np.ascontiguousarray(packed).view(np.uint64)
+
+    def _document_fingerprints(self):
+        """
+        分块计算所有文档的投影并打包为指纹
+        """
+        matrix = self.matrix
+        fingerprints = np.zeros((matrix.n_docs, self.bits // 64), dtype=np.uint64)
+        for begin in range(0, matrix.n_docs, PROJECTION_CHUNK):
+            end = min(begin + PROJECTION_CHUNK, matrix.n_docs)
+            first, last = matrix.indptr[begin], matrix.indptr[end]
+            contributions = matrix.data[first:last, None].astype(np.float32) * self.signs[matrix.indices[first:last]]
+
+            projections = np.zeros((end - begin, self.bits), dtype=np.float32)
+            non_empty = matrix.set_sizes[begin:end] > 0
+            if non_empty.any():
+                starts = matrix.indptr[begin:end][non_empty] - first
+                projections[non_empty] = np.add.reduceat(contributions, starts, axis=0)
+            fingerprints[begin:end] = self._pack(projections)
+        return fingerprints
+
+    def query_fingerprint(self, query):
+        """
+        计算查询文本的指纹（包含语料词表之外的词，保证与查询全向量的夹角一致）
+        """
+        if not query.counts:
+            return np.zeros((1, self.bits // 64), dtype=np.uint64)
+        token_ids = list(query.counts)
+        counts = np.array([query.counts[token_id] for token_id in token_ids], dtype=np.float32)
+        words = [self.matrix.vocabulary.token(token_id) for token_id in token_ids]
+        projection = (counts[:, None] * self._token_signs(words)).sum(axis=0)
+        return self._pack(projection[None, :])
+
+    def hamming_distances(self, fingerprint):
+        """
+        计算查询指纹与所有文档指纹的汉明距离
+        """
+        return popcount(self.fingerprints ^ fingerprint).sum(axis=1, dtype=np.int64)
+
+    def search(self, query, top_n=10, oversample=10, min_candidates=100):
+        """
+        近似余弦相似度检索
+        query: PreparedQuery
+        top_n: 返回前n篇文章
+        oversample, min_candidates: 预选候选数为 max(top_n * oversample, min_candidates)
+        返回: [(文档号, 相似度), ...]，按相似度降序，相同分数按文档号升序
+        """
+        n_docs = len(self.articles)
+        if n_docs == 0 or not top_n:
+            return []
+
+        n_candidates = min(n_docs, max(top_n * oversample, min_candidates))
+        distances = self.hamming_distances(self.query_fingerprint(query))
+        if n_candidates < n_docs:
+            candidates = np.argpartition(distances, n_candidates - 1)[:n_candidates]
+        else:
+            candidates = np.arange(n_docs)
+        candidates.sort()
+
+        # 精确计算候选文档的余弦相似度并重排
+        scores = self.matrix.score(query, 'cosine', rows=candidates)
+        order = np.argsort(-scores, kind='stable')[:top_n]
+        return [(int(candidates[i]), float(scores[i])) for i in order]
+
+
+def benchmark(matcher, articles, queries, top_n=10, oversample=10, min_candidates=100):
+    """
+    对比近似余弦检索与精确余弦排序的速度和recall@k
+    matcher: SimilarityMatcher
+    articles: 文章列表
+    queries: 查询文本列表
+    返回: 统计结果字典
+    """
+    prepared = [matcher.prepare(query) for query in queries]
+
+    start_time = time.time()
+    index = matcher.build_simhash_index(articles)
+    build_time = time.time() - start_time
+
+    start_time = time.time()
+    exact = []
+    for query in prepared:
+        scores = matcher.score_articles(query, articles, method='cosine', matrix=index.matrix)
+        exact.append(set(np.argsort(-scores, kind='stable')[:top_n].tolist()))
+    exact_time = time.time() - start_time
+
+    start_time = time.time()
+    approximate = []
+    for query in prepared:
+        hits = index.search(query, top_n, oversample=oversample, min_candidates=min_candidates)
+        approximate.append({doc for doc, _ in hits})
+    approximate_time = time.time() - start_time
+
+    relevant = sum(len(expected) for expected in exact)
+    retrieved = sum(len(expected & got) for expected, got in zip(exact, approximate))
+    return {
+        'documents': len(articles),
+        'queries': len(queries),
+        'top_n': top_n,
+        'build_time': build_time,
+        'exact_time': exact_time,
+        'approximate_time': approximate_time,
+        'recall_at_k': retrieved / relevant if relevant else 1.0,
+    }
+
+
+# 测试代码
+if __name__ == "__main__":
+    from src.services.query import QueryBuilder
+    from src.services.pagination import PaginationProcessor
+    from src.utils.similarity import SimilarityMatcher
+
+    builder = QueryBuilder()
+    builder.set_time_range()
+    builder.add_category_filter(['cs.CV', 'cs.AI'])
+    processor = PaginationProcessor(batch_size=500)
+    papers = processor.fetch_single_batch(builder)['entries']
+
+    matcher = SimilarityMatcher()
+    queries = [paper['summary'] for paper in papers[:50]]
+
+    report = benchmark(matcher, papers, queries, top_n=10)
+    print(f"语料: {report['documents']} 篇，查询: {report['queries']} 条")
+    print(f"指纹构建耗时: {report['build_time']:.3f}s")
+    print(f"精确余弦耗时: {report['exact_time']:.3f}s")
+    print(f"近似余弦耗时: {report['approximate_time']:.3f}s")
+    print(f"recall@{report['top_n']}: {report['recall_at_k']:.3f}")
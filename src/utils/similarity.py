@@ -1,42 +1,83 @@
-import re
 from collections import Counter
+import heapq
+import itertools
 import math
+import numpy as np
+from src.utils.matrix import TermDocumentMatrix
+from src.utils.tokenizer import Tokenizer
+from src.utils.index import InvertedIndex
+from src.utils.minhash import LSHIndex
+from src.utils.simhash import SimHashIndex
+from src.utils.parallel import MIN_PARALLEL_DOCS, ParallelScorer, get_scorer
+from src.utils.weighting import CorpusStatistics
+from src.utils.snapshot import CorpusSnapshot, load_snapshot, save_snapshot
+
+# 支持的相似度计算方法（bm25和tfidf基于候选文章的语料统计加权）
+SIMILARITY_METHODS = ('cosine', 'jaccard', 'word_frequency', 'bm25', 'tfidf')
+
+# 流式排序时每批分词、打分的文章数
+STREAM_CHUNK_SIZE = 1000
+
+class PreparedQuery:
+    """
+    预处理后的文本：缓存词ID数组、词频、模长、总词数和词集合
+    由SimilarityMatcher.prepare创建，可在多篇文章和多种算法间复用
+    """
+    def __init__(self, text, tokens):
+        self.text = text
+        self.tokens = tokens
+        self.counts = Counter(tokens)
+        self.token_set = set(self.counts)
+        self.total = len(tokens)
+        self.norm = math.sqrt(sum(count * count for count in self.counts.values()))
+    
+    def dot(self, other):
+        """
+        计算两个文本词频向量的点积
+        """
+        # 遍历较小的词频表
+        small, large = (self.counts, other.counts) if len(self.counts) <= len(other.counts) else (other.counts, self.counts)
+        return sum(count * large[word] for word, count in small.items() if word in large)
 
 class SimilarityMatcher:
-    def __init__(self):
-        self.stop_words = {
-            'the', 'of', 'and', 'in', 'to', 'a', 'is', 'that', 'it', 'on', 'for', 'with', 'as',
-            'by', 'at', 'from', 'this', 'was', 'are', 'be', 'were', 'which', 'an', 'or', 'not',
-            'but', 'have', 'has', 'had', 'will', 'would', 'could', 'should', 'may', 'might',
-            'shall', 'who', 'whom', 'whose', 'what', 'where', 'when', 'why', 'how', 'all',
-            'any', 'both', 'each', 'few', 'more', 'most', 'other', 'some', 'such', 'no', 'nor',
-            'too', 'very', 'so', 'than', 's', 't', 'can', 'will', 'just', 'don', 'should', 'now'
-        }
+    def __init__(self, tokenizer=None):
+        # 分词器及其词表由该匹配器下的所有矩阵、索引和查询共享
+        self.tokenizer = tokenizer if tokenizer is not None else Tokenizer()
+        self.stop_words = self.tokenizer.stop_words
+        self.vocabulary = self.tokenizer.vocabulary
     
     def preprocess_text(self, text):
         """
         文本预处理：转换为小写，去除标点符号，去除停用词
         """
-        # 转换为小写
-        text = text.lower()
-        # 去除标点符号
-        text = re.sub(r'[^\w\s]', '', text)
-        # 分词
-        words = text.split()
-        # 去除停用词
-        words = [word for word in words if word not in self.stop_words]
-        return words
+        return self.tokenizer.tokenize(text)
+    
+    def encode(self, text):
+        """
+        文本预处理并转换为词ID数组（array('I')）
+        """
+        return self.tokenizer.encode(text)
+    
+    def prepare(self, text):
+        """
+        预处理查询文本，返回可在多篇文章、多种算法间复用的PreparedQuery
+        已经是PreparedQuery时直接返回
+        """
+        if isinstance(text, PreparedQuery):
+            return text
+        return PreparedQuery(text, self.encode(text))
     
     def jaccard_similarity(self, text1, text2):
         """
         计算Jaccard相似度：交集大小 / 并集大小
+        text1, text2: 文本字符串或PreparedQuery
         """
-        words1 = set(self.preprocess_text(text1))
-        words2 = set(self.preprocess_text(text2))
+        words1 = self.prepare(text1).token_set
+        words2 = self.prepare(text2).token_set
         
         # 计算交集和并集
         intersection = len(words1.intersection(words2))
-        union = len(words1.union(words2))
+        union = len(words1) + len(words2) - intersection
         
         # 避免除以零
         if union == 0:
@@ -47,68 +88,49 @@ class SimilarityMatcher:
     def cosine_similarity(self, text1, text2):
         """
         计算余弦相似度
+        text1, text2: 文本字符串或PreparedQuery
         """
-        words1 = self.preprocess_text(text1)
-        words2 = self.preprocess_text(text2)
-        
-        # 计算词频
-        freq1 = Counter(words1)
-        freq2 = Counter(words2)
-        
-        # 获取所有唯一词
-        all_words = set(freq1.keys()).union(set(freq2.keys()))
-        
-        # 计算点积
-        dot_product = sum(freq1.get(word, 0) * freq2.get(word, 0) for word in all_words)
-        
-        # 计算模长
-        norm1 = math.sqrt(sum(freq1.get(word, 0) ** 2 for word in all_words))
-        norm2 = math.sqrt(sum(freq2.get(word, 0) ** 2 for word in all_words))
+        query1 = self.prepare(text1)
+        query2 = self.prepare(text2)
         
         # 避免除以零
-        if norm1 == 0 or norm2 == 0:
+        if query1.norm == 0 or query2.norm == 0:
             return 0.0
         
-        return dot_product / (norm1 * norm2)
+        # 计算点积
+        dot_product = query1.dot(query2)
+        
+        return dot_product / (query1.norm * query2.norm)
     
     def word_frequency_similarity(self, text1, text2):
         """
         基于词频的相似度：计算共同词的频率总和
+        text1, text2: 文本字符串或PreparedQuery
         """
-        words1 = self.preprocess_text(text1)
-        words2 = self.preprocess_text(text2)
-        
-        # 计算词频
-        freq1 = Counter(words1)
-        freq2 = Counter(words2)
+        query1 = self.prepare(text1)
+        query2 = self.prepare(text2)
         
-        # 计算共同词的频率总和
-        common_words = set(freq1.keys()).intersection(set(freq2.keys()))
-        if not common_words:
-            return 0.0
-        
-        # 计算相似度分数
-        total_freq1 = sum(freq1.values())
-        total_freq2 = sum(freq2.values())
-        
-        if total_freq1 == 0 or total_freq2 == 0:
+        if query1.total == 0 or query2.total == 0:
             return 0.0
         
         # 计算共同词在两个文本中的频率比例之和
-        similarity = 0.0
-        for word in common_words:
-            similarity += (freq1[word] / total_freq1) * (freq2[word] / total_freq2)
-        
-        return similarity
+        return query1.dot(query2) / (query1.total * query2.total)
     
-    def calculate_similarity(self, test_text, article, method='cosine'):
+    def calculate_similarity(self, test_text, article, method='cosine', statistics=None):
         """
         计算测试文本与单篇文章的相似度
+        test_text: 文本字符串或PreparedQuery
         article: 文章字典，包含title和summary字段
-        method: 相似度计算方法，可选值：cosine, jaccard, word_frequency
+        method: 相似度计算方法，可选值：cosine, jaccard, word_frequency, bm25, tfidf
+        statistics: bm25和tfidf使用的CorpusStatistics（通常由build_statistics对整批候选文章计算），
+                    None表示只以这一篇文章作为语料
         """
+        if method in ('bm25', 'tfidf'):
+            matrix = self.build_matrix([article])
+            return float(matrix.score(self.prepare(test_text), method, statistics=statistics)[0])
+        
         # 组合文章标题和摘要
-        article_text = article.get('title', '') + ' ' + article.get('summary', '')
+        article_text = self.article_text(article)
         
         # 根据选择的方法计算相似度
         if method == 'jaccard':
@@ -118,27 +140,280 @@ class SimilarityMatcher:
         else: # 默认使用余弦相似度
             return self.cosine_similarity(test_text, article_text)
     
-    def rank_articles(self, test_text, articles, method='cosine', top_n=None):
+    def article_text(self, article):
+        """
+        组合文章标题和摘要，作为相似度计算的文本
+        """
+        return article.get('title', '') + ' ' + article.get('summary', '')
+    
+    def build_matrix(self, articles):
+        """
+        将文章列表构建为词项-文档稀疏矩阵，供批量打分使用
+        """
+        documents = [self.encode(self.article_text(article)) for article in articles]
+        return TermDocumentMatrix(documents, self.vocabulary)
+    
+    def build_statistics(self, articles):
+        """
+        计算一批文章的语料统计（文档频率、平均长度），供bm25和tfidf使用
+        之后新增的文章可通过 statistics.add_matrix(matcher.build_matrix(new_articles)) 增量计入
+        """
+        return CorpusStatistics.from_matrix(self.build_matrix(articles))
+    
+    def score_articles(self, test_text, articles, method='cosine', matrix=None, statistics=None):
+        """
+        批量计算测试文本与所有文章的相似度
+        test_text: 文本字符串或PreparedQuery
+        matrix: 可选的预先构建好的词项-文档矩阵，需与articles一一对应
+        statistics: bm25和tfidf使用的CorpusStatistics，None表示使用articles自身的统计
+        返回: 与articles顺序一致的相似度数组
+        """
+        if matrix is None:
+            matrix = self.build_matrix(articles)
+        return matrix.score(self.prepare(test_text), method, statistics=statistics)
+    
+    def save_snapshot(self, articles, directory):
+        """
+        将文章分词、构建矩阵后保存为快照目录，之后可通过load_snapshot直接加载，无需重新分词
+        """
+        articles = list(articles)
+        save_snapshot(directory, articles, self.build_matrix(articles))
+    
+    def load_snapshot(self, directory):
+        """
+        加载快照（矩阵数组内存映射，文章元数据按需解码），并使用快照的词表编码查询
+        返回的CorpusSnapshot可直接传给rank_articles、rank_many和score_all
+        只能在尚未编码过文本的匹配器上调用（词ID需与快照一致）
+        """
+        if len(self.vocabulary):
+            raise ValueError("匹配器的词表不为空，无法使用快照的词表")
+        snapshot = load_snapshot(directory)
+        self.vocabulary = self.tokenizer.vocabulary = snapshot.vocabulary
+        return snapshot
+    
+    def build_index(self, articles):
+        """
+        为文章语料构建倒排索引，用于大规模语料的剪枝top-n查询
+        articles: 文章列表，或SimHashIndex/CorpusSnapshot（复用其矩阵，不重新分词）
+        """
+        if isinstance(articles, (SimHashIndex, CorpusSnapshot)):
+            return InvertedIndex(articles.articles, articles.matrix)
+        articles = list(articles)
+        return InvertedIndex(articles, self.build_matrix(articles))
+    
+    def build_lsh_index(self, articles, bands=32, rows=4):
+        """
+        为文章语料构建MinHash LSH索引，用于Jaccard近似重复检索
+        签名由词（而不是进程内的词ID）哈希得到，不同进程构建的签名可以相互比较
+        bands, rows: 分段数和每段行数，签名长度为 bands * rows
+        """
+        index = LSHIndex(bands=bands, rows=rows)
+        for article in articles:
+            index.add(article, self.preprocess_text(self.article_text(article)))
+        return index
+    
+    def find_near_duplicates(self, test_text, lsh_index, threshold=0.5):
+        """
+        在LSH索引中查找与测试文本Jaccard相似度不低于阈值的文章
+        候选由LSH桶给出，再精确计算Jaccard相似度
+        """
+        query = self.prepare(test_text)
+        hits = lsh_index.search({self.vocabulary.token(token_id) for token_id in query.token_set}, threshold)
+        return self._format_ranking(lsh_index.articles, hits)
+    
+    def build_simhash_index(self, articles, bits=64):
+        """
+        为文章语料预先计算SimHash指纹，用于近似余弦相似度检索
+        articles: 文章列表，或InvertedIndex/CorpusSnapshot（复用其矩阵，不重新分词）
+        """
+        if isinstance(articles, (InvertedIndex, CorpusSnapshot)):
+            return SimHashIndex(articles.articles, articles.matrix, bits=bits)
+        articles = list(articles)
+        return SimHashIndex(articles, self.build_matrix(articles), bits=bits)
+    
+    def rank_articles(self, test_text, articles, method='cosine', top_n=None, approximate=False, workers=None,
+                      statistics=None):
         """
         对文章列表按相似度进行排序
-        articles: 文章列表
+        test_text: 文本字符串或PreparedQuery
+        articles: 文章列表，或build_index构建的InvertedIndex（配合top_n使用剪枝查询），
+                  或build_simhash_index构建的SimHashIndex，或load_snapshot加载的CorpusSnapshot
         method: 相似度计算方法
         top_n: 返回前n篇文章，None表示返回所有
+        approximate: 为True且method为cosine、设置了top_n时，先按SimHash汉明距离预选候选再精确重排
+        workers: 大于1且语料不少于MIN_PARALLEL_DOCS篇时将打分阶段分片到多个进程并行计算（语料矩阵放在共享内存中，
+                 SimHashIndex和CorpusSnapshot的共享内存在多次调用间复用）
+        statistics: bm25和tfidf使用的CorpusStatistics，None表示使用候选文章自身的统计
         """
-        # 计算每篇文章的相似度
-        ranked_articles = []
-        for article in articles:
-            similarity_score = self.calculate_similarity(test_text, article, method)
-            ranked_articles.append({
-                'article': article,
-                'similarity_score': similarity_score
-            })
+        query = self.prepare(test_text)
+        
+        # SimHash近似检索：仅支持余弦相似度的前n篇查询
+        if approximate and method == 'cosine' and top_n:
+            if not isinstance(articles, SimHashIndex):
+                articles = self.build_simhash_index(articles)
+            hits = articles.search(query, top_n)
+            return self._format_ranking(articles.articles, hits)
+        
+        # 倒排索引：cosine和word_frequency通过MaxScore剪枝精确返回前n篇
+        if isinstance(articles, InvertedIndex):
+            hits = articles.search(query, method, top_n)
+            return self._format_ranking(articles.articles, hits)
         
-        # 按相似度降序排序
-        ranked_articles.sort(key=lambda x: x['similarity_score'], reverse=True)
+        # SimHash索引和快照：直接使用已构建的矩阵（快照的矩阵为内存映射，只解码返回的文章）
+        corpus = None
+        if isinstance(articles, (SimHashIndex, CorpusSnapshot)):
+            corpus = articles
+            matrix, articles = articles.matrix, articles.articles
+        else:
+            articles = list(articles)
+            matrix = None
+        
+        # 多进程打分：各分片返回局部前n篇，归并后与单进程结果一致
+        # 索引和快照的共享内存常驻在对象上，多次查询只复制一次矩阵；文章列表每次调用临时构建；
+        # 少于MIN_PARALLEL_DOCS篇时并行的固定开销超过收益，仍在当前进程打分
+        if workers and workers > 1 and len(articles) >= MIN_PARALLEL_DOCS:
+            if corpus is not None:
+                hits = get_scorer(corpus, workers).rank(query, method, top_n, statistics)
+            else:
+                with ParallelScorer(self.build_matrix(articles), workers) as scorer:
+                    hits = scorer.rank(query, method, top_n, statistics)
+            return self._format_ranking(articles, hits)
+        
+        # 一次性构建稀疏矩阵，批量计算所有文章的相似度
+        scores = self.score_articles(query, articles, method, matrix=matrix, statistics=statistics)
+        
+        # 按相似度降序排序（稳定排序，相同分数保持原有顺序）
+        order = np.argsort(-scores, kind='stable')
         
         # 返回前n篇文章
         if top_n:
-            ranked_articles = ranked_articles[:top_n]
+            order = order[:top_n]
         
-        return ranked_articles
\ No newline at end of file
+        return self._format_ranking(articles, ((i, scores[i]) for i in order))
+    
+    def rank_stream(self, test_text, articles, method='cosine', top_n=10, chunk_size=STREAM_CHUNK_SIZE,
+                    statistics=None):
+        """
+        流式排序：逐批读取任意可迭代的文章（如获取器返回的生成器），只保留前n篇
+        内存占用为 O(n + chunk_size)，选取前n篇的复杂度为 O(N log n)，结果与rank_articles一致
+        test_text: 文本字符串或PreparedQuery
+        articles: 文章的可迭代对象
+        top_n: 返回前n篇文章，必须为正整数
+        chunk_size: 每批构建稀疏矩阵的文章数
+        statistics: bm25和tfidf使用的CorpusStatistics；流式读取时无法预先得到全部文章的统计，因此必须提供
+        """
+        if not top_n or top_n < 0:
+            raise ValueError("流式排序需要指定正整数top_n")
+        if method in ('bm25', 'tfidf') and statistics is None:
+            raise ValueError(f"流式排序使用{method}时需要提供语料统计statistics")
+        query = self.prepare(test_text)
+        
+        # 小顶堆，元素为 (相似度, -序号, 文章)：堆顶是当前最差的结果，相同分数时序号大的更差
+        heap = []
+        sequence = 0
+        iterator = iter(articles)
+        while True:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if not chunk:
+                break
+            scores = self.build_matrix(chunk).score(query, method, statistics=statistics)
+            
+            # 堆已满时只有分数不低于堆顶的文章才可能入选
+            candidates = range(len(chunk))
+            if len(heap) == top_n:
+                candidates = np.flatnonzero(scores >= heap[0][0])
+            for i in candidates:
+                item = (float(scores[i]), -(sequence + int(i)), chunk[i])
+                if len(heap) < top_n:
+                    heapq.heappush(heap, item)
+                else:
+                    heapq.heappushpop(heap, item)
+            sequence += len(chunk)
+        
+        return [
+            {
+                'article': article,
+                'similarity_score': score
+            }
+            for score, _, article in sorted(heap, key=lambda item: (-item[0], -item[1]))
+        ]
+    
+    def rank_many(self, texts, articles, method='cosine', top_n=None):
+        """
+        批量查询：多篇文本共享同一批候选文章，一次矩阵乘法完成所有打分
+        texts: 文本字符串或PreparedQuery的列表
+        articles: 文章列表，或InvertedIndex/SimHashIndex/CorpusSnapshot（复用其矩阵）
+        返回: 与texts一一对应的排序结果列表，每项格式同rank_articles
+        """
+        if isinstance(articles, (InvertedIndex, SimHashIndex, CorpusSnapshot)):
+            matrix, articles = articles.matrix, articles.articles
+        else:
+            articles = list(articles)
+            matrix = self.build_matrix(articles)
+        
+        queries = [self.prepare(text) for text in texts]
+        scores = matrix.score_batch(queries, method)
+        
+        rankings = []
+        for row in scores:
+            order = np.argsort(-row, kind='stable')
+            if top_n:
+                order = order[:top_n]
+            rankings.append(self._format_ranking(articles, ((i, row[i]) for i in order)))
+        return rankings
+    
+    def score_all(self, test_text, articles, weights=None, top_n=None, sort_by='cosine'):
+        """
+        单次遍历计算所有相似度算法的分数，每篇文章只分词一次
+        test_text: 文本字符串或PreparedQuery
+        articles: 文章列表，或InvertedIndex/SimHashIndex/CorpusSnapshot（复用其矩阵）
+        weights: 可选的加权融合权重，如 {'cosine': 0.6, 'jaccard': 0.2, 'word_frequency': 0.2}，
+                 融合分数为按权重之和归一化的加权平均（不在SIMILARITY_METHODS中的算法被忽略）
+        top_n: 返回前n篇文章，None表示返回所有
+        sort_by: 排序依据的算法；设置了weights时按融合分数排序
+        返回: [{'article': 文章, 'scores': {算法: 分数}, 'similarity_score': 排序分数}, ...]
+        """
+        if isinstance(articles, (InvertedIndex, SimHashIndex, CorpusSnapshot)):
+            matrix, articles = articles.matrix, articles.articles
+        else:
+            articles = list(articles)
+            matrix = self.build_matrix(articles)
+        
+        scores = matrix.score_many(self.prepare(test_text), SIMILARITY_METHODS)
+        
+        if weights:
+            # 只按已知算法的权重之和归一化，未知算法的权重被忽略
+            weights = {method: weight for method, weight in weights.items() if method in scores}
+            total_weight = sum(weights.values())
+            ranking_scores = np.zeros(len(articles), dtype=np.float64)
+            for method, weight in weights.items():
+                if total_weight:
+                    ranking_scores += weight / total_weight * scores[method]
+        else:
+            ranking_scores = scores.get(sort_by, scores['cosine'])
+        
+        # 按排序分数降序排序（稳定排序，相同分数保持原有顺序）
+        order = np.argsort(-ranking_scores, kind='stable')
+        if top_n:
+            order = order[:top_n]
+        
+        return [
+            {
+                'article': articles[i],
+                'scores': {method: float(values[i]) for method, values in scores.items()},
+                'similarity_score': float(ranking_scores[i])
+            }
+            for i in order
+        ]
+    
+    def _format_ranking(self, articles, hits):
+        """
+        将(文档号, 相似度)序列转换为排序结果列表
+        """
+        return [
+            {
+                'article': articles[i],
+                'similarity_score': float(score)
+            }
+            for i, score in hits
+        ]
\ No newline at end of file
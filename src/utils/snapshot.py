@@ -0,0 +1,122 @@
+import json
+import mmap
+import os
+import numpy as np
+from src.utils.matrix import TermDocumentMatrix
+from src.utils.tokenizer import Vocabulary
+
+# 快照格式版本，格式变化时递增
+SNAPSHOT_FORMAT = 1
+
+# 保存为.npy文件、加载时内存映射的矩阵数组
+SNAPSHOT_ARRAYS = ('indptr', 'indices', 'data', 'rows', 'norms', 'lengths', 'set_sizes')
+
+# 快照目录中的文件
+META_FILE = 'meta.json'
+VOCABULARY_FILE = 'vocabulary.txt'
+ARTICLES_FILE = 'articles.jsonl'
+ARTICLE_OFFSETS_FILE = 'article_offsets.npy'
+
+
+class SnapshotArticles:
+    """
+    快照中的文章元数据（只读序列）
+    文章按行存为JSON，文件通过mmap映射，访问某篇文章时才按偏移量解码，
+    打分排序只需要矩阵，只有返回的前n篇文章会被解码
+    """
+
+    def __init__(self, directory):
+        self.offsets = np.load(os.path.join(directory, ARTICLE_OFFSETS_FILE), mmap_mode='r')
+        with open(os.path.join(directory, ARTICLES_FILE), 'rb') as articles_file:
+            # 空文件不能映射
+            self.buffer = mmap.mmap(articles_file.fileno(), 0, access=mmap.ACCESS_READ) \
+                if os.fstat(articles_file.fileno()).st_size else b''
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return json.loads(self.buffer[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class CorpusSnapshot:
+    """
+    从快照目录加载的语料：内存映射的词项-文档矩阵、词表和按需解码的文章元数据
+    矩阵数组以只读方式映射，不复制到进程内存，同一主机上的多个进程共享操作系统的页缓存
+    """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, META_FILE), 'r', encoding='utf-8') as meta_file:
+            self.meta = json.load(meta_file)
+        if self.meta.get('format') != SNAPSHOT_FORMAT:
+            raise ValueError(f"不支持的快照格式: {self.meta.get('format')}")
+
+        with open(os.path.join(directory, VOCABULARY_FILE), 'r', encoding='utf-8', newline='') as vocabulary_file:
+            tokens = vocabulary_file.read().split('\n') if self.meta['vocabulary_size'] else []
+        self.vocabulary = Vocabulary.from_tokens(tokens)
+
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in SNAPSHOT_ARRAYS}
+        indptr, indices, data = arrays.pop('indptr'), arrays.pop('indices'), arrays.pop('data')
+        self.matrix = TermDocumentMatrix.from_arrays(indptr, indices, data, self.meta['n_columns'],
+                                                     self.vocabulary, **arrays)
+        self.articles = SnapshotArticles(directory)
+
+    def __len__(self):
+        return self.matrix.n_docs
+
+
+def save_snapshot(directory, articles, matrix):
+    """
+    将文章和对应的词项-文档矩阵保存为快照目录
+    articles: 文章列表，与matrix的行一一对应
+    matrix: TermDocumentMatrix（需带有生成它的词表）
+    """
+    articles = list(articles)
+    if len(articles) != matrix.n_docs:
+        raise ValueError("文章数与矩阵行数不一致")
+    os.makedirs(directory, exist_ok=True)
+    # 覆盖已有快照时先删除元数据，写入中断时不会被当作完整的快照加载
+    if os.path.exists(os.path.join(directory, META_FILE)):
+        os.remove(os.path.join(directory, META_FILE))
+
+    for name in SNAPSHOT_ARRAYS:
+        np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(getattr(matrix, name)))
+
+    # 词按ID顺序每行一个（分词结果不含空白字符）
+    tokens = matrix.vocabulary.tokens
+    with open(os.path.join(directory, VOCABULARY_FILE), 'w', encoding='utf-8', newline='') as vocabulary_file:
+        vocabulary_file.write('\n'.join(tokens))
+
+    offsets = np.zeros(len(articles) + 1, dtype=np.int64)
+    with open(os.path.join(directory, ARTICLES_FILE), 'wb') as articles_file:
+        for i, article in enumerate(articles):
+            line = json.dumps(article, ensure_ascii=False).encode('utf-8') + b'\n'
+            articles_file.write(line)
+            offsets[i + 1] = offsets[i] + len(line)
+    np.save(os.path.join(directory, ARTICLE_OFFSETS_FILE), offsets)
+
+    # 元数据最后写入，目录中存在meta.json即表示快照完整
+    meta = {
+        'format': SNAPSHOT_FORMAT,
+        'n_docs': matrix.n_docs,
+        'n_columns': matrix.n_columns,
+        'vocabulary_size': len(tokens)
+    }
+    with open(os.path.join(directory, META_FILE), 'w', encoding='utf-8') as meta_file:
+        json.dump(meta, meta_file)
+
+
+def load_snapshot(directory):
+    """
+    加载快照目录（内存映射，不读取数组内容）
+    """
+    return CorpusSnapshot(directory)
@@ -0,0 +1,131 @@
+from array import array
+import re
+import threading
+import unicodedata
+
+# 英文停用词
+STOP_WORDS = frozenset({
+    'the', 'of', 'and', 'in', 'to', 'a', 'is', 'that', 'it', 'on', 'for', 'with', 'as',
+    'by', 'at', 'from', 'this', 'was', 'are', 'be', 'were', 'which', 'an', 'or', 'not',
+    'but', 'have', 'has', 'had', 'will', 'would', 'could', 'should', 'may', 'might',
+    'shall', 'who', 'whom', 'whose', 'what', 'where', 'when', 'why', 'how', 'all',
+    'any', 'both', 'each', 'few', 'more', 'most', 'other', 'some', 'such', 'no', 'nor',
+    'too', 'very', 'so', 'than', 's', 't', 'can', 'will', 'just', 'don', 'should', 'now'
+})
+
+# 去除标点符号（与原有预处理规则一致：标点直接删除）
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+
+
+def _build_cjk_separators():
+    """
+    中日韩标点和全角符号（如“。”“，”“：”）在粘贴的文本中常常紧挨着下一个词，
+    直接删除会把前后两个词粘在一起，因此先替换为空格作为分隔符
+    """
+    ranges = [(0x3000, 0x303F), (0xFF00, 0xFF65)]
+    table = {}
+    for begin, end in ranges:
+        for code in range(begin, end + 1):
+            if unicodedata.category(chr(code))[0] in 'PSZ':
+                table[code] = ' '
+    return table
+
+
+CJK_SEPARATORS = _build_cjk_separators()
+
+
+class Vocabulary:
+    """
+    词表：将词映射为从0开始的稠密整数ID
+    同一个SimilarityMatcher下的矩阵、索引和查询共享同一个词表
+    """
+
+    def __init__(self, tokens=()):
+        self.token_to_id = {}
+        self.tokens = []
+        self._lock = threading.Lock()
+        for token in tokens:
+            self.add(token)
+
+    @classmethod
+    def from_tokens(cls, tokens):
+        """
+        由按ID顺序排列的词列表直接创建词表（词不重复，用于加载快照）
+        """
+        vocabulary = cls()
+        vocabulary.tokens = list(tokens)
+        vocabulary.token_to_id = {token: token_id for token_id, token in enumerate(vocabulary.tokens)}
+        return vocabulary
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __contains__(self, token):
+        return token in self.token_to_id
+
+    def get(self, token, default=None):
+        """
+        查询词的ID，不存在时返回default
+        """
+        return self.token_to_id.get(token, default)
+
+    def add(self, token):
+        """
+        返回词的ID，不存在时分配新ID
+        """
+        token_id = self.token_to_id.get(token)
+        if token_id is None:
+            with self._lock:
+                token_id = self.token_to_id.get(token)
+                if token_id is None:
+                    token_id = len(self.tokens)
+                    self.tokens.append(token)
+                    self.token_to_id[token] = token_id
+        return token_id
+
+    def token(self, token_id):
+        """
+        根据ID查询词
+        """
+        return self.tokens[token_id]
+
+    def encode(self, tokens):
+        """
+        将词列表转换为紧凑的无符号整数ID数组
+        """
+        get = self.token_to_id.get
+        ids = array('I')
+        for token in tokens:
+            token_id = get(token)
+            if token_id is None:
+                token_id = self.add(token)
+            ids.append(token_id)
+        return ids
+
+
+class Tokenizer:
+    """
+    分词器：转换为小写、去除标点符号、去除停用词，并可输出整数ID数组
+    """
+
+    def __init__(self, stop_words=None, vocabulary=None):
+        self.stop_words = set(STOP_WORDS) if stop_words is None else stop_words
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+
+    def tokenize(self, text):
+        """
+        将文本切分为词列表
+        """
+        # 转换为小写，中日韩标点替换为空格
+        text = text.lower().translate(CJK_SEPARATORS)
+        # 去除标点符号
+        text = PUNCTUATION_PATTERN.sub('', text)
+        # 分词并去除停用词
+        stop_words = self.stop_words
+        return [word for word in text.split() if word not in stop_words]
+
+    def encode(self, text):
+        """
+        将文本切分并转换为词ID数组（array('I')）
+        """
+        return self.vocabulary.encode(self.tokenize(text))
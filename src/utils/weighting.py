@@ -0,0 +1,100 @@
+import numpy as np
+
+# BM25参数：k1控制词频饱和速度，b控制文档长度归一化的强度
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+class CorpusStatistics:
+    """
+    语料统计信息：文档数、每个词的文档频率（DF）和文档总长度
+    用于BM25和TF-IDF加权，对一批候选文章只计算一次，之后可以增量添加或移除文档
+    """
+
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.n_docs = 0
+        self.total_length = 0.0
+        self.document_frequency = np.zeros(0, dtype=np.int64)
+        # 每次更新后递增，矩阵据此判断缓存的加权结果是否失效
+        self.version = 0
+
+    @classmethod
+    def from_matrix(cls, matrix, **kwargs):
+        """
+        由TermDocumentMatrix统计
+        """
+        statistics = cls(**kwargs)
+        statistics.add_matrix(matrix)
+        return statistics
+
+    @property
+    def average_length(self):
+        """
+        平均文档长度（总词数）
+        """
+        return self.total_length / self.n_docs if self.n_docs else 0.0
+
+    def _grow(self, size):
+        """
+        扩展文档频率数组以容纳新的词ID
+        """
+        if size > len(self.document_frequency):
+            self.document_frequency = np.concatenate(
+                (self.document_frequency, np.zeros(size - len(self.document_frequency), dtype=np.int64)))
+
+    def add_matrix(self, matrix, sign=1):
+        """
+        将矩阵中的所有文档计入统计（sign为-1时移除）
+        """
+        self._grow(matrix.n_columns)
+        counts = np.bincount(matrix.indices, minlength=len(self.document_frequency))
+        self.document_frequency += sign * counts
+        self.n_docs += sign * matrix.n_docs
+        self.total_length += sign * float(matrix.lengths.sum())
+        self.version += 1
+
+    def remove_matrix(self, matrix):
+        """
+        从统计中移除矩阵中的所有文档（这些文档必须已经计入）
+        """
+        self.add_matrix(matrix, sign=-1)
+
+    def add_document(self, token_ids):
+        """
+        计入单篇文档
+        token_ids: 文档的词ID数组（Tokenizer.encode的输出）
+        """
+        token_ids = np.asarray(token_ids, dtype=np.int64)
+        unique = np.unique(token_ids)
+        if len(unique):
+            self._grow(int(unique[-1]) + 1)
+            self.document_frequency[unique] += 1
+        self.n_docs += 1
+        self.total_length += len(token_ids)
+        self.version += 1
+
+    def frequencies(self, size):
+        """
+        长度为size的文档频率数组（没有统计过的词频率为0）
+        只读，不修改统计（version不变，矩阵缓存的加权结果仍然有效）
+        """
+        frequency = self.document_frequency[:size]
+        if len(frequency) < size:
+            frequency = np.concatenate((frequency, np.zeros(size - len(frequency), dtype=np.int64)))
+        return frequency
+
+    def bm25_idf(self, size):
+        """
+        BM25的IDF：log(1 + (N - df + 0.5) / (df + 0.5))，始终为非负数
+        """
+        df = self.frequencies(size)
+        return np.log1p((self.n_docs - df + 0.5) / (df + 0.5))
+
+    def tfidf_idf(self, size):
+        """
+        平滑的TF-IDF逆文档频率：log((1 + N) / (1 + df)) + 1
+        """
+        df = self.frequencies(size)
+        return np.log((1.0 + self.n_docs) / (1.0 + df)) + 1.0
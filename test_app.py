@@ -0,0 +1,111 @@
+"""
+离线测试：接口参数校验（非法参数在获取候选论文之前返回400），摘要翻译的超时处理（大模型调用用桩函数代替）
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import requests
+import app as web
+from app import main
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("参数非法时不应获取候选论文")
+    monkeypatch.setattr(web, 'fetch_candidates', fail)
+    return web.app.test_client()
+
+
+@pytest.mark.parametrize('weights', [
+    [1],
+    'cosine',
+    {'cosine': 1, 'bogus': 1},
+    {'cosine': 'x'},
+    {'cosine': True},
+    {'cosine': -1},
+    {'cosine': 0},
+    {},
+])
+def test_match_rejects_invalid_weights(client, weights):
+    response = client.post('/api/match', json={'text': 'flood detection', 'weights': weights})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+@pytest.mark.parametrize('deadline', ['soon', -1, True, [5], {'seconds': 5}, 'nan', 'inf'])
+@pytest.mark.parametrize('url, payload', [
+    ('/api/match', {'text': 'flood detection'}),
+    ('/api/match/batch', {'texts': ['flood detection'], 'translate': True}),
+])
+def test_match_rejects_invalid_translation_deadline(client, url, payload, deadline):
+    response = client.post(url, json={**payload, 'translation_deadline': deadline})
+    assert response.status_code == 400
+    assert 'translation_deadline' in response.get_json()['error']
+
+
+def test_translation_deadline_is_clamped():
+    assert web.parse_translation_deadline(None) is None
+    assert web.parse_translation_deadline(0) == 0
+    assert web.parse_translation_deadline('2.5') == 2.5
+    assert web.parse_translation_deadline(10 ** 9) == web.MAX_TRANSLATION_DEADLINE
+
+
+def test_translate_summaries_returns_placeholders_and_cancels_queued(monkeypatch):
+    release = threading.Event()
+    started = []
+
+    def slow_translate(summary):
+        started.append(summary)
+        if summary == 'broken':
+            raise RuntimeError('接口错误')
+        if summary.startswith('slow'):
+            release.wait(5)
+        return f'译文: {summary}'
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(web, 'translation_pool', pool)
+    monkeypatch.setattr(web, 'translate_summary', slow_translate)
+    summaries = ['fast', 'broken', 'fast', 'slow1', 'slow2', 'queued1', 'queued2']
+    try:
+        translations = web.translate_summaries(iter(summaries), deadline=0.3)
+    finally:
+        release.set()
+        pool.shutdown(wait=True)
+
+    assert translations == {
+        'fast': '译文: fast',
+        'broken': '翻译失败: 接口错误',
+        'slow1': web.TRANSLATION_TIMEOUT_PLACEHOLDER,
+        'slow2': web.TRANSLATION_TIMEOUT_PLACEHOLDER,
+        'queued1': web.TRANSLATION_TIMEOUT_PLACEHOLDER,
+        'queued2': web.TRANSLATION_TIMEOUT_PLACEHOLDER,
+    }
+    # 相同摘要只翻译一次；两个线程都被慢翻译占用，排队的翻译被取消，不再执行
+    assert sorted(started) == ['broken', 'fast', 'slow1', 'slow2']
+
+
+class FailingSession:
+    def __init__(self, error):
+        self.error = error
+        self.timeouts = []
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        self.timeouts.append(timeout)
+        if self.error is requests.exceptions.Timeout:
+            time.sleep(timeout)
+        raise self.error('请求失败')
+
+
+@pytest.mark.parametrize('error', [requests.exceptions.ConnectionError, requests.exceptions.Timeout])
+def test_translate_summary_stays_within_call_timeout(monkeypatch, error):
+    session = FailingSession(error)
+    monkeypatch.setattr(main, 'get_session', lambda: session)
+    monkeypatch.setattr(main, 'get_translation_cache', lambda: None)
+    start_time = time.monotonic()
+    result = main.translate_summary('flood detection', call_timeout=0.3)
+    # 请求的超时和重试前的等待（2秒）都不超过剩余时间，时限用完后不再重试
+    assert time.monotonic() - start_time < 0.8
+    assert result.startswith('翻译失败')
+    assert len(session.timeouts) == 1 and session.timeouts[0] <= 0.3
@@ -0,0 +1,44 @@
+"""
+离线测试：在录制的arXiv响应（fixtures/arxiv_cs_cv.xml）上，标准库和lxml两个解析后端的结果一致
+"""
+import os
+import pytest
+from src.services import atom
+from src.services.atom import AtomStreamParser
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'arxiv_cs_cv.xml')
+
+
+@pytest.fixture
+def recorded():
+    with open(FIXTURE, 'rb') as fixture:
+        return fixture.read()
+
+
+def test_etree_parser_reads_recorded_fields(recorded):
+    result = AtomStreamParser(backend='etree').parse(recorded)
+    assert result['total_results'] == 1873
+    entries = result['entries']
+    assert [entry['id'].rsplit('/', 1)[-1] for entry in entries] == \
+        ['2406.07541v1', '2406.07530v2', '2406.07499v1', '2406.07488v1']
+    assert entries[0]['doi'] == '10.1109/TGRS.2024.3411111' and 'doi' not in entries[1]
+    assert entries[0]['categories'] == ['cs.CV', 'eess.IV']
+    assert entries[1]['authors'] == ['Ana Souza']
+    assert entries[2]['title'] == '洪水检测：多源遥感影像数据集'
+    assert entries[3]['summary'] == '' and entries[3]['authors'] == []
+
+
+def test_lxml_parser_matches_etree(recorded):
+    if atom.lxml_etree is None:
+        pytest.skip('lxml未安装')
+    expected = AtomStreamParser(backend='etree').parse(recorded)
+    assert AtomStreamParser(backend='lxml').parse(recorded) == expected
+
+    # 流式读取文件对象时结果相同，totalResults在条目之前读到
+    parser = AtomStreamParser(backend='lxml')
+    with open(FIXTURE, 'rb') as fixture:
+        entries = parser.iter_entries(fixture)
+        first = next(entries)
+        assert parser.total_results == expected['total_results']
+        assert [first] + list(entries) == expected['entries']
+    assert parser.count == len(expected['entries'])
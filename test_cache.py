@@ -0,0 +1,90 @@
+"""
+离线测试：响应缓存的过期、按最近访问淘汰（连同页面索引）和离线回放
+"""
+import os
+import random
+import pytest
+from src.services import cache
+from src.services.cache import ResponseCache
+
+URL = 'http://export.arxiv.org/api/query'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache, 'time', clock)
+    return clock
+
+
+def page(start, size=20):
+    return {'search_query': 'cat:cs.CV', 'start': start, 'max_results': size}
+
+
+def body(seed):
+    # 随机内容压缩后的大小基本相同
+    generator = random.Random(seed)
+    return ''.join(generator.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(2000))
+
+
+def set_accessed(response_cache, params, accessed):
+    _, meta_path = response_cache._paths(response_cache.key(URL, params))
+    os.utime(meta_path, (accessed, accessed))
+
+
+def test_entries_expire_after_ttl_but_replay_offline(clock, tmp_path):
+    online = ResponseCache(str(tmp_path), ttl=60)
+    online.set(URL, page(0), body(0))
+    clock.now += 59
+    assert online.get(URL, page(0)) == body(0)
+    clock.now += 2
+    assert online.get(URL, page(0)) is None
+    assert online.get_page(URL, page(0, size=40)) is None
+    assert online.stats['hits'] == 1 and online.stats['misses'] == 2
+
+    # 离线回放忽略过期时间
+    offline = ResponseCache(str(tmp_path), ttl=60, offline=True)
+    assert offline.get(URL, page(0)) == body(0)
+    assert offline.get_page(URL, page(0, size=40)) == body(0)
+
+
+def test_eviction_removes_least_recently_used_entries_and_their_pages(tmp_path):
+    response_cache = ResponseCache(str(tmp_path))
+    response_cache.set(URL, page(0), body(0))
+    size = response_cache._size
+    response_cache.max_bytes = int(size * 2.5)
+    response_cache.set(URL, page(20), body(1))
+    set_accessed(response_cache, page(0), 1000)
+    set_accessed(response_cache, page(20), 2000)
+    # 读取较早写入的页面后，它成为最近访问的条目
+    assert response_cache.get(URL, page(0)) == body(0)
+
+    response_cache.set(URL, page(40), body(2))
+    assert response_cache.stats['evictions'] == 1
+    assert response_cache.get(URL, page(20)) is None
+    assert response_cache.get_page(URL, page(20)) is None
+    assert not os.path.exists(response_cache._page_path(response_cache.page_key(URL, page(20))))
+    assert response_cache.get(URL, page(0)) == body(0)
+    assert response_cache.get(URL, page(40)) == body(2)
+    assert response_cache._size <= response_cache.max_bytes
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('.page')]) == 2
+
+
+def test_eviction_keeps_page_index_rewritten_by_another_batch_size(tmp_path):
+    response_cache = ResponseCache(str(tmp_path))
+    response_cache.set(URL, page(0, size=20), body(0))
+    response_cache.max_bytes = int(response_cache._size * 1.5)
+    set_accessed(response_cache, page(0, size=20), 1000)
+    # 同一起始位置以其他批次大小写入，页面索引指向新的条目；淘汰旧条目时保留索引
+    response_cache.set(URL, page(0, size=40), body(1))
+    assert response_cache.stats['evictions'] == 1
+    assert response_cache.get(URL, page(0, size=20)) is None
+    assert response_cache.get_page(URL, page(0, size=20)) == body(1)
@@ -0,0 +1,147 @@
+"""
+离线测试：分类列表的磁盘快照、过期后返回旧数据并在后台刷新、刷新失败后的重试间隔（抓取用桩函数代替）
+"""
+import json
+import os
+import threading
+import pytest
+from src.services import category
+from src.services.category import CategoryManager, REFRESH_RETRY_DELAY
+
+OLD = [{'id': 'cs.CV', 'name': 'Computer Vision', 'discipline': 'Computer Science'}]
+NEW = OLD + [{'id': 'eess.IV', 'name': 'Image and Video Processing',
+              'discipline': 'Electrical Engineering and Systems Science'}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+class FakeFetch:
+    """
+    代替fetch_categories：记录调用次数，release之前阻塞，fail为True时抛出异常
+    """
+
+    def __init__(self, categories=NEW, fail=False):
+        self.categories = categories
+        self.fail = fail
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.started = threading.Event()
+        self.released = threading.Event()
+        self.released.set()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+        self.started.set()
+        self.released.wait(5)
+        if self.fail:
+            raise ConnectionError('arxiv.org不可用')
+        return [dict(item) for item in self.categories]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(category, 'time', clock)
+    return clock
+
+
+def manager(tmp_path, fetch, ttl=3600):
+    manager = CategoryManager(snapshot_path=str(tmp_path / 'categories.json'), ttl=ttl)
+    manager.fetch_categories = fetch
+    return manager
+
+
+def write_snapshot(tmp_path, categories, fetched_at):
+    with open(tmp_path / 'categories.json', 'w', encoding='utf-8') as snapshot_file:
+        json.dump({'fetched_at': fetched_at, 'categories': categories}, snapshot_file)
+
+
+def test_stale_snapshot_is_served_while_refreshing(clock, tmp_path):
+    write_snapshot(tmp_path, OLD, clock.now - 7200)
+    fetch = FakeFetch()
+    fetch.released.clear()
+    categories = manager(tmp_path, fetch)
+
+    # 快照已过期：立即返回旧数据，后台线程抓取
+    assert categories.get_categories() == OLD
+    assert fetch.started.wait(5)
+    assert categories.get_categories() == OLD
+    assert categories.get_category_by_id('eess.IV') is None
+    assert fetch.calls == 1
+
+    fetch.released.set()
+    categories._refresh_thread.join(5)
+    assert categories.get_categories() == NEW
+    assert categories.list_categories('electrical engineering and systems science') == NEW[1:]
+    assert not categories.is_stale()
+    # 刷新结果写入快照，新的管理器不需要抓取
+    assert manager(tmp_path, FakeFetch(fail=True)).get_categories() == NEW
+    assert fetch.calls == 1
+
+
+def test_snapshot_save_is_atomic(clock, tmp_path, monkeypatch):
+    categories = manager(tmp_path, FakeFetch())
+    assert categories.get_categories() == NEW
+    assert os.listdir(tmp_path) == ['categories.json']
+
+    # 写入中断时原快照保持完整
+    def broken_dump(data, snapshot_file, **kwargs):
+        snapshot_file.write('{"fetched_at": ')
+        raise OSError('磁盘已满')
+    with monkeypatch.context() as patch:
+        patch.setattr(category.json, 'dump', broken_dump)
+        with pytest.raises(OSError):
+            categories._save_snapshot(OLD, clock.now)
+    assert os.listdir(tmp_path) == ['categories.json']
+    reloaded = CategoryManager(snapshot_path=str(tmp_path / 'categories.json'))
+    assert reloaded._load_snapshot() and reloaded._categories == NEW
+
+    # 损坏的快照被忽略，重新抓取
+    with open(tmp_path / 'categories.json', 'w', encoding='utf-8') as snapshot_file:
+        snapshot_file.write('{"fetched_at": ')
+    fetch = FakeFetch(categories=OLD)
+    assert manager(tmp_path, fetch).get_categories() == OLD
+    assert fetch.calls == 1
+
+
+def test_failed_refresh_waits_before_retrying(clock, tmp_path):
+    write_snapshot(tmp_path, OLD, clock.now - 7200)
+    fetch = FakeFetch(fail=True)
+    categories = manager(tmp_path, fetch)
+    assert categories.get_categories() == OLD
+    categories._refresh_thread.join(5)
+    assert fetch.calls == 1
+
+    # 重试间隔内继续返回旧数据，不再抓取
+    clock.now += REFRESH_RETRY_DELAY - 1
+    assert categories.get_categories() == OLD
+    assert not categories._refresh_thread.is_alive() and fetch.calls == 1
+
+    clock.now += 2
+    fetch.fail = False
+    assert categories.get_categories() == OLD
+    categories._refresh_thread.join(5)
+    assert fetch.calls == 2 and categories.get_categories() == NEW
+
+
+def test_concurrent_calls_without_data_fetch_once(clock, tmp_path):
+    fetch = FakeFetch()
+    fetch.released.clear()
+    categories = manager(tmp_path, fetch)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(categories.get_categories())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    assert fetch.started.wait(5)
+    fetch.released.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [NEW] * 8
+    assert fetch.calls == 1
@@ -0,0 +1,61 @@
+"""
+离线测试：倒排索引的剪枝top-n查询与矩阵全量打分的稳定排序结果逐项一致
+"""
+import random
+import numpy as np
+import pytest
+from src.utils import index as index_module
+from src.utils.similarity import SimilarityMatcher
+from test_scoring import make_articles, QUERIES
+
+
+def full_ranking(matrix, query, method, top_n):
+    scores = matrix.score(query, method)
+    order = np.argsort(-scores, kind='stable')[:top_n]
+    return [(int(i), float(scores[i])) for i in order]
+
+
+def random_queries(count, seed=0):
+    generator = random.Random(seed)
+    words = ' '.join(article['summary'] for article in make_articles(50, seed=seed)).split()
+    return QUERIES + [' '.join(generator.choice(words) for _ in range(generator.randint(1, 60)))
+                      for _ in range(count)]
+
+
+# 1.0时候选集合不超过语料大小，总是走剪枝路径；0.0时总是退回全量打分
+@pytest.mark.parametrize('ratio', [0.0, index_module.FULL_SCORE_RATIO, 1.0])
+@pytest.mark.parametrize('method', ['cosine', 'word_frequency'])
+@pytest.mark.parametrize('top_n', [1, 5, 20, 400])
+def test_search_matches_full_ranking(monkeypatch, ratio, method, top_n):
+    monkeypatch.setattr(index_module, 'FULL_SCORE_RATIO', ratio)
+    matcher = SimilarityMatcher()
+    articles = make_articles(300, seed=5)
+    index = matcher.build_index(articles)
+    for text in random_queries(40, seed=6):
+        query = matcher.prepare(text)
+        assert index.search(query, method, top_n) == full_ranking(index.matrix, query, method, top_n)
+
+
+def test_rank_articles_with_index_matches_list():
+    matcher = SimilarityMatcher()
+    articles = make_articles(200, seed=7)
+    index = matcher.build_index(articles)
+    for method in ('cosine', 'word_frequency', 'jaccard', 'bm25'):
+        for text in QUERIES:
+            expected = matcher.rank_articles(text, articles, method=method, top_n=10)
+            ranked = matcher.rank_articles(text, index, method=method, top_n=10)
+            assert [(item['article']['id'], item['similarity_score']) for item in ranked] == \
+                [(item['article']['id'], item['similarity_score']) for item in expected]
+
+
+def test_best_docs_reach_upper_bounds():
+    matcher = SimilarityMatcher()
+    index = matcher.build_index(make_articles(100, seed=8))
+    for method, weights in index.weights.items():
+        for term in range(len(index.term_ptr) - 1):
+            begin, end = index.term_ptr[term], index.term_ptr[term + 1]
+            if begin == end:
+                continue
+            doc = index.best_docs[method][term]
+            position = begin + int(np.flatnonzero(index.postings[begin:end] == doc)[0])
+            assert weights[position] == index.upper_bounds[method][term]
@@ -0,0 +1,46 @@
+"""
+离线测试：MinHash通用哈希的计算结果、估计偏差，以及签名与词表无关
+"""
+import random
+import numpy as np
+from src.utils.minhash import MinHasher, MERSENNE_PRIME, MAX_HASH, token_hash
+from src.utils.similarity import SimilarityMatcher
+
+
+def test_signature_matches_exact_universal_hash():
+    hasher = MinHasher(64, seed=3)
+    generator = random.Random(0)
+    hashes = sorted({generator.getrandbits(32) for _ in range(500)} | {0, MAX_HASH})
+    expected = [min(((int(a) * x + int(b)) % MERSENNE_PRIME) & MAX_HASH for x in hashes)
+                for a, b in zip(hasher.a, hasher.b)]
+    assert hasher.signature_from_hashes(np.array(hashes, dtype=np.uint64)).tolist() == expected
+
+
+def estimate_bias(hasher, convert):
+    errors = []
+    for begin in range(0, 40000, 500):
+        first = {convert(i) for i in range(begin, begin + 200)}
+        second = {convert(i) for i in range(begin + 50, begin + 250)}
+        estimate = (hasher.signature(first) == hasher.signature(second)).mean()
+        errors.append(estimate - 150 / 250)
+    return float(np.mean(errors))
+
+
+def test_estimate_is_unbiased_for_contiguous_ids_and_words():
+    hasher = MinHasher(128)
+    assert abs(estimate_bias(hasher, int)) < 0.02
+    assert abs(estimate_bias(hasher, lambda i: f'word{i}')) < 0.02
+
+
+def test_lsh_signatures_do_not_depend_on_vocabulary():
+    articles = [{'title': f'paper {i}', 'summary': f'change detection flood radar topic{i % 5} sample{i}'}
+                for i in range(30)]
+    first, second = SimilarityMatcher(), SimilarityMatcher()
+    # 第二个匹配器先编码其他文本，同一个词得到不同的词ID
+    second.encode('unrelated words shift every vocabulary id')
+    index1 = first.build_lsh_index(articles)
+    index2 = second.build_lsh_index(articles)
+    assert index1.buckets == index2.buckets
+    text = 'flood change detection radar topic3'
+    assert first.find_near_duplicates(text, index1, 0.3) == second.find_near_duplicates(text, index2, 0.3)
+    assert token_hash('flood') == token_hash('flood')
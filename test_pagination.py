@@ -0,0 +1,108 @@
+"""
+离线测试：模拟分页接口（部分页面返回的条数少于请求的批次大小），
+顺序、并发和自适应获取的结果都应完整、有序且不重复，自适应获取缓存的页面可以离线回放
+"""
+import threading
+import pytest
+from src.services import pagination
+from src.services.cache import OfflineCacheMiss, ResponseCache
+from src.services.pagination import PaginationProcessor
+from src.services.query import QueryBuilder
+
+TOTAL_RESULTS = 237
+
+
+class NoLimit:
+    def acquire(self):
+        pass
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.content = text.encode('utf-8')
+
+    def raise_for_status(self):
+        pass
+
+
+def feed_xml(total, ids):
+    entries = ''.join(
+        f'<entry><id>http://arxiv.org/abs/{i}</id><title>paper {i}</title><summary>summary {i}</summary></entry>'
+        for i in ids)
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">'
+            f'<opensearch:totalResults>{total}</opensearch:totalResults>{entries}</feed>')
+
+
+class FakeFeed:
+    """
+    模拟arXiv接口：起始位置除以20的商为奇数的页面只返回一半的条目（arXiv偶尔返回不足一页的结果）
+    """
+
+    def __init__(self, total=TOTAL_RESULTS):
+        self.total = total
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None, stream=False):
+        start, size = int(params['start']), int(params['max_results'])
+        with self.lock:
+            self.requests.append((start, size))
+        count = max(0, min(size, self.total - start))
+        if (start // 20) % 2 == 1 and count > 1:
+            count //= 2
+        return FakeResponse(feed_xml(self.total, range(start, start + count)))
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    feed = FakeFeed()
+    monkeypatch.setattr(pagination, 'get_session', lambda: feed)
+    return feed
+
+
+def builder():
+    query = QueryBuilder()
+    query.add_category_filter('cs.CV')
+    return query
+
+
+def paper_ids(papers):
+    return [int(paper['id'].split('/abs/')[-1]) for paper in papers]
+
+
+@pytest.mark.parametrize('workers, adaptive', [(1, False), (4, False), (4, True)])
+@pytest.mark.parametrize('max_total', [None, 100])
+def test_fetch_all_has_no_gaps_with_short_pages(feed, workers, adaptive, max_total):
+    processor = PaginationProcessor(batch_size=20, workers=workers, rate_limiter=NoLimit(), adaptive=adaptive,
+                                    min_batch_size=10, max_batch_size=80)
+    papers = processor.fetch_all(builder(), max_total=max_total)
+    assert paper_ids(papers) == list(range(max_total or TOTAL_RESULTS))
+    # 确实出现过不足一页的响应
+    assert any(start // 20 % 2 == 1 for start, _ in feed.requests)
+
+
+class NoNetwork:
+    def get(self, url, params=None, timeout=None, stream=False):
+        raise AssertionError('离线回放不应发起网络请求')
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_offline_replay_of_adaptive_fetch(feed, monkeypatch, tmp_path, workers):
+    online = PaginationProcessor(batch_size=20, workers=workers, rate_limiter=NoLimit(), adaptive=True,
+                                 min_batch_size=10, max_batch_size=80, cache=ResponseCache(str(tmp_path)))
+    papers = online.fetch_all(builder())
+    # 自适应模式下各页的批次大小不同，缓存键中的max_results与固定批次大小不一致
+    assert len(set(online.stats['batch_sizes'])) > 1
+
+    monkeypatch.setattr(pagination, 'get_session', lambda: NoNetwork())
+    offline = PaginationProcessor(batch_size=20, workers=workers, rate_limiter=NoLimit(), adaptive=True,
+                                  cache=ResponseCache(str(tmp_path), offline=True))
+    assert paper_ids(offline.fetch_all(builder())) == paper_ids(papers) == list(range(TOTAL_RESULTS))
+    assert paper_ids(offline.iter_all(builder(), max_total=150)) == list(range(150))
+    assert paper_ids(offline.fetch_single_batch(builder())['entries']) == list(range(20))
+
+    offline.cache.clear()
+    with pytest.raises(OfflineCacheMiss):
+        offline.fetch_all(builder())
@@ -0,0 +1,64 @@
+"""
+离线测试：多进程打分归并后的结果与单进程一致，索引上的共享内存在多次查询间复用
+"""
+import pytest
+from src.utils import parallel, similarity
+from src.utils.similarity import SimilarityMatcher
+from test_scoring import QUERIES, make_articles
+
+
+@pytest.fixture(scope='module', autouse=True)
+def shutdown_pools():
+    yield
+    parallel.shutdown_pools()
+
+
+@pytest.fixture
+def always_parallel(monkeypatch):
+    # 测试语料很小，取消最小篇数限制以真正使用进程池
+    monkeypatch.setattr(similarity, 'MIN_PARALLEL_DOCS', 0)
+
+
+def ranking_keys(ranking):
+    return [(item['article']['title'], item['similarity_score']) for item in ranking]
+
+
+@pytest.mark.parametrize('method', ['cosine', 'bm25', 'word_frequency'])
+@pytest.mark.parametrize('top_n', [5, None])
+def test_parallel_ranking_matches_serial(always_parallel, method, top_n):
+    matcher = SimilarityMatcher()
+    articles = make_articles(60)
+    index = matcher.build_simhash_index(articles)
+    for text in QUERIES:
+        expected = ranking_keys(matcher.rank_articles(text, articles, method=method, top_n=top_n))
+        assert ranking_keys(matcher.rank_articles(text, articles, method=method, top_n=top_n, workers=2)) == expected
+        assert ranking_keys(matcher.rank_articles(text, index, method=method, top_n=top_n, workers=2)) == expected
+
+
+def test_index_keeps_shared_corpus_across_calls(always_parallel):
+    matcher = SimilarityMatcher()
+    index = matcher.build_simhash_index(make_articles(40))
+    scorer = parallel.get_scorer(index, 2)
+    names = [name for name, _, _ in scorer.shared.spec['arrays'].values()]
+    for text in QUERIES:
+        matcher.rank_articles(text, index, top_n=3, workers=2)
+    assert parallel.get_scorer(index, 2) is scorer
+    assert [name for name, _, _ in scorer.shared.spec['arrays'].values()] == names
+    assert scorer.pool._mp_context.get_start_method() == parallel.START_METHOD != 'fork'
+
+    # 索引被回收时释放共享内存
+    del index
+    assert scorer.shared.blocks == []
+
+
+def test_small_corpus_is_scored_serially(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('语料少于MIN_PARALLEL_DOCS篇时不应创建共享内存')
+    monkeypatch.setattr(similarity, 'ParallelScorer', fail)
+    monkeypatch.setattr(similarity, 'get_scorer', fail)
+    matcher = SimilarityMatcher()
+    articles = make_articles(60)
+    expected = ranking_keys(matcher.rank_articles(QUERIES[0], articles, top_n=5))
+    assert ranking_keys(matcher.rank_articles(QUERIES[0], articles, top_n=5, workers=4)) == expected
+    index = matcher.build_simhash_index(articles)
+    assert ranking_keys(matcher.rank_articles(QUERIES[0], index, top_n=5, workers=4)) == expected
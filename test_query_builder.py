@@ -0,0 +1,56 @@
+"""
+离线测试：查询构建器按时间分片、规范化查询键
+"""
+from datetime import datetime
+from src.services.harvest import HarvestPlanner
+from src.services.query import QueryBuilder
+
+
+def test_split_time_range_defaults_when_only_categories_are_set():
+    builder = QueryBuilder().add_category_filter('cs.CV')
+    before = (builder.canonical_key(), builder.build())
+    shards = builder.split_time_range()
+    # 不修改原查询
+    assert builder.time_ranges == set()
+    assert (builder.canonical_key(), builder.build()) == before
+    # 默认时间范围为昨天到今天，按天分为两片（由近到远）
+    assert len(shards) == 2
+    today = datetime.now().strftime('%Y%m%d')
+    assert shards[0].time_ranges == {(today + '0000', today + '2359')}
+    for shard in shards:
+        _, params = shard.build()
+        assert 'cat:cs.CV' in params['search_query']
+        assert 'submittedDate:' in params['search_query']
+
+
+def test_split_time_range_by_hour_clips_to_range():
+    builder = QueryBuilder().set_time_range(datetime(2024, 3, 1), datetime(2024, 3, 2))
+    shards = builder.split_time_range('hour')
+    assert len(shards) == 48
+    assert shards[0].time_ranges == {('202403022300', '202403022359')}
+    assert shards[-1].time_ranges == {('202403010000', '202403010059')}
+
+
+def test_canonical_key_ignores_order_and_duplicates():
+    first = QueryBuilder().set_time_range(datetime(2024, 3, 1, 8), datetime(2024, 3, 2, 17))
+    first.add_category_filter(['cs.CV', 'cs.AI']).add_keyword_filter(['Change  Detection', 'flood'])
+    second = QueryBuilder().add_keyword_filter(['flood', 'change detection', 'FLOOD'])
+    second.add_category_filter(['cs.AI', ' cs.CV', 'cs.AI']).add_category_filter(['cs.CV', 'cs.AI'])
+    second.set_time_range(datetime(2024, 3, 1), datetime(2024, 3, 2))
+    assert first.canonical_key() == second.canonical_key()
+    assert first.build() == second.build()
+
+    # 条件不同时键不同：OR组的划分、分页位置
+    split = QueryBuilder().set_time_range(datetime(2024, 3, 1), datetime(2024, 3, 2))
+    split.add_category_filter('cs.CV').add_category_filter('cs.AI')
+    split.add_keyword_filter(['change detection', 'flood'])
+    assert split.canonical_key() != first.canonical_key()
+    assert first.copy().set_start(100).canonical_key() != first.canonical_key()
+
+
+def test_harvest_plan_does_not_modify_builder():
+    builder = QueryBuilder().add_keyword_filter('flood')
+    before = builder.canonical_key()
+    shards = HarvestPlanner(unit='hour').plan(builder)
+    assert len(shards) == 48
+    assert builder.canonical_key() == before and not builder.time_ranges
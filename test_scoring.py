@@ -0,0 +1,164 @@
+"""
+离线测试：稀疏矩阵批量打分与原有逐篇计算公式一致，各排序路径的结果（包括同分时的顺序）一致
+"""
+from collections import Counter
+import math
+import random
+import pytest
+from src.utils.similarity import SimilarityMatcher
+
+WORDS = ['change', 'detection', 'flood', 'radar', 'optical', 'fusion', 'image', 'network', 'learning',
+         'model', 'data', 'map', 'sensor', 'river', 'urban', 'the', 'of', 'and', 'segmentation', 'graph']
+
+
+def make_articles(count, seed=0):
+    """
+    生成随机文章（含重复文章、空摘要和只有停用词的文章，用于覆盖同分和零分的情况）
+    """
+    generator = random.Random(seed)
+    articles = []
+    for i in range(count):
+        words = [generator.choice(WORDS) for _ in range(generator.randint(0, 30))]
+        articles.append({'id': f'doc{i}', 'title': f'Paper {i % 7}', 'summary': ' '.join(words)})
+    articles.append(dict(articles[3], id='copy3'))
+    articles.append({'id': 'empty', 'title': '', 'summary': ''})
+    articles.append({'id': 'stop', 'title': 'the', 'summary': 'of and the'})
+    return articles
+
+
+def baseline_scores(matcher, text, article_text):
+    """
+    原有的逐篇计算公式（基于词列表和Counter）
+    """
+    words1 = matcher.preprocess_text(text)
+    words2 = matcher.preprocess_text(article_text)
+    freq1, freq2 = Counter(words1), Counter(words2)
+
+    set1, set2 = set(words1), set(words2)
+    union = len(set1 | set2)
+    jaccard = len(set1 & set2) / union if union else 0.0
+
+    dot_product = sum(freq1[word] * freq2[word] for word in set1 & set2)
+    norm1 = math.sqrt(sum(count * count for count in freq1.values()))
+    norm2 = math.sqrt(sum(count * count for count in freq2.values()))
+    cosine = dot_product / (norm1 * norm2) if norm1 and norm2 else 0.0
+
+    total1, total2 = sum(freq1.values()), sum(freq2.values())
+    word_frequency = sum((freq1[word] / total1) * (freq2[word] / total2)
+                         for word in set1 & set2) if total1 and total2 else 0.0
+    return {'cosine': cosine, 'jaccard': jaccard, 'word_frequency': word_frequency}
+
+
+def baseline_ranking(scores, top_n):
+    """
+    原有的排序方式：按相似度降序的稳定排序
+    """
+    order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+    return order[:top_n] if top_n else order
+
+
+QUERIES = [
+    'Flood change detection with optical and radar image fusion',
+    'graph neural network learning for urban segmentation maps',
+    'river river river sensor',
+    'the of and',  # 只有停用词
+    'unseen vocabulary words only',
+]
+
+
+@pytest.mark.parametrize('method', ['cosine', 'jaccard', 'word_frequency'])
+def test_matrix_matches_baseline_formulas(method):
+    matcher = SimilarityMatcher()
+    articles = make_articles(200)
+    matrix = matcher.build_matrix(articles)
+    for text in QUERIES:
+        scores = matrix.score(matcher.prepare(text), method)
+        expected = [baseline_scores(matcher, text, matcher.article_text(article))[method] for article in articles]
+        assert scores.tolist() == pytest.approx(expected, rel=1e-12, abs=1e-15)
+        # 逐篇计算的接口与批量打分一致
+        for i in range(0, len(articles), 37):
+            assert matcher.calculate_similarity(text, articles[i], method) == pytest.approx(expected[i], abs=1e-15)
+
+
+def test_score_many_matches_single_method():
+    matcher = SimilarityMatcher()
+    articles = make_articles(120, seed=1)
+    matrix = matcher.build_matrix(articles)
+    query = matcher.prepare(QUERIES[0])
+    methods = ('cosine', 'jaccard', 'word_frequency', 'bm25', 'tfidf')
+    together = matrix.score_many(query, methods)
+    for method in methods:
+        assert together[method].tolist() == matrix.score(query, method).tolist()
+    # 只为部分文档打分时与全量结果的对应行一致
+    rows = [5, 0, 119, 42]
+    subset = matrix.score_many(query, methods, rows=rows)
+    for method in methods:
+        assert subset[method].tolist() == together[method][rows].tolist()
+
+
+@pytest.mark.parametrize('method', ['cosine', 'jaccard', 'word_frequency'])
+@pytest.mark.parametrize('top_n', [None, 1, 10, 500])
+def test_rank_articles_matches_baseline_order(method, top_n):
+    matcher = SimilarityMatcher()
+    articles = make_articles(150, seed=2)
+    for text in QUERIES:
+        expected_scores = [baseline_scores(matcher, text, matcher.article_text(article))[method]
+                           for article in articles]
+        ranked = matcher.rank_articles(text, articles, method=method, top_n=top_n)
+        assert [item['similarity_score'] for item in ranked] == pytest.approx(
+            [expected_scores[i] for i in baseline_ranking(expected_scores, top_n)], abs=1e-15)
+        # 同分文章保持原有顺序（以批量打分的分数排序，避免末位误差影响比较）
+        scores = matcher.score_articles(text, articles, method).tolist()
+        assert [item['article']['id'] for item in ranked] == \
+            [articles[i]['id'] for i in baseline_ranking(scores, top_n)]
+
+
+@pytest.mark.parametrize('method', ['cosine', 'jaccard', 'word_frequency', 'bm25', 'tfidf'])
+def test_rank_stream_matches_rank_articles(method):
+    matcher = SimilarityMatcher()
+    articles = make_articles(300, seed=3)
+    statistics = matcher.build_statistics(articles)
+    for text in QUERIES:
+        expected = matcher.rank_articles(text, articles, method=method, top_n=25, statistics=statistics)
+        # 分块大小不整除文章数，堆顶同分时的替换顺序也需要与稳定排序一致
+        streamed = matcher.rank_stream(text, iter(articles), method=method, top_n=25, chunk_size=7,
+                                       statistics=statistics)
+        assert [(item['article']['id'], item['similarity_score']) for item in streamed] == \
+            [(item['article']['id'], item['similarity_score']) for item in expected]
+
+
+@pytest.mark.parametrize('method', ['cosine', 'jaccard', 'word_frequency', 'bm25', 'tfidf'])
+def test_rank_many_matches_rank_articles(method):
+    matcher = SimilarityMatcher()
+    articles = make_articles(150, seed=4)
+    rankings = matcher.rank_many(QUERIES, articles, method=method, top_n=10)
+    for text, ranked in zip(QUERIES, rankings):
+        expected = matcher.rank_articles(text, articles, method=method, top_n=10)
+        assert [item['article']['id'] for item in ranked] == [item['article']['id'] for item in expected]
+        assert [item['similarity_score'] for item in ranked] == \
+            pytest.approx([item['similarity_score'] for item in expected], rel=1e-12, abs=1e-15)
+
+
+def test_rank_articles_reuses_simhash_index_matrix(monkeypatch):
+    matcher = SimilarityMatcher()
+    articles = make_articles(100, seed=9)
+    simhash_index = matcher.build_simhash_index(articles)
+    expected = {method: matcher.rank_articles(QUERIES[0], articles, method=method, top_n=10)
+                for method in ('cosine', 'jaccard', 'bm25')}
+
+    # 不使用近似检索时直接复用索引中的矩阵，不重新分词
+    def fail(_articles):
+        raise AssertionError("不应重新构建矩阵")
+    monkeypatch.setattr(matcher, 'build_matrix', fail)
+    for method, ranked in expected.items():
+        assert matcher.rank_articles(QUERIES[0], simhash_index, method=method, top_n=10) == ranked
+
+
+def test_score_all_ignores_unknown_weight_methods():
+    matcher = SimilarityMatcher()
+    articles = make_articles(50, seed=10)
+    expected = matcher.score_all(QUERIES[0], articles, weights={'cosine': 1})
+    ranked = matcher.score_all(QUERIES[0], articles, weights={'cosine': 1, 'bogus': 1})
+    assert [item['similarity_score'] for item in ranked] == [item['similarity_score'] for item in expected]
+    assert [item['similarity_score'] for item in expected] == \
+        [item['scores']['cosine'] for item in expected]
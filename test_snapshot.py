@@ -0,0 +1,59 @@
+"""
+离线测试：语料快照保存后重新加载，各排序路径的结果与直接使用文章列表一致
+"""
+import pytest
+from src.utils.similarity import SimilarityMatcher
+from test_scoring import QUERIES, make_articles
+
+
+def assert_same_ranking(ranking, expected):
+    assert [item['article']['id'] for item in ranking] == [item['article']['id'] for item in expected]
+    # 词表长度不同时numpy向量化的log在最后一位可能有舍入差异，分数按近似相等比较
+    assert [item['similarity_score'] for item in ranking] == \
+        pytest.approx([item['similarity_score'] for item in expected], rel=1e-12)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    articles = make_articles(150, seed=3)
+    SimilarityMatcher().save_snapshot(articles, str(tmp_path / 'snapshot'))
+    # 加载快照的匹配器使用快照中的词表
+    matcher = SimilarityMatcher()
+    snapshot = matcher.load_snapshot(str(tmp_path / 'snapshot'))
+    return articles, matcher, snapshot
+
+
+def test_snapshot_round_trip(corpus):
+    articles, matcher, snapshot = corpus
+    assert len(snapshot) == len(articles)
+    assert list(snapshot.articles) == articles
+    expected = SimilarityMatcher().build_matrix(articles)
+    for name in ('indptr', 'indices', 'data', 'norms', 'lengths'):
+        assert getattr(snapshot.matrix, name).tolist() == getattr(expected, name).tolist()
+
+
+@pytest.mark.parametrize('method', ['cosine', 'jaccard', 'word_frequency', 'bm25', 'tfidf'])
+@pytest.mark.parametrize('top_n', [5, None])
+def test_snapshot_ranking_matches_list(corpus, method, top_n):
+    articles, matcher, snapshot = corpus
+    reference = SimilarityMatcher()
+    for text in QUERIES:
+        expected = reference.rank_articles(text, articles, method=method, top_n=top_n)
+        assert_same_ranking(matcher.rank_articles(text, snapshot, method=method, top_n=top_n), expected)
+
+
+def test_snapshot_indexes_match_list(corpus):
+    articles, matcher, snapshot = corpus
+    reference = SimilarityMatcher()
+    index = matcher.build_index(snapshot)
+    simhash_index = matcher.build_simhash_index(snapshot)
+    assert index.matrix is snapshot.matrix and simhash_index.matrix is snapshot.matrix
+    for text in QUERIES:
+        # SimHash预选后精确重排
+        expected = reference.rank_articles(text, articles, top_n=5, approximate=True)
+        assert_same_ranking(matcher.rank_articles(text, snapshot, top_n=5, approximate=True), expected)
+        assert_same_ranking(matcher.rank_articles(text, simhash_index, top_n=5, approximate=True), expected)
+        # 倒排索引剪枝查询
+        for method in ('cosine', 'word_frequency', 'bm25'):
+            expected = reference.rank_articles(text, articles, method=method, top_n=5)
+            assert_same_ranking(matcher.rank_articles(text, index, method=method, top_n=5), expected)
@@ -0,0 +1,115 @@
+"""
+离线测试：本地语料库的写入（重复写入、版本覆盖）、按updated增量同步和同步范围
+"""
+from datetime import datetime
+import pytest
+from src.services.query import QueryBuilder
+from src.services.store import CorpusStore
+
+
+def paper(number, version=1, updated='2024-03-01T10:00:00Z', categories=('cs.CV',), title=None, arxiv_id=False):
+    identifier = f'2403.{number:05d}v{version}'
+    article = {
+        'id': f'http://arxiv.org/abs/{identifier}',
+        'title': title or f'Paper {number}',
+        'summary': f'summary of paper {number}',
+        'published': f'2024-03-01T{number % 24:02d}:00:00Z',
+        'updated': updated,
+        'authors': ['Wei Zhang'],
+        'categories': list(categories),
+        'links': [{'href': f'http://arxiv.org/abs/{identifier}', 'rel': 'alternate', 'type': 'text/html'}]
+    }
+    if arxiv_id:
+        article['arxiv_id'] = identifier
+    return article
+
+
+class FakeProcessor:
+    """
+    模拟分页处理器：按updated倒序返回文章，记录请求的查询构建器和实际读取的篇数
+    """
+
+    def __init__(self, articles):
+        self.articles = sorted(articles, key=lambda article: (article['updated'], article['id']), reverse=True)
+        self.builders = []
+        self.read = 0
+
+    def iter_all(self, builder, max_total=None):
+        self.builders.append(builder)
+        for article in self.articles:
+            self.read += 1
+            yield article
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CorpusStore(str(tmp_path / 'corpus.sqlite3'))
+    yield store
+    store.close()
+
+
+def builder(*categories):
+    query = QueryBuilder().set_time_range(datetime(2024, 3, 1), datetime(2024, 3, 2))
+    query.add_category_filter(list(categories) or 'cs.CV')
+    return query.set_max_results(100)
+
+
+def test_upsert_is_idempotent_and_keeps_latest_version(store):
+    articles = [paper(1, arxiv_id=True), paper(2), paper(3, categories=('cs.CV', 'cs.AI'))]
+    assert store.upsert(articles) == 3
+    first = store.select(builder())
+    assert store.upsert(articles) == 3
+    assert store.count() == 3 and store.select(builder()) == first
+    # arxiv_id随论文返回（含版本号）
+    assert {article['arxiv_id'] for article in first} == {'2403.00001v1', '2403.00002v1', '2403.00003v1'}
+    assert [article for article in first if article['title'] == 'Paper 1'][0] == paper(1, arxiv_id=True)
+
+    # 新版本覆盖旧版本并更新分类索引，旧版本不会覆盖新版本
+    store.upsert([paper(2, version=2, updated='2024-03-05T00:00:00Z', categories=('cs.AI',), title='Revised')])
+    store.upsert([paper(2, version=1, updated='2024-03-06T00:00:00Z', title='Stale')])
+    revised = store.select(builder('cs.AI'))
+    assert sorted(article['arxiv_id'] for article in revised) == ['2403.00002v2', '2403.00003v1']
+    assert [article['title'] for article in revised if article['arxiv_id'] == '2403.00002v2'] == ['Revised']
+    assert '2403.00002v2' not in {article['arxiv_id'] for article in store.select(builder('cs.CV'))}
+    assert store.count() == 3
+
+
+def test_sync_fetches_only_papers_after_watermark(store):
+    initial = [paper(number, updated=f'2024-03-01T{number:02d}:00:00Z') for number in range(1, 11)]
+    processor = FakeProcessor(initial)
+    stats = store.sync(builder(), processor)
+    assert stats == {'fetched': 10, 'stored': 10, 'last_updated': '2024-03-01T10:00:00Z', 'incremental': False}
+    assert processor.builders[0].time_ranges == builder().time_ranges
+    assert processor.builders[0].params['sortBy'] == 'lastUpdatedDate'
+
+    # 新增论文（包括与水位线updated相同、编号更大的论文）和一篇论文的新版本
+    added = [paper(11, updated='2024-03-01T10:00:00Z'), paper(12, updated='2024-03-02T08:00:00Z'),
+             paper(3, version=2, updated='2024-03-02T09:00:00Z', title='Revised')]
+    processor = FakeProcessor(initial + added)
+    stats = store.sync(builder(), processor)
+    assert stats['incremental'] and stats['stored'] == 3
+    assert stats['last_updated'] == '2024-03-02T09:00:00Z'
+    # 增量同步不限制时间范围，读到updated早于水位线的论文即停止：
+    # 新增的3篇、水位线上的论文10（已同步，跳过）和第一篇更早的论文9
+    assert processor.builders[0].time_ranges == set()
+    assert processor.read == 5 and stats['fetched'] == 4
+    assert store.count() == 12
+    assert store.sync_state(builder())['last_arxiv_id'] == '2403.00003'
+
+    # 没有新论文时不写入
+    stats = store.sync(builder(), FakeProcessor(initial + added))
+    assert stats['stored'] == 0 and stats['last_updated'] == '2024-03-02T09:00:00Z'
+
+
+def test_scope_depends_only_on_category_and_keyword_filters(store):
+    first = builder('cs.CV', 'cs.AI').add_keyword_filter(['flood', 'SAR'])
+    second = QueryBuilder().add_keyword_filter(['sar', 'flood']).add_category_filter(['cs.AI', 'cs.CV'])
+    second.set_time_range(datetime(2023, 1, 1), datetime(2023, 2, 1)).set_start(200)
+    assert CorpusStore.scope(first) == CorpusStore.scope(second)
+    assert CorpusStore.scope(first) != CorpusStore.scope(builder('cs.CV', 'cs.AI'))
+    assert CorpusStore.scope(builder('cs.CV')) != CorpusStore.scope(builder('cs.AI'))
+
+    # 不同范围分别记录同步状态
+    store.sync(builder('cs.CV'), FakeProcessor([paper(1)]))
+    assert store.sync_state(builder('cs.CV')) is not None
+    assert store.sync_state(builder('cs.AI')) is None
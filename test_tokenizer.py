@@ -0,0 +1,46 @@
+"""
+离线测试：分词规则（中日韩标点作为分隔符）和词表ID分配
+"""
+import threading
+from src.utils.tokenizer import CJK_SEPARATORS, Tokenizer, Vocabulary
+
+
+def test_cjk_punctuation_separates_words():
+    tokenizer = Tokenizer()
+    text = "Change Detection。The contest，flood：radar（SAR）data、fusion！ Don't split-words."
+    assert tokenizer.tokenize(text) == ['change', 'detection', 'contest', 'flood', 'radar', 'sar', 'data',
+                                        'fusion', 'dont', 'splitwords']
+    # 中文字符本身不是分隔符，保留在词中
+    assert tokenizer.tokenize('洪水检测。变化检测，SAR影像') == ['洪水检测', '变化检测', 'sar影像']
+    assert ord('。') in CJK_SEPARATORS and ord('，') in CJK_SEPARATORS and ord('洪') not in CJK_SEPARATORS
+
+
+def test_vocabulary_ids_are_dense_and_stable():
+    tokenizer = Tokenizer()
+    first = tokenizer.encode('flood detection radar flood')
+    assert list(first) == [0, 1, 2, 0]
+    second = tokenizer.encode('radar 洪水。flood new')
+    assert list(second) == [2, 3, 0, 4]
+    assert list(tokenizer.encode('flood detection radar flood')) == list(first)
+    vocabulary = tokenizer.vocabulary
+    assert vocabulary.tokens == ['flood', 'detection', 'radar', '洪水', 'new']
+    assert [vocabulary.token(token_id) for token_id in second] == ['radar', '洪水', 'flood', 'new']
+    assert vocabulary.get('missing') is None and 'missing' not in vocabulary
+    assert Vocabulary.from_tokens(vocabulary.tokens).token_to_id == vocabulary.token_to_id
+
+
+def test_vocabulary_add_is_thread_safe():
+    vocabulary = Vocabulary()
+    words = [f'word{i}' for i in range(2000)]
+    results = []
+
+    def encode():
+        results.append(list(vocabulary.encode(words)))
+
+    threads = [threading.Thread(target=encode) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(vocabulary) == len(words)
+    assert all(result == list(range(len(words))) for result in results)
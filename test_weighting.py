@@ -0,0 +1,81 @@
+"""
+离线测试：bm25和tfidf打分与按定义逐篇计算的公式一致，打分不修改语料统计
+"""
+from collections import Counter
+import math
+import pytest
+from src.utils.similarity import SimilarityMatcher
+from src.utils.weighting import BM25_B, BM25_K1
+from test_scoring import QUERIES, make_articles
+
+
+def reference_scores(query_words, documents, corpus):
+    """
+    按定义计算的BM25和TF-IDF余弦相似度
+    documents: 被打分文章的词列表
+    corpus: 计入语料统计的文章的词列表
+    """
+    n_docs = len(corpus)
+    average_length = sum(len(words) for words in corpus) / n_docs or 1.0
+    document_frequency = Counter(word for words in corpus for word in set(words))
+
+    def bm25_idf(word):
+        df = document_frequency[word]
+        return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def tfidf_idf(word):
+        return math.log((1 + n_docs) / (1 + document_frequency[word])) + 1
+
+    query = Counter(query_words)
+    query_weights = {word: count * tfidf_idf(word) for word, count in query.items()}
+    query_norm = math.sqrt(sum(weight * weight for weight in query_weights.values()))
+    bm25, tfidf = [], []
+    for words in documents:
+        counts = Counter(words)
+        normalizer = BM25_K1 * (1 - BM25_B + BM25_B * len(words) / average_length)
+        bm25.append(sum(bm25_idf(word) * counts[word] * (BM25_K1 + 1) / (counts[word] + normalizer)
+                        for word in query if word in counts))
+        weights = {word: count * tfidf_idf(word) for word, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        dot = sum(query_weights[word] * weights[word] for word in query if word in weights)
+        tfidf.append(dot / (query_norm * norm) if query_norm and norm else 0.0)
+    return {'bm25': bm25, 'tfidf': tfidf}
+
+
+@pytest.mark.parametrize('method', ['bm25', 'tfidf'])
+@pytest.mark.parametrize('sample', [None, 20])
+def test_weighted_scores_match_reference_formula(method, sample):
+    matcher = SimilarityMatcher()
+    articles = make_articles(60)
+    # sample不为None时只用前sample篇统计，其余文章和查询中有统计里没有出现过的词
+    counted = articles if sample is None else articles[:sample]
+    statistics = matcher.build_statistics(counted) if sample else None
+    words = [matcher.preprocess_text(matcher.article_text(article)) for article in articles]
+    corpus = words if sample is None else words[:sample]
+    for text in QUERIES + ['flood radar flood unseenword']:
+        expected = reference_scores(matcher.preprocess_text(text), words, corpus)[method]
+        scores = matcher.score_articles(text, articles, method=method, statistics=statistics)
+        assert list(scores) == pytest.approx(expected)
+    assert any(expected)
+
+
+def test_scoring_does_not_modify_statistics():
+    matcher = SimilarityMatcher()
+    articles = make_articles(60)
+    statistics = matcher.build_statistics(articles[:10])
+    # 统计之后出现的新词，其ID超出统计中文档频率数组的长度
+    articles.append({'id': 'new', 'title': 'Unseen words', 'summary': 'flood hyperspectral'})
+    version, size = statistics.version, len(statistics.document_frequency)
+    matrix = matcher.build_matrix(articles)
+    assert matrix.n_columns > size
+    for method in ('bm25', 'tfidf'):
+        first = matrix.score(matcher.prepare(QUERIES[0]), method, statistics=statistics)
+        assert (statistics.version, len(statistics.document_frequency)) == (version, size)
+
+    # 统计更新后缓存的加权结果失效，打分与重新统计的结果一致
+    statistics.add_matrix(matcher.build_matrix(articles[10:]))
+    for method in ('bm25', 'tfidf'):
+        updated = matrix.score(matcher.prepare(QUERIES[0]), method, statistics=statistics)
+        fresh = matcher.build_matrix(articles).score(matcher.prepare(QUERIES[0]), method)
+        assert list(updated) == pytest.approx(list(fresh))
+    assert list(first) != pytest.approx(list(updated))